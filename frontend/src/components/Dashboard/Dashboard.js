@@ -7,6 +7,8 @@ import FeedbackModal from './FeedbackModal';
 const Dashboard = () => {
   const { user } = useAuth();
   const [sessions, setSessions] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [editingNotes, setEditingNotes] = useState(null);
   const [notesValue, setNotesValue] = useState('');
@@ -23,27 +25,24 @@ const Dashboard = () => {
     }
   }, [user]); // Add user dependency
 
+  const loadFeedback = (pageSessions) => {
+    // Feedback comes embedded in the session list (?expand=feedback)
+    const feedback = {};
+    for (const session of pageSessions) {
+      if (session.feedback) {
+        feedback[session.id] = session.feedback;
+      }
+    }
+    setSessionsWithFeedback(prev => ({ ...prev, ...feedback }));
+  };
+
   const fetchSessions = async () => {
     try {
-      const response = await api.get('/sessions/');
-      setSessions(response.data);
-
-      // Fetch feedback for completed sessions
-      for (const session of response.data) {
-        if (session.status === 'completed' && session.learner.username === user.username) {
-          try {
-            const feedbackResponse = await api.get(`/sessions/${session.id}/get_feedback/`);
-            if (feedbackResponse.data) {
-              setSessionsWithFeedback(prev => ({
-                ...prev,
-                [session.id]: feedbackResponse.data
-              }));
-            }
-          } catch (error) {
-            // No feedback found, which is fine
-          }
-        }
-      }
+      // Sessions are cursor-paginated; this loads the first page
+      const response = await api.get('/sessions/', { params: { expand: 'feedback' } });
+      setSessions(response.data.results);
+      setNextPage(response.data.next);
+      loadFeedback(response.data.results);
     } catch (error) {
       toast.error('Failed to fetch sessions');
     } finally {
@@ -51,6 +50,21 @@ const Dashboard = () => {
     }
   };
 
+  const loadMoreSessions = async () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(nextPage);
+      setSessions(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+      loadFeedback(response.data.results);
+    } catch (error) {
+      toast.error('Failed to load more sessions');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // This function is now ONLY for 'completed' or 'cancelled'
   const updateStatus = async (sessionId, newStatus) => {
     try {
@@ -80,7 +94,13 @@ const Dashboard = () => {
         setScheduleData({ start: '', end: '' });
         fetchSessions();
     } catch (error) {
-        toast.error('Failed to confirm session');
+        const response = error.response;
+        if (response && (response.status === 409 || response.status === 400)) {
+            // Overlaps another confirmed session, or a bad time window
+            toast.error(response.data.detail);
+        } else {
+            toast.error('Failed to confirm session');
+        }
     }
   };
 
@@ -358,6 +378,18 @@ const Dashboard = () => {
         )}
       </div>
 
+      {nextPage && (
+        <div className="flex justify-center mt-6">
+          <button
+            onClick={loadMoreSessions}
+            disabled={loadingMore}
+            className="bg-gray-200 hover:bg-gray-300 text-gray-800 font-semibold py-2 px-6 rounded-lg"
+          >
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        </div>
+      )}
+
       {showFeedbackModal && (
         <FeedbackModal
           session={showFeedbackModal}
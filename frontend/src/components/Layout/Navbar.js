@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
 import { toast } from 'react-toastify';
@@ -12,6 +12,20 @@ const Navbar = () => {
   const [unreadCount, setUnreadCount] = useState(0);
   const [showNotifications, setShowNotifications] = useState(false);
 
+  // Newest notification id we have seen; the stream and the delta poll
+  // both continue from here
+  const lastIdRef = useRef(0);
+
+  const addNotifications = (incoming) => {
+    if (incoming.length === 0) return;
+    lastIdRef.current = Math.max(lastIdRef.current, ...incoming.map(n => n.id));
+    setNotifications(current => {
+      const seen = new Set(current.map(n => n.id));
+      const fresh = incoming.filter(n => !seen.has(n.id));
+      return [...fresh, ...current].sort((a, b) => b.id - a.id);
+    });
+  };
+
   const fetchNotifications = async () => {
     if (!user) return; 
     try {
@@ -25,9 +39,11 @@ const Navbar = () => {
       if (Array.isArray(data)) {
         // Handle non-paginated response (just a list)
         setNotifications(data);
+        lastIdRef.current = Math.max(lastIdRef.current, ...data.map(n => n.id));
       } else if (data && data.results) {
         // Handle DRF paginated response
         setNotifications(data.results);
+        lastIdRef.current = Math.max(lastIdRef.current, ...data.results.map(n => n.id));
       } else {
         // Handle unexpected response
         setNotifications([]);
@@ -39,15 +55,79 @@ const Navbar = () => {
     }
   };
 
+  // Fallback when the event stream is unavailable: one request for rows
+  // newer than the last one we have. While nothing changed the server
+  // answers 304 with an empty body.
+  const etagRef = useRef(null);
+
+  const pollDelta = async () => {
+    try {
+      const response = await api.get('/notifications/', {
+        params: { since_id: lastIdRef.current },
+        headers: etagRef.current ? { 'If-None-Match': etagRef.current } : {},
+        validateStatus: (code) => (code >= 200 && code < 300) || code === 304,
+      });
+      if (response.status === 304) return;
+
+      const { data } = response;
+      etagRef.current = response.headers.etag || null;
+      addNotifications(data.results);
+      setUnreadCount(data.unread_count);
+      lastIdRef.current = Math.max(lastIdRef.current, data.last_id);
+    } catch (error) {
+      console.error('Failed to fetch notifications:', error);
+    }
+  };
+
   useEffect(() => {
-    if (user) {
-      fetchNotifications(); 
-      const interval = setInterval(fetchNotifications, 30000);
-      return () => clearInterval(interval);
-    } else {
+    if (!user) {
       setNotifications([]);
       setUnreadCount(0);
+      lastIdRef.current = 0;
+      etagRef.current = null;
+      return;
     }
+
+    let source = null;
+    let interval = null;
+    let cancelled = false;
+
+    const startPolling = () => {
+      if (!interval) interval = setInterval(pollDelta, 30000);
+    };
+
+    const connect = async () => {
+      await fetchNotifications();
+      const token = localStorage.getItem('token');
+      if (cancelled) return;
+      if (!window.EventSource || !token) {
+        startPolling();
+        return;
+      }
+
+      const params = new URLSearchParams({ token, since: lastIdRef.current });
+      source = new EventSource(`${api.defaults.baseURL}/notifications/stream/?${params}`);
+      source.addEventListener('notification', (event) => {
+        const { notification, unread_delta } = JSON.parse(event.data);
+        addNotifications([notification]);
+        setUnreadCount(count => count + unread_delta);
+      });
+      source.addEventListener('unread_count', (event) => {
+        setUnreadCount(JSON.parse(event.data).unread_count);
+      });
+      source.onerror = () => {
+        // EventSource retries dropped connections by itself; it only gives
+        // up (CLOSED) when the server refuses the stream
+        if (source.readyState === EventSource.CLOSED) startPolling();
+      };
+    };
+
+    connect();
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+    };
   }, [user]); 
 
   const handleLogout = () => {
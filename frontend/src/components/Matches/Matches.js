@@ -6,6 +6,9 @@ import SearchAndFilter from './SearchAndFilter';
 
 const Matches = () => {
   const [filteredMatches, setFilteredMatches] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showRequestForm, setShowRequestForm] = useState(null);
 
@@ -28,7 +31,10 @@ const Matches = () => {
       }
 
       const response = await api.get(`/skills/matches/?${params.toString()}`);
-      setFilteredMatches(response.data);
+      setFilteredMatches(response.data.results);
+      setNextPage(response.data.next);
+      // Only the first unfiltered page carries related-skill suggestions
+      setSuggestions(response.data.suggestions || []);
 
     } catch (error) {
       toast.error('Failed to fetch matches');
@@ -37,6 +43,20 @@ const Matches = () => {
     }
   };
 
+  const loadMoreMatches = async () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(nextPage);
+      setFilteredMatches(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      toast.error('Failed to load more matches');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchMatches();
   }, [searchQuery, selectedCategory]);
@@ -179,6 +199,51 @@ const Matches = () => {
           ))}
         </div>
       )}
+
+      {!loading && suggestions.length > 0 && (
+        <div className="mt-10">
+          <h2 className="text-2xl font-semibold mb-4 text-gray-800">Teachers of related skills</h2>
+          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+            {suggestions.map((suggestion) => (
+              <div key={suggestion.user_id} className="bg-white rounded-lg shadow-md p-6">
+                <div className="flex items-center mb-3">
+                  <img
+                    src={suggestion.image || '/default.jpg'}
+                    alt={suggestion.username}
+                    className="w-12 h-12 rounded-full object-cover mr-3"
+                  />
+                  <h3 className="text-lg font-semibold text-gray-800">{suggestion.username}</h3>
+                </div>
+                <div className="flex flex-wrap gap-2 mb-4">
+                  {suggestion.related_skills.map((name) => (
+                    <span key={name} className="bg-purple-100 text-purple-800 px-2 py-1 rounded text-sm">
+                      {name}
+                    </span>
+                  ))}
+                </div>
+                <button
+                  onClick={() => navigate(`/profile/${suggestion.user_id}`)}
+                  className="w-full bg-gray-200 hover:bg-gray-300 text-gray-800 font-semibold py-2 px-4 rounded-lg"
+                >
+                  View Profile
+                </button>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
+      {!loading && nextPage && (
+        <div className="flex justify-center mt-6">
+          <button
+            onClick={loadMoreMatches}
+            disabled={loadingMore}
+            className="bg-gray-200 hover:bg-gray-300 text-gray-800 font-semibold py-2 px-6 rounded-lg"
+          >
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
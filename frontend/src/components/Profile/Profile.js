@@ -146,6 +146,11 @@ const Profile = () => {
               <div className="pt-4 mt-4 border-t border-gray-200">
                 <h2 className="text-xl font-semibold text-gray-800 mb-3">
                   Feedback You've Received
+                  {profile.rating_summary && profile.rating_summary.count > 0 && (
+                    <span className="ml-2 text-base font-normal text-gray-600">
+                      {profile.rating_summary.average}/5 from {profile.rating_summary.count} rating(s)
+                    </span>
+                  )}
                 </h2>
                 <div className="space-y-3">
                   {profile.received_feedback.map((feedback) => (
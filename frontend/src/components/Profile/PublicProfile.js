@@ -8,6 +8,11 @@ const PublicProfile = () => {
   const navigate = useNavigate();
   const [profile, setProfile] = useState(null);
   const [loading, setLoading] = useState(true);
+  // The profile carries only the newest feedback; the rest is paged
+  const [feedback, setFeedback] = useState([]);
+  const [feedbackNext, setFeedbackNext] = useState(null);
+  const [feedbackPaged, setFeedbackPaged] = useState(false);
+  const [loadingFeedback, setLoadingFeedback] = useState(false);
 
   useEffect(() => {
     fetchProfile();
@@ -17,6 +22,9 @@ const PublicProfile = () => {
     try {
       const response = await api.get(`/users/${userId}/`);
       setProfile(response.data.profile); 
+      setFeedback(response.data.profile.received_feedback || []);
+      setFeedbackNext(null);
+      setFeedbackPaged(false);
     } catch (error) {
       toast.error('Failed to load profile');
       navigate('/matches');
@@ -25,6 +33,31 @@ const PublicProfile = () => {
     }
   };
 
+  const hasMoreFeedback = feedbackPaged
+    ? Boolean(feedbackNext)
+    : Boolean(profile && profile.rating_summary && feedback.length < profile.rating_summary.count);
+
+  const loadMoreFeedback = async () => {
+    setLoadingFeedback(true);
+    try {
+      if (feedbackNext) {
+        const response = await api.get(feedbackNext);
+        setFeedback(prev => [...prev, ...response.data.results]);
+        setFeedbackNext(response.data.next);
+      } else {
+        // First full page replaces the preview from the profile
+        const response = await api.get(`/users/${userId}/feedback/`);
+        setFeedback(response.data.results);
+        setFeedbackNext(response.data.next);
+        setFeedbackPaged(true);
+      }
+    } catch (error) {
+      toast.error('Failed to load feedback');
+    } finally {
+      setLoadingFeedback(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex justify-center items-center h-64">
@@ -107,13 +140,16 @@ const PublicProfile = () => {
           </div>
         )}
 
-        {profile.received_feedback && profile.received_feedback.length > 0 && (
+        {feedback.length > 0 && (
           <div className="mb-6">
             <h2 className="text-xl font-semibold text-gray-800 mb-3">
-              Feedback ({profile.received_feedback.length})
+              Feedback ({profile.rating_summary.count})
+              <span className="ml-2 text-base font-normal text-gray-600">
+                average {profile.rating_summary.average}/5
+              </span>
             </h2>
             <div className="space-y-3">
-              {profile.received_feedback.map((feedback) => (
+              {feedback.map((feedback) => (
                 <div key={feedback.id} className="bg-gray-50 p-4 rounded-lg border border-gray-200">
                   <div className="flex items-center mb-2">
                     <span className="text-2xl" role="img" aria-label="star">
@@ -132,6 +168,15 @@ const PublicProfile = () => {
                 </div>
               ))}
             </div>
+            {hasMoreFeedback && (
+              <button
+                onClick={loadMoreFeedback}
+                disabled={loadingFeedback}
+                className="mt-4 text-blue-600 hover:text-blue-800 font-medium"
+              >
+                {loadingFeedback ? 'Loading...' : 'Show more feedback'}
+              </button>
+            )}
           </div>
         )}
       </div>
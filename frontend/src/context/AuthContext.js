@@ -65,7 +65,13 @@ export const AuthProvider = ({ children }) => {
     }
   };
 
-  const logout = () => {
+  const logout = async () => {
+    try {
+      // Revoke the token server-side; the local copy goes either way
+      await api.post('/auth/logout/');
+    } catch (error) {
+      // Already invalid or offline
+    }
     localStorage.removeItem('token');
     setUser(null);
   };
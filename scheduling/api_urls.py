@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import SessionViewSet, FeedbackViewSet, NotificationViewSet
+from .api_views import SessionViewSet, FeedbackViewSet, NotificationViewSet, notification_stream
 
 router = DefaultRouter()
 router.register(r'sessions', SessionViewSet, basename='session')
@@ -8,6 +8,8 @@ router.register(r'feedback', FeedbackViewSet, basename='feedback')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    # Before the router, which would read "stream" as a notification pk
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
 
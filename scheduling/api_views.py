@@ -3,24 +3,104 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Q
 from skills.models import Skill
-from .models import Session, Feedback, Notification
-from .serializers import SessionSerializer, FeedbackSerializer, NotificationSerializer
+from .models import (Session, Feedback, Notification, NotificationDigest, NotificationVersion,
+                     ActiveSessionState, BusyInterval)
+from .serializers import (SessionSerializer, FeedbackSerializer, NotificationSerializer,
+                          NotificationDigestSerializer)
+from skillswap_project.pagination import KeysetPagination
+from . import events, notifications
+
+import asyncio
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from users import authentication
+from skillswap_project.utils import is_truthy, parse_local_datetime
 
 # --- 1. ADD THESE IMPORTS ---
-from datetime import datetime
-from django.utils import timezone
+from datetime import timedelta
+
+SESSION_STATUSES = [choice for choice, _ in Session.STATUS_CHOICES]
+BULK_STATUS_LIMIT = 200
+FREE_SLOTS_MAX_RANGE = timedelta(days=62)
+NOTIFICATION_DELTA_LIMIT = 100
+NOTIFICATION_STREAM_RETRY_MS = 5000
+
+def apply_status(session, new_status, data):
+    """
+    Sets ``new_status`` on ``session`` (unsaved), taking the time window
+    from ``data`` when confirming. Raises ValueError with a user-facing
+    message on bad input.
+    """
+    if new_status == 'confirmed':
+        if not data.get('scheduled_time') or not data.get('end_time'):
+            raise ValueError('Start time and end time are required to confirm.')
+        session.scheduled_time = parse_local_datetime(data['scheduled_time'])
+        session.end_time = parse_local_datetime(data['end_time'])
+        if session.end_time <= session.scheduled_time:
+            raise ValueError('End time must be after start time.')
+    session.status = new_status
+
+def status_message(session):
+    """Notification text for the learner after a status change, if any."""
+    if session.status == 'confirmed':
+        time_str = session.scheduled_time.strftime('%d/%m/%y at %I:%M %p')
+        return f"Your session for {session.skill.name} with {session.teacher.username} has been confirmed for {time_str}."
+    if session.status == 'cancelled':
+        return f"Your session for {session.skill.name} with {session.teacher.username} has been cancelled."
+    return ''
+
+class SessionPagination(KeysetPagination):
+    ordering = ('-scheduled_time', '-id')
+
+class CalendarPagination(KeysetPagination):
+    ordering = ('scheduled_time', 'id')
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
 
 class SessionViewSet(viewsets.ModelViewSet):
     serializer_class = SessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SessionPagination
     
     def get_queryset(self):
         user = self.request.user
-        return Session.objects.filter(
+        return self.with_related(Session.objects.filter(
             Q(learner=user) | Q(teacher=user)
-        ).order_by('-scheduled_time')
+        )).order_by('-scheduled_time')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginator.paginate_union(self.participant_querysets(Session.objects.all()), request, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def participant_querysets(self, queryset):
+        # The user's sessions as teacher and as learner, paged each on its own
+        # index instead of sorting the user's whole history (see
+        # KeysetPagination.paginate_union)
+        user = self.request.user
+        return [self.with_related(queryset.filter(teacher=user)), self.with_related(queryset.filter(learner=user))]
+
+    def get_expand(self):
+        return set(filter(None, self.request.query_params.get('expand', '').split(',')))
+
+    def with_related(self, queryset):
+        # Everything SessionSerializer nests, in the same query
+        related = ['teacher', 'learner', 'skill']
+        if 'feedback' in self.get_expand():
+            related.append('feedback')
+        return queryset.select_related(*related)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
     
     def perform_create(self, serializer):
         teacher_id = self.request.data.get('teacher_id')
@@ -28,24 +108,49 @@ class SessionViewSet(viewsets.ModelViewSet):
         teacher = get_object_or_404(User, id=teacher_id)
         skill = get_object_or_404(Skill, id=skill_id)
         
-        session = serializer.save(learner=self.request.user, teacher=teacher, skill=skill)
-        
-        Notification.objects.create(
-            recipient=teacher,
-            session=session,
-            message=f"New session request from {self.request.user.username} for {skill.name}."
-        )
+        with transaction.atomic():
+            session = serializer.save(learner=self.request.user, teacher=teacher, skill=skill)
+            notifications.send(
+                teacher, f"New session request from {self.request.user.username} for {skill.name}.", session
+            )
 
     @action(detail=False, methods=['get'])
     def calendar_sessions(self, request):
-        user = self.request.user
-        queryset = Session.objects.filter(
-            Q(learner=user) | Q(teacher=user),
-            status__in=['pending', 'confirmed']
-        ).order_by('scheduled_time')
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = CalendarPagination()
+        page = paginator.paginate_union(
+            self.participant_querysets(Session.objects.filter(status__in=['pending', 'confirmed'])),
+            request, view=self,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def free_slots(self, request):
+        """
+        Windows in ``?from=..&to=..`` where neither the current user nor
+        ``?user=<id>`` has a confirmed session.
+        """
+        try:
+            start = parse_local_datetime(request.query_params.get('from'))
+            end = parse_local_datetime(request.query_params.get('to'))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if end <= start or end - start > FREE_SLOTS_MAX_RANGE:
+            return Response({'detail': f'to must be after from and at most {FREE_SLOTS_MAX_RANGE.days} days later'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        user_ids = {request.user.id}
+        if request.query_params.get('user'):
+            other = get_object_or_404(User, id=request.query_params['user'])
+            user_ids.add(other.id)
+
+        return Response({
+            'users': sorted(user_ids),
+            'from': start,
+            'to': end,
+            'free': [{'start': free_start, 'end': free_end}
+                     for free_start, free_end in BusyInterval.free_windows(user_ids, start, end)],
+        })
 
     # --- 2. THIS ENTIRE FUNCTION IS REPLACED ---
     @action(detail=True, methods=['post'])
@@ -58,61 +163,131 @@ class SessionViewSet(viewsets.ModelViewSet):
         
         new_status = request.data.get('status')
         
-        if new_status not in ['pending', 'confirmed', 'completed', 'cancelled']:
+        if new_status not in SESSION_STATUSES:
              return Response({'detail': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if new_status == 'confirmed':
-            # Get the time strings from React
-            scheduled_time_str = request.data.get('scheduled_time')
-            end_time_str = request.data.get('end_time')
-            
-            if not scheduled_time_str or not end_time_str:
-                return Response(
-                    {'detail': 'Start time and end time are required to confirm.'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
+        try:
+            apply_status(session, new_status, request.data)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The conflict check and the save share one transaction, so two
+        # overlapping confirmations can't both pass the check
+        conflicts = []
+        with transaction.atomic():
+            if new_status == 'confirmed':
+                BusyInterval.lock([session.teacher_id, session.learner_id])
+                conflicts = BusyInterval.find_conflicts(
+                    [(session, session.scheduled_time, session.end_time)]
+                ).get(session.id, [])
+                if conflicts and not is_truthy(request.data.get('allow_overlap')):
+                    return Response({'detail': 'This time overlaps another confirmed session.',
+                                     'conflicts': conflicts},
+                                    status=status.HTTP_409_CONFLICT)
+
+            session.save() # Now it saves the datetime objects
+            message = status_message(session)
+            if message:
+                notifications.send(session.learner, message, session)
+
+        data = self.get_serializer(session).data
+        if conflicts:
+            # Confirmed anyway (allow_overlap); tell the client what it clashes with
+            data['conflicts'] = conflicts
+        return Response(data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """
+        Moves many sessions to one status in a single transaction.
+
+        Body: ``{"status": ..., "sessions": [{"id": ..., "scheduled_time":
+        ..., "end_time": ...}, ...]}``; plain ids are fine when no time
+        window is needed. Every item gets its own result, and a failing
+        item does not stop the others.
+        """
+        new_status = request.data.get('status')
+        items = request.data.get('sessions')
+        if new_status not in SESSION_STATUSES:
+            return Response({'detail': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'sessions must be a non-empty list'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_STATUS_LIMIT:
+            return Response({'detail': f'At most {BULK_STATUS_LIMIT} sessions per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        items = [item if isinstance(item, dict) else {'id': item} for item in items]
+        ids = set()
+        for item in items:
+            try:
+                ids.add(int(item.get('id')))
+            except (TypeError, ValueError):
+                pass
+        # One query validates the whole batch and loads what the messages need
+        sessions = self.with_related(Session.objects.filter(id__in=ids)).in_bulk()
+
+        results, updated, seen = [], [], set()
+        for item in items:
+            session_id = item.get('id')
+            try:
+                session = sessions.get(int(session_id))
+            except (TypeError, ValueError):
+                session = None
+            if session is None or request.user.id not in (session.teacher_id, session.learner_id):
+                results.append({'id': session_id, 'ok': False, 'detail': 'Session not found'})
+                continue
+            if session.id in seen:
+                results.append({'id': session_id, 'ok': False, 'detail': 'Duplicate session id'})
+                continue
+            seen.add(session.id)
+            if session.teacher_id != request.user.id:
+                results.append({'id': session.id, 'ok': False,
+                                'detail': 'Only the teacher can update session status'})
+                continue
             try:
-                # Convert the strings to "naive" datetime objects
-                naive_start_time = datetime.strptime(scheduled_time_str, '%Y-%m-%dT%H:%M')
-                naive_end_time = datetime.strptime(end_time_str, '%Y-%m-%dT%H:%M')
-
-                # Make the datetimes "aware" of your project's timezone
-                # This also fixes the "received a naive datetime" warning
-                aware_start_time = timezone.make_aware(naive_start_time)
-                aware_end_time = timezone.make_aware(naive_end_time)
-
-                # Save the correct datetime objects to the model
-                session.scheduled_time = aware_start_time
-                session.end_time = aware_end_time
-                
-            except ValueError:
-                return Response(
-                    {'detail': 'Invalid datetime format. Expected YYYY-MM-DDTHH:MM'}, 
-                    status=status.HTTP_400_BAD_REQUEST
+                apply_status(session, new_status, item)
+            except ValueError as exc:
+                results.append({'id': session.id, 'ok': False, 'detail': str(exc)})
+                continue
+            updated.append(session)
+            results.append({'id': session.id, 'ok': True})
+
+        with transaction.atomic():
+            if updated and new_status == 'confirmed' and not is_truthy(request.data.get('allow_overlap')):
+                # Checked against existing bookings and earlier items of this
+                # batch, in the transaction that saves them
+                BusyInterval.lock({user_id for session in updated
+                                   for user_id in (session.teacher_id, session.learner_id)})
+                conflicts = BusyInterval.find_conflicts(
+                    [(session, session.scheduled_time, session.end_time) for session in updated]
                 )
+                if conflicts:
+                    updated = [session for session in updated if session.id not in conflicts]
+                    for result in results:
+                        if result['ok'] and result['id'] in conflicts:
+                            result.update(ok=False, detail='This time overlaps another confirmed session.',
+                                          conflicts=conflicts[result['id']])
 
-        session.status = new_status
-        session.save() # Now it saves the datetime objects
-        
-        learner = session.learner
-        message = ""
-        if new_status == 'confirmed':
-            # This line will now work, because session.scheduled_time is a datetime object
-            time_str = session.scheduled_time.strftime('%d/%m/%y at %I:%M %p')
-            message = f"Your session for {session.skill.name} with {session.teacher.username} has been confirmed for {time_str}."
-        elif new_status == 'cancelled':
-            message = f"Your session for {session.skill.name} with {session.teacher.username} has been cancelled."
-        
-        if message:
-            Notification.objects.create(
-                recipient=learner,
-                session=session,
-                message=message
-            )
+            if updated:
+                # bulk_update skips Session.save(), so refresh the busy state
+                # it would have maintained
+                Session.objects.bulk_update(updated, ['status', 'scheduled_time', 'end_time'])
+                ActiveSessionState.refresh(
+                    {session.teacher_id for session in updated} | {session.learner_id for session in updated}
+                )
+                BusyInterval.sync(updated)
+                for session in updated:
+                    if status_message(session):
+                        notifications.send(session.learner, status_message(session), session)
 
-        serializer = self.get_serializer(session)
-        return Response(serializer.data)
+        if updated:
+            data = {row['id']: row for row in self.get_serializer(updated, many=True).data}
+            for result in results:
+                if result['ok']:
+                    result['session'] = data[result['id']]
+
+        return Response({'results': results})
     
     @action(detail=True, methods=['post'])
     def update_meeting_link(self, request, pk=None):
@@ -167,11 +342,12 @@ class FeedbackViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         session_id = request.data.get('session_id')
         try:
-            session = Session.objects.get(id=session_id)
-        except Session.DoesNotExist:
+            # The notification below names the skill; the learner is request.user
+            session = Session.objects.select_related('skill', 'feedback').get(id=session_id)
+        except (Session.DoesNotExist, TypeError, ValueError):
             return Response({'detail': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        if request.user != session.learner:
+        if request.user.id != session.learner_id:
             return Response({'detail': 'Only the learner can give feedback'}, 
                             status=status.HTTP_403_FORBIDDEN)
         
@@ -185,13 +361,13 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(session=session)
-
-            Notification.objects.create(
-                recipient=session.teacher,
-                session=session,
-                message=f"{session.learner.username} left feedback for your {session.skill.name} session."
-            )
+            with transaction.atomic():
+                serializer.save(session=session)
+                notifications.send(
+                    session.teacher_id,
+                    f"{request.user.username} left feedback for your {session.skill.name} session.",
+                    session,
+                )
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -200,6 +376,7 @@ class FeedbackViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return self.request.user.notifications.all()
@@ -209,7 +386,131 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         count = self.get_queryset().filter(is_read=False).count()
         return Response({'unread_count': count})
 
+    def list(self, request, *args, **kwargs):
+        """
+        Keyset-paginated feed, or with ``?since_id=<id>`` a delta sync:
+        only rows newer than the client's high-water mark, oldest first,
+        with the unread count. Delta responses carry the recipient's
+        notification version as ETag; ``If-None-Match`` with the current
+        version gets an empty 304.
+        """
+        since_id = request.query_params.get('since_id')
+        if since_id is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            since_id = int(since_id)
+        except ValueError:
+            return Response({'detail': 'since_id must be a notification id'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the version first: a row inserted after this point bumps it,
+        # so the client can never keep a stale ETag past that row
+        etag = quote_etag(f'notifications-{NotificationVersion.current(request.user.id)}')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            queryset = self.get_queryset().select_related('session__skill', 'session__learner')
+            rows = list(queryset.filter(id__gt=since_id).order_by('id')[:NOTIFICATION_DELTA_LIMIT])
+            response = Response({
+                'results': self.get_serializer(rows, many=True).data,
+                'unread_count': self.get_queryset().filter(is_read=False).count(),
+                'last_id': rows[-1].id if rows else since_id,
+            })
+        response['ETag'] = etag
+        # Cached by the browser per user, revalidated on every poll
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def digests(self, request):
+        """Monthly counts of the notifications retention has removed, newest first."""
+        digests = NotificationDigest.objects.filter(user=request.user)
+        return Response({'results': NotificationDigestSerializer(digests, many=True).data})
+
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().filter(is_read=False).update(is_read=True)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        if self.get_queryset().filter(is_read=False).update(is_read=True):
+            NotificationVersion.bump([request.user.id])
+        events.publish_unread_count(request.user.id, 0)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+async def notification_stream(request):
+    """
+    Server-sent event stream of the user's new notifications.
+
+    EventSource cannot send headers, so the token comes as ``?token=``;
+    the session cookie works too. On reconnect the browser sends
+    ``Last-Event-ID`` and anything missed meanwhile is replayed first.
+    Needs an ASGI server: under WSGI a streaming response would hold a
+    worker thread for the lifetime of the connection.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Notification streaming requires the ASGI server; poll /notifications/?since_id= instead.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    user = await _stream_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('since') or 0)
+    except ValueError:
+        last_id = 0
+
+    response = StreamingHttpResponse(_notification_events(user.id, last_id),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _stream_user(request):
+    key = request.GET.get('token')
+    if key:
+        try:
+            user, _ = await sync_to_async(authentication.resolve)(key)
+        except AuthenticationFailed:
+            return None
+        return user
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def _notification_events(user_id, last_id):
+    broker = events.get_broker()
+    # Subscribe before reading the backlog so nothing falls in between;
+    # clients drop the occasional duplicate by id
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f'retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n'
+
+        notifications = Notification.objects.filter(recipient_id=user_id)
+        if last_id:
+            missed = notifications.filter(id__gt=last_id).select_related(
+                'session__skill', 'session__learner'
+            ).order_by('id')[:NOTIFICATION_DELTA_LIMIT]
+            async for notification in missed:
+                yield events.format_event({
+                    'event': 'notification',
+                    'id': notification.id,
+                    'data': {'notification': NotificationSerializer(notification).data, 'unread_delta': 0},
+                })
+        unread_count = await notifications.filter(is_read=False).acount()
+        yield events.format_event({'event': 'unread_count', 'data': {'unread_count': unread_count}})
+
+        keepalive = getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 25)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                # Comment frame: keeps proxies from timing out an idle stream
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                # Fell too far behind; the client reconnects with Last-Event-ID
+                return
+            yield events.format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
\ No newline at end of file
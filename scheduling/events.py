@@ -0,0 +1,135 @@
+# scheduling/events.py
+"""
+Fan-out of live notification events to connected clients.
+
+Views never talk to the stream directly: a committed Notification (or a
+"mark all read") is published to the configured broker, and every open
+event stream of that user receives it. ``LocalBroker`` keeps subscribers in
+this process, which is enough for a single ASGI worker; a deployment with
+several workers points ``NOTIFICATION_BROKER`` at a broker class that
+relays through a shared service, with the same ``subscribe`` /
+``unsubscribe`` / ``publish`` interface.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """One open event stream; events arrive on an asyncio queue."""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind reconnects and catches up from the DB
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process pub/sub keyed by user id."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_id, event):
+        """Thread-safe: may be called from sync views or worker threads."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'NOTIFICATION_BROKER', 'scheduling.events.LocalBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+def publish_notification(notification):
+    """Pushes ``notification`` to its recipient's streams once committed."""
+    transaction.on_commit(lambda: _publish_notification(notification))
+
+
+def _publish_notification(notification):
+    from .serializers import NotificationSerializer
+
+    broker = get_broker()
+    if not getattr(broker, 'has_subscribers', lambda user_id: True)(notification.recipient_id):
+        # Nobody is listening: skip the serialization work
+        return
+    broker.publish(notification.recipient_id, {
+        'event': 'notification',
+        'id': notification.id,
+        'data': {
+            'notification': NotificationSerializer(notification).data,
+            'unread_delta': 0 if notification.is_read else 1,
+        },
+    })
+
+
+def publish_unread_count(user_id, unread_count):
+    """Tells every open tab of ``user_id`` the new unread total."""
+    transaction.on_commit(lambda: get_broker().publish(user_id, {
+        'event': 'unread_count',
+        'data': {'unread_count': unread_count},
+    }))
+
+
+def format_event(event):
+    """Encodes an event dict as a server-sent event frame."""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    if event.get('event'):
+        lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event.get('data', {}), default=str)}")
+    return '\n'.join(lines) + '\n\n'
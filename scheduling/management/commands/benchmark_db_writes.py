@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from skillswap_project import benchmarking
+
+# name -> environment overrides (see skillswap_project/database.py)
+PROFILES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNED': '0'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNED': '1'},
+    'postgresql': {'DB_ENGINE': 'postgresql'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent writers against a scratch database for each database '
+        'profile and compares throughput, latency and "database is locked" '
+        'failures. Every writer is a separate process (as web server workers '
+        'are) that books sessions as a learner and confirms them as the '
+        'teacher, through the real endpoints, so each booking runs the '
+        'session, notification and derived-table writes of perform_create and '
+        'update_status. The postgresql profile uses a throwaway test_ database '
+        'next to the one the POSTGRES_* variables name.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help='Profile to run (repeatable; default: both SQLite profiles)')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent writer processes')
+        parser.add_argument('--bookings', type=int, default=50, help='Bookings per writer')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch SQLite files')
+        # Internal: what a child process does
+        parser.add_argument('--role', choices=['setup', 'worker', 'teardown'], help=argparse.SUPPRESS)
+        parser.add_argument('--index', type=int, default=0, help=argparse.SUPPRESS)
+        parser.add_argument('--database', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['role'] == 'setup':
+            return self.setup(options)
+        if options['role'] == 'worker':
+            return self.worker(options)
+        if options['role'] == 'teardown':
+            connection.creation.destroy_test_db(options['database'], verbosity=0)
+            return
+
+        directory = tempfile.mkdtemp()
+        results = {}
+        try:
+            for name in options['profile'] or ['sqlite-default', 'sqlite-tuned']:
+                env = dict(os.environ, **PROFILES[name])
+                if name.startswith('sqlite'):
+                    env['SQLITE_PATH'] = os.path.join(directory, f'{name}.sqlite3')
+                results[name] = self.run_profile(name, env, options)
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Scratch databases kept in {directory}')
+            else:
+                for filename in os.listdir(directory):
+                    os.remove(os.path.join(directory, filename))
+                os.rmdir(directory)
+        self.report(results, options)
+
+    # --- parent ---
+
+    def child(self, role, env, *extra, **popen):
+        command = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_db_writes',
+                   '--role', role, *extra]
+        return subprocess.Popen(command, env=env, text=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, **popen)
+
+    def read_result(self, process, role):
+        line = process.stdout.readline()
+        if not line:
+            process.wait()
+            raise CommandError(f'{role} process exited with status {process.returncode}')
+        return json.loads(line)
+
+    def run_profile(self, name, env, options):
+        self.stdout.write(f'{name}: seeding...')
+        setup = self.child('setup', env, '--users', str(options['users']))
+        database = self.read_result(setup, 'setup')
+        setup.wait()
+        if name == 'postgresql':
+            # Workers use the throwaway database setup created
+            env = dict(env, POSTGRES_DB=database['name'])
+
+        try:
+            workers = [
+                self.child('worker', env, '--index', str(index), '--bookings', str(options['bookings']))
+                for index in range(options['workers'])
+            ]
+            # Start writing only once every worker has started Django
+            for worker in workers:
+                self.read_result(worker, 'worker')
+            for worker in workers:
+                worker.stdin.write('go\n')
+                worker.stdin.flush()
+            runs = [self.read_result(worker, 'worker') for worker in workers]
+            for worker in workers:
+                worker.wait()
+        finally:
+            if name == 'postgresql':
+                self.child('teardown', env, '--database', database['original']).communicate()
+
+        latencies = sorted(latency for run in runs for latency in run['latencies'])
+        elapsed = max(run['finished'] for run in runs) - min(run['started'] for run in runs)
+        return {
+            'writes': len(latencies),
+            'locked': sum(run['locked'] for run in runs),
+            'errors': sum(run['errors'] for run in runs),
+            'throughput': len(latencies) / elapsed if elapsed else 0,
+            'p50': benchmarking.percentile(latencies, 50),
+            'p95': benchmarking.percentile(latencies, 95),
+            'p99': benchmarking.percentile(latencies, 99),
+        }
+
+    def report(self, results, options):
+        self.stdout.write('')
+        self.stdout.write(f"{options['workers']} writers x {options['bookings']} bookings (2 writes each)")
+        self.stdout.write(f"{'profile':<16}{'ok writes':>10}{'locked':>8}{'errors':>8}{'writes/s':>10}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, result in results.items():
+            percentiles = ''.join(
+                f'{result[key]:>9.1f}' if result[key] is not None else f"{'-':>9}" for key in ('p50', 'p95', 'p99')
+            )
+            self.stdout.write(f"{name:<16}{result['writes']:>10}{result['locked']:>8}{result['errors']:>8}"
+                              f"{result['throughput']:>10.1f}{percentiles}")
+
+    # --- children ---
+
+    def setup(self, options):
+        original = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            call_command('migrate', verbosity=0, interactive=False)
+        else:
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        benchmarking.seed(users=options['users'], skills=20, sessions_per_user=2, notifications_per_user=5)
+        self.emit({'name': connection.settings_dict['NAME'], 'original': str(original)})
+
+    def worker(self, options):
+        from django.test.utils import setup_test_environment
+        from rest_framework.authtoken.models import Token
+        from rest_framework.test import APIClient
+
+        from skills.models import Skill
+
+        setup_test_environment(debug=False)
+        accounts = list(Token.objects.values_list('user_id', 'key'))
+        skill_ids = list(Skill.objects.values_list('pk', flat=True))
+        rng = random.Random(options['index'])
+        client = APIClient()
+        now = timezone.now()
+        latencies, locked, errors = [], 0, 0
+
+        def write(key, path, data):
+            nonlocal locked, errors
+            client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+            started = time.perf_counter()
+            try:
+                response = client.post(path, data, format='json')
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                locked += 1
+                return None
+            if response.status_code >= 400:
+                errors += 1
+                return None
+            latencies.append((time.perf_counter() - started) * 1000)
+            return response
+
+        self.emit({'ready': True})
+        sys.stdin.readline()
+        started = time.time()
+        for _ in range(options['bookings']):
+            (learner_id, learner_key), (teacher_id, teacher_key) = rng.sample(accounts, 2)
+            start = timezone.localtime(now + timedelta(days=rng.randint(1, 365), minutes=rng.randrange(0, 1440, 15)))
+            window = {
+                'scheduled_time': start.strftime('%Y-%m-%dT%H:%M'),
+                'end_time': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            }
+            response = write(learner_key, '/api/sessions/', {
+                'teacher_id': teacher_id, 'skill_id': rng.choice(skill_ids), **window,
+            })
+            if response is not None:
+                write(teacher_key, f"/api/sessions/{response.data['id']}/update_status/",
+                      {'status': 'confirmed', 'allow_overlap': True, **window})
+        self.emit({'started': started, 'finished': time.time(),
+                   'latencies': latencies, 'locked': locked, 'errors': errors})
+
+    def emit(self, data):
+        # One JSON line per message to the parent
+        sys.stdout.write(json.dumps(data) + '\n')
+        sys.stdout.flush()
@@ -0,0 +1,225 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.db.utils import ConnectionHandler
+from django.utils import timezone
+
+from scheduling.models import Session, Notification
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a scratch SQLite database with sessions and notifications and '
+        'compares query plans and timings of the dashboard/notification hot '
+        'paths before and after the composite indexes replace the single-column '
+        'foreign key indexes.'
+    )
+
+    # The foreign key indexes the composite indexes made redundant
+    # (scheduling migration 0014)
+    FK_INDEXES = {
+        'benchmark_session_teacher': ('scheduling_session', 'teacher_id'),
+        'benchmark_session_learner': ('scheduling_session', 'learner_id'),
+        'benchmark_notification_recipient': ('scheduling_notification', 'recipient_id'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=1_000_000)
+        parser.add_argument('--notifications', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Executions per query and phase')
+        parser.add_argument('--path', help='Scratch database file (defaults to a temp file)')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        directory = None if options['path'] else tempfile.mkdtemp()
+        path = options['path'] or os.path.join(directory, 'benchmark_indexes.sqlite3')
+        if os.path.exists(path):
+            os.remove(path)
+        self.random = random.Random(options['seed'])
+        self.users = options['users']
+
+        connection = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path},
+        })['default']
+        try:
+            self.create_tables(connection)
+            self.seed(connection, options['sessions'], options['notifications'])
+
+            queries = self.hot_path_queries(connection)
+            before = self.measure(connection, queries, options['repeat'])
+
+            started = time.perf_counter()
+            self.add_indexes(connection)
+            self.stdout.write(f'Swapped in the composite indexes in {time.perf_counter() - started:.1f}s')
+
+            after = self.measure(connection, queries, options['repeat'])
+            self.report(queries, before, after)
+        finally:
+            connection.close()
+            if not options['keep']:
+                os.remove(path)
+                if directory:
+                    os.rmdir(directory)
+            else:
+                self.stdout.write(f'Scratch database kept at {path}')
+
+    def create_tables(self, connection):
+        """Creates the tables as they were before 0008: foreign key indexes only."""
+        with connection.schema_editor() as editor:
+            for model in (Session, Notification):
+                editor.create_model(model)
+        with connection.schema_editor() as editor:
+            for model in (Session, Notification):
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+            for name, (table, column) in self.FK_INDEXES.items():
+                editor.execute(f'CREATE INDEX "{name}" ON "{table}" ("{column}")')
+
+    def add_indexes(self, connection):
+        # The scratch tables reference users/skills that don't exist, so run
+        # the index DDL directly rather than through a constraint-checking
+        # schema editor block.
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for model in (Session, Notification):
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.create_sql(model, editor)))
+            for name in self.FK_INDEXES:
+                cursor.execute(f'DROP INDEX "{name}"')
+            cursor.execute('ANALYZE')
+
+    def seed(self, connection, session_count, notification_count, chunk_size=100_000):
+        connection.ensure_connection()
+        raw = connection.connection
+        raw.execute('PRAGMA journal_mode=OFF')
+        raw.execute('PRAGMA synchronous=OFF')
+        # Only the scheduling tables exist in the scratch database
+        raw.execute('PRAGMA foreign_keys=OFF')
+        now = timezone.now()
+        # Long-lived accounts are mostly history: few sessions are still active
+        statuses = ['completed'] * 16 + ['cancelled'] * 2 + ['pending', 'confirmed']
+        rand = self.random
+
+        def sessions():
+            for _ in range(session_count):
+                start = now + timedelta(minutes=rand.randint(-525_600, 525_600))
+                yield (rand.randint(1, self.users), rand.randint(1, self.users), 1,
+                       start.isoformat(' '), (start + timedelta(hours=1)).isoformat(' '),
+                       rand.choice(statuses))
+
+        def notifications():
+            for _ in range(notification_count):
+                created = now - timedelta(seconds=rand.randint(0, 3 * 365 * 86400))
+                yield (rand.randint(1, self.users), 'Benchmark notification',
+                       rand.random() < 0.9, created.isoformat(' '))
+
+        started = time.perf_counter()
+        self.insert(raw, 'INSERT INTO scheduling_session '
+                         '(teacher_id, learner_id, skill_id, scheduled_time, end_time, status) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', sessions(), chunk_size)
+        self.insert(raw, 'INSERT INTO scheduling_notification '
+                         '(recipient_id, message, is_read, created_at) '
+                         'VALUES (?, ?, ?, ?)', notifications(), chunk_size)
+        raw.execute('ANALYZE')
+        self.stdout.write(
+            f'Seeded {session_count} sessions and {notification_count} notifications '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+
+    def insert(self, raw, sql, rows, chunk_size):
+        # Django runs SQLite in autocommit mode; batch rows into explicit
+        # transactions or every row becomes its own commit.
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                self.insert_chunk(raw, sql, chunk)
+                chunk = []
+        self.insert_chunk(raw, sql, chunk)
+
+    def insert_chunk(self, raw, sql, chunk):
+        raw.execute('BEGIN')
+        raw.executemany(sql, chunk)
+        raw.execute('COMMIT')
+
+    def hot_path_queries(self, connection):
+        """
+        The ORM queries behind dashboard, profile and notification requests,
+        compiled for the scratch connection, as {name: [(sql, params), ...]}:
+        the session list and calendar read the teacher and learner sides
+        separately (see KeysetPagination.paginate_union). ``0`` stands in
+        for the user id.
+        """
+        user = 0
+        involved = Q(teacher_id=user) | Q(learner_id=user)
+        sides = [Q(teacher_id=user), Q(learner_id=user)]
+        active = ['pending', 'confirmed']
+        latest = (F('scheduled_time').desc(nulls_last=True), '-id')
+        soonest = (F('scheduled_time').asc(nulls_last=True), 'id')
+        querysets = {
+            'busy check': [Session.objects.filter(involved, status__in=active).values('id')[:1]],
+            'calendar': [Session.objects.filter(side, status__in=active).order_by(*soonest)[:21] for side in sides],
+            'session list': [Session.objects.filter(side).order_by(*latest)[:21] for side in sides],
+            'unread count': [Notification.objects.filter(recipient_id=user, is_read=False).order_by().values('id')],
+            'notification feed': [Notification.objects.filter(recipient_id=user).order_by('-created_at', '-id')[:21]],
+        }
+        queries = {}
+        for name, parts in querysets.items():
+            queries[name] = []
+            for queryset in parts:
+                sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+                if name == 'unread count':
+                    sql = f'SELECT COUNT(*) FROM ({sql})'
+                queries[name].append((sql, params))
+        return queries
+
+    def bind(self, params, user_id):
+        return [user_id if value == 0 else value for value in params]
+
+    def measure(self, connection, queries, repeat):
+        results = {}
+        user_ids = [self.random.randint(1, self.users) for _ in range(repeat)]
+        with connection.cursor() as cursor:
+            for name, parts in queries.items():
+                plan = []
+                for sql, params in parts:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, self.bind(params, user_ids[0]))
+                    plan.extend(row[-1] for row in cursor.fetchall())
+                timings = []
+                for user_id in user_ids:
+                    started = time.perf_counter()
+                    for sql, params in parts:
+                        cursor.execute(sql, self.bind(params, user_id))
+                        cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                results[name] = {'plan': plan, 'timings': sorted(timings)}
+        return results
+
+    def summarize(self, timings):
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return statistics.mean(timings), p95
+
+    def report(self, queries, before, after):
+        self.stdout.write('')
+        self.stdout.write(f"{'query':<20}{'before mean/p95 ms':>22}{'after mean/p95 ms':>22}{'speedup':>10}")
+        for name in queries:
+            before_mean, before_p95 = self.summarize(before[name]['timings'])
+            after_mean, after_p95 = self.summarize(after[name]['timings'])
+            self.stdout.write(
+                f'{name:<20}{before_mean:>12.3f} / {before_p95:<8.3f}'
+                f'{after_mean:>12.3f} / {after_p95:<8.3f}'
+                f'{before_mean / after_mean if after_mean else float("inf"):>9.1f}x'
+            )
+        for name in queries:
+            self.stdout.write(f'\n{name}')
+            self.stdout.write('  before: ' + '; '.join(before[name]['plan']))
+            self.stdout.write('  after:  ' + '; '.join(after[name]['plan']))
@@ -0,0 +1,55 @@
+import gzip
+import os
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from scheduling import retention
+
+
+class Command(BaseCommand):
+    help = ('Folds notifications past retention into monthly per-user digests and deletes them in '
+            'small batches, optionally archiving them to gzip-compressed JSON Lines first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int,
+                            help='Keep read notifications this many days (default NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--unread-days', type=int,
+                            help='Keep unread notifications this many days '
+                                 '(default NOTIFICATION_UNREAD_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE,
+                            help='Rows per transaction')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, to leave room for other writers')
+        parser.add_argument('--archive-dir',
+                            help='Append the deleted rows to notifications-<timestamp>.jsonl.gz in this directory')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be pruned')
+
+    def handle(self, *args, **options):
+        queryset = retention.expired(read_days=options['read_days'], unread_days=options['unread_days'])
+        if options['dry_run']:
+            self.stdout.write(f'{queryset.count()} notification(s) are past retention.')
+            return
+
+        path = None
+        if options['archive_dir']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            path = os.path.join(options['archive_dir'],
+                                f'notifications-{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz')
+
+        started = time.perf_counter()
+        with gzip.open(path, 'wt', encoding='utf-8') if path else nullcontext() as archive:
+            stats = retention.prune(queryset, batch_size=options['batch_size'], archive=archive,
+                                    pause=options['pause'])
+        if path and not stats['deleted']:
+            os.remove(path)
+            path = None
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {stats['deleted']} notification(s) of {stats['users']} user(s) in {stats['batches']} "
+            f"batch(es), {time.perf_counter() - started:.1f}s."
+        ))
+        if path:
+            self.stdout.write(f'Archived to {path}')
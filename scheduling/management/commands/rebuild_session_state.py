@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from scheduling.models import ActiveSessionState
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or with --verify, checks) the per-user active session state from Session.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare the stored state with Session and report mismatches')
+
+    def handle(self, *args, **options):
+        expected = {
+            user_id: totals for user_id, totals in ActiveSessionState.compute().items()
+            if totals[0]
+        }
+
+        if options['verify']:
+            stored = {
+                user_id: (count, latest)
+                for user_id, count, latest in ActiveSessionState.objects.filter(
+                    active_count__gt=0
+                ).values_list('user_id', 'active_count', 'latest_end_time')
+            }
+            mismatched = sorted(
+                user_id for user_id in set(expected) | set(stored)
+                if expected.get(user_id) != stored.get(user_id)
+            )
+            for user_id in mismatched:
+                self.stdout.write(
+                    f'user {user_id}: stored {stored.get(user_id)}, expected {expected.get(user_id)}'
+                )
+            if mismatched:
+                raise CommandError(f'{len(mismatched)} user(s) have stale active session state.')
+            self.stdout.write(self.style.SUCCESS(f'Active session state verified for {len(expected)} busy user(s).'))
+            return
+
+        with transaction.atomic():
+            ActiveSessionState.objects.all().delete()
+            ActiveSessionState.objects.bulk_create(
+                [ActiveSessionState(user_id=user_id, active_count=count, latest_end_time=latest)
+                 for user_id, (count, latest) in expected.items()],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(f'Active session state rebuilt for {len(expected)} busy user(s).'))
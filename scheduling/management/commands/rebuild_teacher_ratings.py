@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from scheduling.models import TeacherRating
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or with --verify, checks) the per-teacher rating aggregates from Feedback.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare the stored aggregates with Feedback and report mismatches')
+
+    def handle(self, *args, **options):
+        expected = TeacherRating.compute()
+
+        if options['verify']:
+            stored = {
+                (rating.teacher_id, rating.skill_id): (rating.count, rating.total, rating.histogram)
+                for rating in TeacherRating.objects.filter(count__gt=0)
+            }
+            mismatched = sorted(
+                (key for key in set(expected) | set(stored) if expected.get(key) != stored.get(key)),
+                key=lambda key: (key[0], key[1] or 0)
+            )
+            for teacher_id, skill_id in mismatched:
+                key = (teacher_id, skill_id)
+                self.stdout.write(
+                    f'teacher {teacher_id}, skill {skill_id}: stored {stored.get(key)}, expected {expected.get(key)}'
+                )
+            if mismatched:
+                raise CommandError(f'{len(mismatched)} rating aggregate(s) are stale.')
+            self.stdout.write(self.style.SUCCESS(f'Rating aggregates verified for {len(expected)} teacher/skill pair(s).'))
+            return
+
+        with transaction.atomic():
+            TeacherRating.objects.all().delete()
+            TeacherRating.objects.bulk_create(
+                [TeacherRating(teacher_id=teacher_id, skill_id=skill_id, count=count, total=total,
+                               **dict(zip(TeacherRating.HISTOGRAM_FIELDS, histogram)))
+                 for (teacher_id, skill_id), (count, total, histogram) in expected.items()],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(f'Rating aggregates rebuilt for {len(expected)} teacher/skill pair(s).'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0007_session_end_time'),
+        ('skills', '0002_category_skill_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='notification_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='notification_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['teacher', 'scheduled_time'], name='session_teacher_time'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['learner', 'scheduled_time'], name='session_learner_time'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['teacher', 'status', 'scheduled_time'], name='session_teacher_status'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['learner', 'status', 'scheduled_time'], name='session_learner_status'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def build_session_state(apps, schema_editor):
+    Session = apps.get_model('scheduling', 'Session')
+    ActiveSessionState = apps.get_model('scheduling', 'ActiveSessionState')
+    sessions = Session.objects.filter(status__in=['pending', 'confirmed']).order_by()
+
+    totals = {}
+    for field in ('teacher_id', 'learner_id'):
+        grouped = sessions.values_list(field).annotate(count=Count('id'), latest=Max('end_time'))
+        for user_id, count, latest in grouped:
+            total, current = totals.get(user_id, (0, None))
+            if current is None or (latest is not None and latest > current):
+                current = latest
+            totals[user_id] = (total + count, current)
+
+    ActiveSessionState.objects.bulk_create(
+        [ActiveSessionState(user_id=user_id, active_count=count, latest_end_time=latest)
+         for user_id, (count, latest) in totals.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('scheduling', '0008_session_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveSessionState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='active_session_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_count', models.PositiveIntegerField(default=0)),
+                ('latest_end_time', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_session_state, migrations.RunPython.noop),
+    ]
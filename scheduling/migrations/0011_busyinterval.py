@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_busy_intervals(apps, schema_editor):
+    Session = apps.get_model('scheduling', 'Session')
+    BusyInterval = apps.get_model('scheduling', 'BusyInterval')
+    sessions = Session.objects.filter(
+        status='confirmed', scheduled_time__isnull=False, end_time__isnull=False
+    ).values_list('id', 'teacher_id', 'learner_id', 'scheduled_time', 'end_time')
+
+    BusyInterval.objects.bulk_create(
+        [BusyInterval(user_id=user_id, session_id=session_id, start=start, end=end)
+         for session_id, teacher_id, learner_id, start, end in sessions.iterator()
+         for user_id in {teacher_id, learner_id}],
+        batch_size=1000
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0010_notificationversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='busy_intervals', to='scheduling.session')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='busy_intervals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'end', 'start'], name='busy_interval_lookup')],
+            },
+        ),
+        migrations.RunPython(build_busy_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_teacher_ratings(apps, schema_editor):
+    Feedback = apps.get_model('scheduling', 'Feedback')
+    TeacherRating = apps.get_model('scheduling', 'TeacherRating')
+
+    rows = {}
+    grouped = Feedback.objects.order_by().values_list(
+        'session__teacher_id', 'session__skill_id', 'rating'
+    ).annotate(count=Count('id'))
+    for teacher_id, skill_id, rating, count in grouped:
+        row = rows.setdefault((teacher_id, skill_id), TeacherRating(teacher_id=teacher_id, skill_id=skill_id))
+        row.count += count
+        row.total += rating * count
+        setattr(row, f'rating_{rating}', getattr(row, f'rating_{rating}') + count)
+    TeacherRating.objects.bulk_create(rows.values(), batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0011_busyinterval'),
+        ('skills', '0002_category_skill_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('skill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='skills.skill')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teacher_ratings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'skill'), name='unique_teacher_rating')],
+            },
+        ),
+        migrations.RunPython(build_teacher_ratings, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, Count, Max, F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from skills.models import Skill
 from datetime import timedelta  # <-- 1. IMPORT timedelta
+from . import events, notifications
 
 class Session(models.Model):
     STATUS_CHOICES = (
@@ -11,8 +15,9 @@ class Session(models.Model):
         ('cancelled', 'Cancelled'),
     )
     
-    teacher = models.ForeignKey(User, related_name='teaching_sessions', on_delete=models.CASCADE)
-    learner = models.ForeignKey(User, related_name='learning_sessions', on_delete=models.CASCADE)
+    # No single-column indexes: the composite indexes below start with these
+    teacher = models.ForeignKey(User, related_name='teaching_sessions', on_delete=models.CASCADE, db_index=False)
+    learner = models.ForeignKey(User, related_name='learning_sessions', on_delete=models.CASCADE, db_index=False)
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE, null=True, blank=True)
     scheduled_time = models.DateTimeField(null=True, blank=True)
     
@@ -23,6 +28,24 @@ class Session(models.Model):
     meeting_link = models.URLField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
 
+    # Statuses that keep a teacher/learner "busy"
+    ACTIVE_STATUSES = ('pending', 'confirmed')
+    # ActiveSessionState and BusyInterval are derived from these
+    TRACKED_FIELDS = ('teacher_id', 'learner_id', 'status', 'scheduled_time', 'end_time')
+
+    class Meta:
+        indexes = [
+            # Session list and calendar: each side of (teacher OR learner)
+            # is read in time order, a page at a time, and the two merged
+            # (KeysetPagination.paginate_union); an OR in one query would
+            # sort the user's whole history
+            models.Index(fields=['teacher', 'scheduled_time'], name='session_teacher_time'),
+            models.Index(fields=['learner', 'scheduled_time'], name='session_learner_time'),
+            # Busy checks and the calendar only look at active sessions
+            models.Index(fields=['teacher', 'status', 'scheduled_time'], name='session_teacher_status'),
+            models.Index(fields=['learner', 'status', 'scheduled_time'], name='session_learner_status'),
+        ]
+
     def __str__(self):
         return f'{self.skill.name} session with {self.teacher.username} and {self.learner.username}'
 
@@ -32,7 +55,41 @@ class Session(models.Model):
     def save(self, *args, **kwargs):
         if self.scheduled_time and not self.end_time:
             self.end_time = self.scheduled_time + timedelta(hours=1)
-        super().save(*args, **kwargs)
+
+        # Only a change to a tracked field (that this save writes) moves the
+        # participants' ActiveSessionState and BusyInterval rows, including
+        # whoever was on the session before a reassignment
+        loaded = getattr(self, '_loaded_values', None)
+        tracked = self.TRACKED_FIELDS
+        if kwargs.get('update_fields') is not None:
+            saved = {self._meta.get_field(name).attname for name in kwargs['update_fields']}
+            tracked = [name for name in tracked if name in saved]
+        tracked = [name for name in tracked if name in self.__dict__]
+        changed = loaded is None or any(loaded.get(name) != getattr(self, name) for name in tracked)
+
+        if not changed:
+            super().save(*args, **kwargs)
+            return
+        participants = {self.teacher_id, self.learner_id}
+        if loaded is not None:
+            participants |= {loaded.get('teacher_id'), loaded.get('learner_id')} - {None}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ActiveSessionState.refresh(participants)
+            BusyInterval.sync([self])
+        self._snapshot(tracked if loaded is not None else self.TRACKED_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot(cls.TRACKED_FIELDS)
+        return instance
+
+    def _snapshot(self, names):
+        # Remember the persisted values so save() can tell what changed
+        loaded = getattr(self, '_loaded_values', {})
+        loaded.update((name, getattr(self, name)) for name in names if name in self.__dict__)
+        self._loaded_values = loaded
 
 class Feedback(models.Model):
     RATING_CHOICES = [(i, str(i)) for i in range(1, 6)]
@@ -44,9 +101,17 @@ class Feedback(models.Model):
 
     def __str__(self):
         return f'Feedback for session {self.session.id}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets TeacherRating retract the old value when a rating is edited
+        instance._loaded_rating = getattr(instance, 'rating', None)
+        return instance
     
 class Notification(models.Model):
-    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # Indexed by notification_feed, which starts with it
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', db_index=False)
     session = models.ForeignKey(Session, on_delete=models.CASCADE, null=True, blank=True)
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
@@ -55,5 +120,374 @@ class Notification(models.Model):
     def __str__(self):
         return f'Notification for {self.recipient.username}: {self.message}'
 
+    @classmethod
+    def bulk_send(cls, notifications):
+        """
+        Inserts ``notifications`` in one query and does what post_save does
+        for a single insert: bump the recipients' versions and publish.
+        """
+        notifications = cls.objects.bulk_create(notifications)
+        NotificationVersion.bump(notification.recipient_id for notification in notifications)
+        for notification in notifications:
+            events.publish_notification(notification)
+        return notifications
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Notification feed for one recipient, newest first
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_feed'),
+            # Unread badge count and mark_all_read
+            models.Index(fields=['recipient', '-created_at'], name='notification_unread',
+                         condition=Q(is_read=False)),
+        ]
+
+
+class NotificationDigest(models.Model):
+    """
+    What retention removed from a user's notifications, per calendar month:
+    how many there were and when the first and last arrived. Written by
+    ``prune_notifications`` (see scheduling/retention.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_digests')
+    # First day of the month, in the project's timezone
+    month = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_notification_digest'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.count} notification(s) in {self.month:%B %Y}'
+
+
+class ActiveSessionState(models.Model):
+    """
+    Denormalized per-user summary of pending/confirmed sessions, so "is this
+    user busy, and until when?" is a single-row read instead of an OR-join
+    and MAX() over Session. Maintained by Session.save() and session deletes;
+    ``rebuild_session_state`` recomputes or verifies it from scratch.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='active_session_state')
+    active_count = models.PositiveIntegerField(default=0)
+    latest_end_time = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user.username}: {self.active_count} active session(s)'
+
+    @property
+    def is_busy(self):
+        return self.active_count > 0
+
+    @staticmethod
+    def compute(user_ids=None):
+        """
+        Returns {user_id: (active_count, latest_end_time)} straight from
+        Session, for ``user_ids`` or for every user when None.
+        """
+        sessions = Session.objects.filter(status__in=Session.ACTIVE_STATUSES)
+        if user_ids is not None:
+            sessions = sessions.filter(Q(teacher_id__in=user_ids) | Q(learner_id__in=user_ids))
+
+        totals = {}
+        for field in ('teacher_id', 'learner_id'):
+            grouped = sessions.order_by().values_list(field).annotate(
+                count=Count('id'), latest=Max('end_time')
+            )
+            for user_id, count, latest in grouped:
+                if user_ids is not None and user_id not in user_ids:
+                    continue
+                total, current = totals.get(user_id, (0, None))
+                if current is None or (latest is not None and latest > current):
+                    current = latest
+                totals[user_id] = (total + count, current)
+        return totals
+
+    @classmethod
+    def refresh(cls, user_ids, create=True):
+        """
+        Recomputes the rows for ``user_ids``. With ``create=False`` only
+        existing rows are updated (used while users may be mid-delete).
+        """
+        user_ids = set(user_ids) - {None}
+        if not user_ids:
+            return
+        totals = cls.compute(user_ids)
+        rows = [
+            cls(user_id=user_id, active_count=totals.get(user_id, (0, None))[0],
+                latest_end_time=totals.get(user_id, (0, None))[1])
+            for user_id in user_ids
+        ]
+        with transaction.atomic():
+            if create:
+                cls.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=['user'],
+                    update_fields=['active_count', 'latest_end_time']
+                )
+            else:
+                for row in rows:
+                    cls.objects.filter(user_id=row.user_id).update(
+                        active_count=row.active_count, latest_end_time=row.latest_end_time
+                    )
+
+class NotificationVersion(models.Model):
+    """
+    Per-recipient change counter for notifications, bumped whenever one is
+    created or they are marked read. Clients poll with the version as an
+    ETag and get 304 Not Modified from a single-row read while it holds.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='notification_version')
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user.username}: notifications v{self.version}'
+
+    @classmethod
+    def current(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, user_ids):
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        # Create missing counters, then increment in SQL so concurrent bumps
+        # never collapse into one
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        cls.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+
+
+class BusyInterval(models.Model):
+    """
+    Time a user is booked: one row per participant of every confirmed
+    session with a time window. Maintained by Session.save() and the bulk
+    status path through ``sync``.
+
+    Overlap lookups seek the (user, end) index to "ends after my start",
+    which skips a user's past sessions entirely, so their cost does not
+    grow with history.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='busy_intervals')
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='busy_intervals')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['user', 'end', 'start'], name='busy_interval_lookup'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} busy {self.start} - {self.end}'
+
+    @staticmethod
+    def windows_for(session):
+        """The (user_id, start, end) rows a session should have."""
+        if session.status != 'confirmed' or not session.scheduled_time or not session.end_time:
+            return []
+        return [(user_id, session.scheduled_time, session.end_time)
+                for user_id in {session.teacher_id, session.learner_id}]
+
+    @classmethod
+    def sync(cls, sessions):
+        """Rewrites the intervals of ``sessions`` from their current state."""
+        sessions = list(sessions)
+        if not sessions:
+            return
+        with transaction.atomic():
+            cls.objects.filter(session__in=[session.pk for session in sessions]).delete()
+            cls.objects.bulk_create([
+                cls(user_id=user_id, session_id=session.pk, start=start, end=end)
+                for session in sessions
+                for user_id, start, end in cls.windows_for(session)
+            ])
+
+    @staticmethod
+    def lock(user_ids):
+        """
+        Locks the users' rows until the transaction ends, so confirmations
+        involving the same people check for conflicts and book one after
+        another. Call inside transaction.atomic(), before find_conflicts.
+        SQLite has no row locks; its single writer lock serializes them.
+        """
+        list(User.objects.select_for_update().filter(pk__in=set(user_ids)).order_by('pk').values_list('pk'))
+
+    @classmethod
+    def find_conflicts(cls, windows):
+        """
+        ``windows`` is a list of (session, start, end) about to be
+        confirmed. Returns {session_id: [conflicting session ids]} for the
+        ones that overlap an existing booking of either participant, or an
+        earlier window in the same list. One query.
+        """
+        if not windows:
+            return {}
+        user_ids = {user_id for session, _, _ in windows for user_id in (session.teacher_id, session.learner_id)}
+        moving = {session.pk for session, _, _ in windows}
+        booked = {}
+        existing = cls.objects.filter(
+            user_id__in=user_ids,
+            end__gt=min(start for _, start, _ in windows),
+            start__lt=max(end for _, _, end in windows),
+        ).exclude(session_id__in=moving).values_list('user_id', 'start', 'end', 'session_id')
+        for user_id, start, end, session_id in existing:
+            booked.setdefault(user_id, []).append((start, end, session_id))
+
+        conflicts = {}
+        for session, start, end in windows:
+            participants = {session.teacher_id, session.learner_id}
+            clashes = sorted({
+                other for user_id in participants for busy_start, busy_end, other in booked.get(user_id, ())
+                if busy_start < end and busy_end > start
+            })
+            if clashes:
+                conflicts[session.pk] = clashes
+                continue
+            for user_id in participants:
+                booked.setdefault(user_id, []).append((start, end, session.pk))
+        return conflicts
+
+    @classmethod
+    def free_windows(cls, user_ids, start, end):
+        """Gaps in [start, end) where none of ``user_ids`` is booked."""
+        busy = cls.objects.filter(
+            user_id__in=user_ids, end__gt=start, start__lt=end
+        ).order_by('start').values_list('start', 'end')
+
+        free, cursor = [], start
+        for busy_start, busy_end in busy:
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            if cursor >= end:
+                break
+        if cursor < end:
+            free.append((cursor, end))
+        return free
+
+
+class TeacherRating(models.Model):
+    """
+    Running feedback totals per (teacher, skill): count, sum and a 1-5
+    histogram, so profile pages never aggregate a teacher's whole feedback
+    history. Maintained incrementally by the Feedback signals below;
+    ``rebuild_teacher_ratings`` recomputes or verifies them.
+    """
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='teacher_ratings')
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    HISTOGRAM_FIELDS = ('rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['teacher', 'skill'], name='unique_teacher_rating'),
+        ]
+
+    def __str__(self):
+        return f'{self.teacher_id}/{self.skill_id}: {self.count} rating(s)'
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        return [getattr(self, field) for field in self.HISTOGRAM_FIELDS]
+
+    @classmethod
+    def apply(cls, teacher_id, skill_id, rating, sign):
+        """Adds (sign=1) or retracts (sign=-1) one rating."""
+        field = f'rating_{rating}'
+        rows = cls.objects.filter(teacher_id=teacher_id, skill_id=skill_id)
+        changes = {'count': F('count') + sign, 'total': F('total') + sign * rating, field: F(field) + sign}
+        if not rows.update(**changes) and sign > 0:
+            # Another writer may insert the row between the update and here;
+            # get_or_create then reads theirs, and the increment goes on top
+            cls.objects.get_or_create(teacher_id=teacher_id, skill_id=skill_id)
+            rows.update(**changes)
+
+    @staticmethod
+    def compute():
+        """
+        Returns {(teacher_id, skill_id): (count, total, histogram)} straight
+        from Feedback.
+        """
+        totals = {}
+        grouped = Feedback.objects.order_by().values_list(
+            'session__teacher_id', 'session__skill_id', 'rating'
+        ).annotate(count=Count('id'))
+        for teacher_id, skill_id, rating, count in grouped:
+            key = (teacher_id, skill_id)
+            total_count, total, histogram = totals.get(key, (0, 0, [0] * 5))
+            histogram[rating - 1] += count
+            totals[key] = (total_count + count, total + rating * count, histogram)
+        return totals
+
+    @staticmethod
+    def summarize(ratings):
+        """
+        Profile payload for a teacher's rows: overall count, average and
+        histogram, plus the same per skill.
+        """
+        def describe(count, total, histogram):
+            return {
+                'count': count,
+                'average': round(total / count, 2) if count else None,
+                'histogram': {str(stars): n for stars, n in enumerate(histogram, start=1)},
+            }
+
+        ratings = [rating for rating in ratings if rating.count]
+        histogram = [sum(rating.histogram[index] for rating in ratings) for index in range(5)]
+        summary = describe(sum(r.count for r in ratings), sum(r.total for r in ratings), histogram)
+        summary['by_skill'] = [
+            {'skill_id': rating.skill_id, 'skill_name': rating.skill.name if rating.skill else None,
+             **describe(rating.count, rating.total, rating.histogram)}
+            for rating in sorted(ratings, key=lambda rating: -rating.count)
+        ]
+        return summary
+
+
+@receiver(post_save, sender=Feedback)
+def add_feedback_to_rating(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_rating', None)
+    if not created and previous == instance.rating:
+        return
+    session = instance.session
+    with transaction.atomic():
+        if not created and previous is not None:
+            TeacherRating.apply(session.teacher_id, session.skill_id, previous, -1)
+        TeacherRating.apply(session.teacher_id, session.skill_id, instance.rating, 1)
+    instance._loaded_rating = instance.rating
+
+@receiver(post_delete, sender=Feedback)
+def remove_feedback_from_rating(sender, instance, **kwargs):
+    rating = getattr(instance, '_loaded_rating', None) or instance.rating
+    session = Session.objects.filter(pk=instance.session_id).values('teacher_id', 'skill_id').first()
+    if session:
+        TeacherRating.apply(session['teacher_id'], session['skill_id'], rating, -1)
+
+@receiver(post_delete, sender=Session)
+def update_state_for_deleted_session(sender, instance, **kwargs):
+    ActiveSessionState.refresh({instance.teacher_id, instance.learner_id}, create=False)
+
+
+@receiver(post_save, sender=Notification)
+def publish_new_notification(sender, instance, created, **kwargs):
+    if created:
+        NotificationVersion.bump([instance.recipient_id])
+        # Live streams get the row once the creating transaction commits
+        events.publish_notification(instance)
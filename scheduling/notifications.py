@@ -0,0 +1,135 @@
+# scheduling/notifications.py
+"""
+Creating notifications.
+
+``send`` and ``broadcast`` queue notifications on the current transaction
+instead of inserting them one by one. Everything queued in a transaction is
+written once it commits: the single notifications in one bulk insert, each
+broadcast in bulk inserts of ``CHUNK_SIZE`` rows. Every insert does what a
+single save would do (bump the recipients' NotificationVersion, publish to
+live streams); see ``Notification.bulk_send``. Outside a transaction the
+queue is written straight away, so wrap a view's writes in
+``transaction.atomic()`` to coalesce them. A rolled-back transaction sends
+nothing, and neither does a rolled-back savepoint: every queued item has
+its own commit callback, which Django discards with the block it was
+registered in, and the batch is written once the last surviving one runs.
+
+A broadcast takes user ids, or a queryset of users that is read in id
+order a chunk at a time, so fanning out to thousands of learners needs
+neither one query per learner nor the whole recipient list in memory.
+"""
+import threading
+import weakref
+from itertools import islice
+
+from django.db import transaction
+
+CHUNK_SIZE = 1000
+
+_local = threading.local()
+
+
+class Batch:
+    """What one transaction has queued."""
+
+    def __init__(self):
+        self.notifications = []
+        self.broadcasts = []
+        # Queued items whose commit callbacks haven't run or been discarded
+        self.pending = 0
+        self.flushed = False
+
+    def add(self, kind, item):
+        getattr(self, kind).append(item)
+
+    def settle(self):
+        self.pending -= 1
+        if not self.pending:
+            self.flush()
+
+    def flush(self):
+        from .models import Notification
+
+        self.flushed = True
+        if self.notifications:
+            Notification.bulk_send(self.notifications)
+        for recipients, message, session, chunk_size in self.broadcasts:
+            fan_out(recipients, message, session, chunk_size)
+
+
+class Queued:
+    """The commit callback of one queued item."""
+
+    def __init__(self, batch, kind, item):
+        self.batch = batch
+        self.kind = kind
+        self.item = item
+        # Django drops the callbacks of a rolled-back block, which frees
+        # them; the batch then stops waiting for this one
+        self.discarded = weakref.finalize(self, batch.settle)
+
+    def __call__(self):
+        self.discarded.detach()
+        self.batch.add(self.kind, self.item)
+        self.batch.settle()
+
+
+def _queue(kind, item):
+    if not transaction.get_connection().in_atomic_block:
+        batch = Batch()
+        batch.add(kind, item)
+        batch.flush()
+        return
+
+    batch = getattr(_local, 'batch', None)
+    if batch is None or batch.flushed:
+        batch = _local.batch = Batch()
+    batch.pending += 1
+    transaction.on_commit(Queued(batch, kind, item))
+
+
+def send(recipient, message, session=None):
+    """Queues one notification to ``recipient`` (a User or a user id)."""
+    from .models import Notification
+
+    recipient_id = getattr(recipient, 'pk', recipient)
+    _queue('notifications', Notification(recipient_id=recipient_id, session=session, message=message))
+
+
+def broadcast(recipients, message, session=None, chunk_size=CHUNK_SIZE):
+    """
+    Queues ``message`` to every user in ``recipients``: a User queryset,
+    evaluated when the transaction commits, or an iterable of user ids.
+    """
+    _queue('broadcasts', (recipients, message, session, chunk_size))
+
+
+def recipient_chunks(recipients, chunk_size=CHUNK_SIZE):
+    """Yields lists of at most ``chunk_size`` user ids."""
+    if hasattr(recipients, 'values_list'):
+        # Keyset walk, so no cursor stays open across the inserts
+        last = 0
+        while True:
+            chunk = list(recipients.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last = chunk[-1]
+    else:
+        recipients = iter(recipients)
+        while chunk := list(islice(recipients, chunk_size)):
+            yield chunk
+
+
+def fan_out(recipients, message, session=None, chunk_size=CHUNK_SIZE):
+    """Inserts the broadcast now. Returns the number of notifications sent."""
+    from .models import Notification
+
+    sent = 0
+    for chunk in recipient_chunks(recipients, chunk_size):
+        with transaction.atomic():
+            Notification.bulk_send([
+                Notification(recipient_id=user_id, session=session, message=message) for user_id in chunk
+            ])
+        sent += len(chunk)
+    return sent
@@ -0,0 +1,114 @@
+# scheduling/retention.py
+"""
+Notification retention.
+
+Read notifications older than ``NOTIFICATION_RETENTION_DAYS``, and unread
+ones older than ``NOTIFICATION_UNREAD_RETENTION_DAYS``, are folded into
+per-user monthly NotificationDigest rows and deleted, optionally after being
+appended to a gzip-compressed JSON Lines archive. The live table then holds
+recent history only, so feeds, unread counts and ``mark_all_read`` touch a
+bounded number of rows however old the account is.
+
+Expired rows are processed in primary key order, ``batch_size`` at a time,
+each batch in its own transaction (read, archive, digest, delete, commit),
+so other writers wait for one batch rather than the whole run. Run
+``prune_notifications`` from cron.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification, NotificationDigest, NotificationVersion
+
+BATCH_SIZE = 500
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'session_id', 'message', 'is_read', 'created_at')
+
+
+def expired(now=None, read_days=None, unread_days=None):
+    """Notifications past retention, as a queryset."""
+    now = now or timezone.now()
+    if read_days is None:
+        read_days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    if unread_days is None:
+        unread_days = getattr(settings, 'NOTIFICATION_UNREAD_RETENTION_DAYS', 365)
+    return Notification.objects.filter(
+        Q(is_read=True, created_at__lt=now - timedelta(days=read_days)) |
+        Q(created_at__lt=now - timedelta(days=unread_days))
+    )
+
+
+def prune(queryset, batch_size=BATCH_SIZE, archive=None, pause=0):
+    """
+    Digests and deletes every notification in ``queryset``. ``archive`` is
+    an open text file (e.g. ``gzip.open(path, 'wt')``) that receives one
+    JSON object per deleted row; it is flushed before each batch commits.
+    ``pause`` sleeps that many seconds between batches. Returns
+    {'deleted': ..., 'batches': ..., 'users': ...}.
+    """
+    stats = {'deleted': 0, 'batches': 0, 'users': 0}
+    # The newest expired row bounds the walk, so the last batch doesn't
+    # scan the recent part of the table for nothing
+    upper = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    if upper is None:
+        return stats
+
+    users = set()
+    last = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(pk__gt=last, pk__lte=upper).order_by('pk').values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            if archive is not None:
+                archive.writelines(json.dumps(row, default=str) + '\n' for row in rows)
+                archive.flush()
+            recipients = {row['recipient_id'] for row in rows}
+            digest(rows)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            # Feeds and unread counts changed: invalidate the clients' ETags
+            NotificationVersion.bump(recipients)
+
+        last = rows[-1]['id']
+        users |= recipients
+        stats['deleted'] += len(rows)
+        stats['batches'] += 1
+        if pause:
+            time.sleep(pause)
+    stats['users'] = len(users)
+    return stats
+
+
+def digest(rows):
+    """Adds ``rows`` (dicts with recipient_id and created_at) to the digests."""
+    totals = {}
+    for row in rows:
+        created = row['created_at']
+        key = (row['recipient_id'], timezone.localtime(created).date().replace(day=1))
+        count, first, last = totals.get(key, (0, created, created))
+        totals[key] = (count + 1, min(first, created), max(last, created))
+
+    existing = {
+        (row.user_id, row.month): row
+        for row in NotificationDigest.objects.filter(
+            user_id__in={user_id for user_id, _ in totals}, month__in={month for _, month in totals}
+        )
+    }
+    merged = []
+    for (user_id, month), (count, first, last) in totals.items():
+        row = existing.get((user_id, month))
+        if row is not None:
+            count += row.count
+            first, last = min(row.first_at, first), max(row.last_at, last)
+        merged.append(NotificationDigest(user_id=user_id, month=month, count=count, first_at=first, last_at=last))
+    # One upsert of the merged totals; nothing but this job writes digests
+    NotificationDigest.objects.bulk_create(
+        merged, update_conflicts=True, unique_fields=['user', 'month'],
+        update_fields=['count', 'first_at', 'last_at'],
+    )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Session, Feedback, Notification
+from .models import Session, Feedback, Notification, NotificationDigest
 from skills.models import Skill
 
 class SkillSerializer(serializers.ModelSerializer):
@@ -13,24 +13,41 @@ class UserBasicSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username']
 
+class SessionFeedbackSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Feedback
+        fields = ['id', 'rating', 'comment', 'created_at']
+        read_only_fields = fields
+
 class SessionSerializer(serializers.ModelSerializer):
+    """
+    Nested teacher, learner and skill read only what the viewset's
+    select_related already loaded. ``feedback`` is included only when
+    the context asks for it via ``expand``.
+    """
     teacher = UserBasicSerializer(read_only=True)
     learner = UserBasicSerializer(read_only=True)
     skill = SkillSerializer(read_only=True)
     teacher_id = serializers.IntegerField(write_only=True, required=False)
     learner_id = serializers.IntegerField(write_only=True, required=False)
     skill_id = serializers.IntegerField(write_only=True, required=False)
+    feedback = SessionFeedbackSerializer(read_only=True)
     
     class Meta:
         model = Session
         fields = ['id', 'teacher', 'learner', 'skill', 'teacher_id', 'learner_id', 'skill_id', 
-                  'scheduled_time', 'end_time', 'status', 'meeting_link', 'notes']
+                  'scheduled_time', 'end_time', 'status', 'meeting_link', 'notes', 'feedback']
         read_only_fields = ['id', 'teacher', 'learner', 'skill']
         extra_kwargs = {
             'scheduled_time': {'required': False, 'allow_null': True},
             'end_time': {'required': False, 'allow_null': True}
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'feedback' not in self.context.get('expand', ()):
+            self.fields.pop('feedback')
+
 class FeedbackSerializer(serializers.ModelSerializer):
     learner_username = serializers.ReadOnlyField(source='session.learner.username')
     skill_name = serializers.ReadOnlyField(source='session.skill.name')
@@ -60,4 +77,12 @@ class NotificationSerializer(serializers.ModelSerializer):
             'skill_name',
             'learner_username'
         ]
-        read_only_fields = fields
\ No newline at end of file
+        read_only_fields = fields
+
+
+class NotificationDigestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationDigest
+        fields = ['month', 'count', 'first_at', 'last_at']
+        read_only_fields = fields
+
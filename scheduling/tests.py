@@ -1,3 +1,681 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from skills.models import Skill
+from skillswap_project.utils import parse_local_datetime
+from . import events, notifications, retention
+from .models import (Session, Feedback, Notification, NotificationDigest, NotificationVersion,
+                     ActiveSessionState, BusyInterval, TeacherRating)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.skill = Skill.objects.create(name='Python')
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_notification_cursor_is_stable_under_inserts(self):
+        for i in range(5):
+            Notification.objects.create(recipient=self.learner, message=f'old {i}')
+
+        first = self.client.get('/api/notifications/?page_size=2')
+        self.assertEqual(len(first.data['results']), 2)
+
+        # A newer notification arriving mid-walk must not shift later pages
+        Notification.objects.create(recipient=self.learner, message='new')
+        rest = self.walk(first.data['next'])
+
+        ids = [item['id'] for item in first.data['results']] + rest
+        expected = list(Notification.objects.filter(
+            message__startswith='old'
+        ).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_session_pages_include_unscheduled_sessions_last(self):
+        now = timezone.now()
+        for hours in (3, 1, 2, 2):
+            Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill,
+                                   scheduled_time=now + timedelta(hours=hours))
+        for _ in range(3):
+            Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill)
+
+        ids = self.walk('/api/sessions/?page_size=2')
+        sessions = Session.objects.in_bulk(ids)
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual([sessions[i].scheduled_time is None for i in ids], [False] * 4 + [True] * 3)
+
+        calendar = self.walk('/api/sessions/calendar_sessions/?page_size=3')
+        self.assertEqual(sorted(calendar), sorted(ids))
+
+    def test_sessions_as_teacher_and_learner_are_merged_in_order(self):
+        now = timezone.now()
+        other = User.objects.create_user(username='other')
+        for hours in (5, 1, 4, 1, 3, 2, 6):
+            # Alternate sides: learner of self.teacher, teacher of other
+            teacher, learner = (self.teacher, self.learner) if hours % 2 else (self.learner, other)
+            Session.objects.create(teacher=teacher, learner=learner, skill=self.skill,
+                                   scheduled_time=now + timedelta(hours=hours), status='confirmed')
+        Session.objects.create(teacher=self.learner, learner=other, skill=self.skill)
+
+        mine = Session.objects.filter(Q(teacher=self.learner) | Q(learner=self.learner))
+        self.assertEqual(self.walk('/api/sessions/?page_size=2'),
+                         list(mine.order_by(F('scheduled_time').desc(nulls_last=True), '-id')
+                              .values_list('id', flat=True)))
+        self.assertEqual(self.walk('/api/sessions/calendar_sessions/?page_size=3'),
+                         list(mine.order_by(F('scheduled_time').asc(nulls_last=True), 'id')
+                              .values_list('id', flat=True)))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/sessions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class BenchmarkIndexesTests(TestCase):
+    def test_small_run_reports_index_backed_plans(self):
+        out = StringIO()
+        call_command('benchmark_indexes', sessions=200, notifications=200, users=20, repeat=2, stdout=out)
+        report = out.getvalue()
+        for name in ('busy check', 'calendar', 'session list', 'unread count', 'notification feed'):
+            self.assertIn(f'\n{name}\n', report)
+        after = [line for line in report.splitlines() if line.startswith('  after:')]
+        self.assertEqual(len(after), 5)
+        for plan in after:
+            self.assertNotIn('TEMP B-TREE', plan)
+            self.assertNotIn('benchmark_', plan)
+
+
+class SessionFeedbackExpandTests(TestCase):
+    def setUp(self):
+        self.learner = User.objects.create_user(username='learner')
+        self.skill = Skill.objects.create(name='Python')
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def add_sessions(self, count):
+        for index in range(count):
+            teacher = User.objects.create_user(username=f'teacher{Session.objects.count()}')
+            session = Session.objects.create(teacher=teacher, learner=self.learner,
+                                             skill=self.skill, status='completed')
+            if index % 2 == 0:
+                Feedback.objects.create(session=session, rating=4, comment='Good')
+
+    def list_sessions(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/sessions/', {'expand': 'feedback', 'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_feedback_is_embedded_with_fixed_query_count(self):
+        self.add_sessions(2)
+        few_queries, few = self.list_sessions()
+        self.add_sessions(20)
+        many_queries, many = self.list_sessions()
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(many), 22)
+        rated = [item['feedback'] for item in many if item['feedback']]
+        self.assertEqual(len(rated), 11)
+        self.assertEqual((rated[0]['rating'], rated[0]['comment']), (4, 'Good'))
+
+    def test_feedback_is_omitted_unless_expanded(self):
+        self.add_sessions(1)
+        item = self.client.get('/api/sessions/').data['results'][0]
+        self.assertNotIn('feedback', item)
+        self.assertEqual(item['teacher']['username'], 'teacher0')
+
+
+class BulkStatusUpdateTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.skill = Skill.objects.create(name='Python')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def request_sessions(self, count):
+        sessions = []
+        for _ in range(count):
+            learner = User.objects.create_user(username=f'learner{User.objects.count()}')
+            sessions.append(Session.objects.create(teacher=self.teacher, learner=learner, skill=self.skill))
+        return sessions
+
+    def confirm(self, sessions):
+        # One hour each, after anything confirmed before
+        offset = Session.objects.filter(status='confirmed').count()
+        start = datetime(2030, 1, 1, 8, 0)
+        items = [
+            {'id': session.id,
+             'scheduled_time': (start + timedelta(hours=offset + index)).strftime('%Y-%m-%dT%H:%M'),
+             'end_time': (start + timedelta(hours=offset + index + 1)).strftime('%Y-%m-%dT%H:%M')}
+            for index, session in enumerate(sessions)
+        ]
+        # Notifications are written when the transaction commits
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/sessions/bulk_update_status/',
+                                        {'status': 'confirmed', 'sessions': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_confirming_many_takes_constant_queries(self):
+        few_queries, _ = self.confirm(self.request_sessions(3))
+        sessions = self.request_sessions(60)
+        many_queries, results = self.confirm(sessions)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertTrue(all(result['ok'] for result in results))
+        self.assertEqual(results[0]['session']['status'], 'confirmed')
+        self.assertEqual(Session.objects.filter(status='confirmed').count(), 63)
+
+        learner = sessions[0].learner
+        notification = Notification.objects.get(recipient=learner)
+        self.assertIn('has been confirmed for 01/01/30 at 11:00 AM', notification.message)
+        self.assertEqual(NotificationVersion.current(learner.id), 1)
+        state = ActiveSessionState.objects.get(user=learner)
+        self.assertEqual(state.latest_end_time, Session.objects.get(pk=sessions[0].pk).end_time)
+        self.assertEqual(BusyInterval.objects.filter(user=self.teacher).count(), 63)
+
+    def test_items_fail_independently(self):
+        mine, theirs = self.request_sessions(2)
+        theirs.teacher = User.objects.create_user(username='other')
+        theirs.save()
+
+        response = self.client.post('/api/sessions/bulk_update_status/', {
+            'status': 'confirmed',
+            'sessions': [
+                {'id': mine.id, 'scheduled_time': '2030-01-01T10:00', 'end_time': '2030-01-01T11:00'},
+                {'id': theirs.id, 'scheduled_time': '2030-01-02T10:00', 'end_time': '2030-01-02T11:00'},
+                {'id': 999999},
+                {'id': mine.id, 'scheduled_time': 'tomorrow', 'end_time': 'later'},
+            ],
+        }, format='json')
+
+        self.assertEqual([result['ok'] for result in response.data['results']], [True, False, False, False])
+        self.assertEqual(response.data['results'][3]['detail'], 'Duplicate session id')
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.status, 'pending')
+
+    def test_bad_time_window_is_reported_per_item(self):
+        session, = self.request_sessions(1)
+        response = self.client.post('/api/sessions/bulk_update_status/', {
+            'status': 'confirmed', 'sessions': [{'id': session.id, 'scheduled_time': 'soon', 'end_time': 'later'}],
+        }, format='json')
+        self.assertEqual(response.data['results'][0]['detail'],
+                         'Invalid datetime format. Expected YYYY-MM-DDTHH:MM')
+
+
+class BusyIntervalTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.other = User.objects.create_user(username='other')
+        self.skill = Skill.objects.create(name='Python')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def request_session(self, learner=None):
+        return Session.objects.create(teacher=self.teacher, learner=learner or self.learner, skill=self.skill)
+
+    def confirm(self, session, start, end, **extra):
+        return self.client.post(f'/api/sessions/{session.id}/update_status/', {
+            'status': 'confirmed', 'scheduled_time': start, 'end_time': end, **extra,
+        })
+
+    def test_overlapping_confirmation_is_rejected_unless_allowed(self):
+        first = self.request_session()
+        self.assertEqual(self.confirm(first, '2030-01-01T10:00', '2030-01-01T11:00').status_code, 200)
+
+        # Back-to-back is fine, overlapping is not
+        second = self.request_session(self.other)
+        self.assertEqual(self.confirm(second, '2030-01-01T11:00', '2030-01-01T12:00').status_code, 200)
+        third = self.request_session(self.other)
+        response = self.confirm(third, '2030-01-01T10:30', '2030-01-01T11:30')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [first.id, second.id])
+
+        forced = self.confirm(third, '2030-01-01T10:30', '2030-01-01T11:30', allow_overlap='true')
+        self.assertEqual(forced.status_code, 200)
+        self.assertEqual(forced.data['conflicts'], [first.id, second.id])
+
+    def test_conflict_check_and_save_share_a_transaction(self):
+        session = self.request_session()
+        with CaptureQueriesContext(connection) as queries:
+            self.confirm(session, '2030-01-01T10:00', '2030-01-01T11:00')
+        sql = [query['sql'] for query in queries]
+        check = next(i for i, query in enumerate(sql) if 'FROM "scheduling_busyinterval"' in query)
+        save = next(i for i, query in enumerate(sql) if query.startswith('UPDATE "scheduling_session"'))
+        # The test's own transaction wraps the request, so the view's block
+        # is a savepoint opened before the check and released after the save
+        opened = max(i for i, query in enumerate(sql[:check]) if query.startswith('SAVEPOINT'))
+        released = next(i for i, query in enumerate(sql) if i > opened and query.startswith('RELEASE SAVEPOINT'))
+        self.assertLess(save, released)
+
+    def test_cancelling_frees_the_slot(self):
+        first = self.request_session()
+        self.confirm(first, '2030-01-01T10:00', '2030-01-01T11:00')
+        self.client.post(f'/api/sessions/{first.id}/update_status/', {'status': 'cancelled'})
+        self.assertFalse(BusyInterval.objects.exists())
+
+        second = self.request_session()
+        self.assertEqual(self.confirm(second, '2030-01-01T10:00', '2030-01-01T11:00').status_code, 200)
+
+    def test_bulk_confirm_checks_items_against_each_other(self):
+        first, second = self.request_session(), self.request_session(self.other)
+        response = self.client.post('/api/sessions/bulk_update_status/', {
+            'status': 'confirmed',
+            'sessions': [
+                {'id': first.id, 'scheduled_time': '2030-01-01T10:00', 'end_time': '2030-01-01T11:00'},
+                {'id': second.id, 'scheduled_time': '2030-01-01T10:30', 'end_time': '2030-01-01T11:30'},
+            ],
+        }, format='json')
+
+        first_result, second_result = response.data['results']
+        self.assertTrue(first_result['ok'])
+        self.assertEqual((second_result['ok'], second_result['conflicts']), (False, [first.id]))
+        self.assertEqual(BusyInterval.objects.filter(user=self.teacher).count(), 1)
+
+    def test_free_slots_for_two_users(self):
+        self.confirm(self.request_session(), '2030-01-01T10:00', '2030-01-01T11:00')
+        Session.objects.create(
+            teacher=self.other, learner=self.learner, skill=self.skill, status='confirmed',
+            scheduled_time=parse_local_datetime('2030-01-01T12:00'),
+            end_time=parse_local_datetime('2030-01-01T13:00'),
+        )
+
+        response = self.client.get('/api/sessions/free_slots/', {
+            'user': self.other.id, 'from': '2030-01-01T09:00', 'to': '2030-01-01T14:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(slot['start'].hour, slot['end'].hour) for slot in response.data['free']],
+            [(9, 10), (11, 12), (13, 14)]
+        )
+
+
+class ActiveSessionStateTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.skill = Skill.objects.create(name='Python')
+
+    def state(self, user):
+        return ActiveSessionState.objects.get(user=user)
+
+    def test_state_follows_session_lifecycle(self):
+        start = timezone.now()
+        first = Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill,
+                                       scheduled_time=start)
+        second = Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill,
+                                        scheduled_time=start + timedelta(hours=3))
+        self.assertEqual(self.state(self.teacher).active_count, 2)
+        self.assertEqual(self.state(self.learner).latest_end_time, start + timedelta(hours=4))
+
+        second.status = 'completed'
+        second.save()
+        self.assertEqual(self.state(self.learner).active_count, 1)
+        self.assertEqual(self.state(self.learner).latest_end_time, start + timedelta(hours=1))
+
+        first.delete()
+        self.assertFalse(self.state(self.teacher).is_busy)
+        self.assertIsNone(self.state(self.teacher).latest_end_time)
+
+    def test_only_tracked_field_changes_refresh_derived_rows(self):
+        session = Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill,
+                                         scheduled_time=timezone.now(), status='confirmed')
+
+        def derived_queries(save):
+            with CaptureQueriesContext(connection) as queries:
+                save()
+            return [query['sql'] for query in queries
+                    if 'scheduling_activesessionstate' in query['sql'] or 'scheduling_busyinterval' in query['sql']]
+
+        loaded = Session.objects.get(pk=session.pk)
+        loaded.notes = 'Bring a laptop'
+        self.assertEqual(derived_queries(loaded.save), [])
+        loaded.meeting_link = 'https://meet.example.com/abc'
+        self.assertEqual(derived_queries(lambda: loaded.save(update_fields=['meeting_link'])), [])
+
+        loaded.status = 'cancelled'
+        self.assertNotEqual(derived_queries(lambda: loaded.save(update_fields=['status'])), [])
+        self.assertFalse(self.state(self.teacher).is_busy)
+        self.assertFalse(BusyInterval.objects.exists())
+
+    def test_rebuild_command_verifies_state(self):
+        Session.objects.create(teacher=self.teacher, learner=self.learner, skill=self.skill)
+        call_command('rebuild_session_state', '--verify', stdout=StringIO())
+
+        ActiveSessionState.objects.filter(user=self.teacher).update(active_count=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_session_state', '--verify', stdout=StringIO())
+
+        call_command('rebuild_session_state', stdout=StringIO())
+        self.assertEqual(self.state(self.teacher).active_count, 1)
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='listener')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, message):
+        return Notification.objects.create(recipient=self.user, message=message)
+
+    def test_since_id_returns_only_newer_notifications(self):
+        first = self.notify('one')
+        second = self.notify('two')
+
+        data = self.client.get('/api/notifications/', {'since_id': first.id}).data
+        self.assertEqual([item['id'] for item in data['results']], [second.id])
+        self.assertEqual(data['unread_count'], 2)
+        self.assertEqual(data['last_id'], second.id)
+
+        idle = self.client.get('/api/notifications/', {'since_id': second.id}).data
+        self.assertEqual((idle['results'], idle['last_id']), ([], second.id))
+
+    def test_unchanged_poll_is_not_modified(self):
+        first = self.notify('one')
+        synced = self.client.get('/api/notifications/', {'since_id': 0})
+        etag = synced['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            idle = self.client.get('/api/notifications/', {'since_id': first.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(idle.status_code, 304)
+        self.assertEqual(idle.content, b'')
+        self.assertEqual(len(queries), 1)
+
+        second = self.notify('two')
+        changed = self.client.get('/api/notifications/', {'since_id': first.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual([item['id'] for item in changed.data['results']], [second.id])
+
+        self.client.post('/api/notifications/mark_all_read/')
+        read = self.client.get('/api/notifications/', {'since_id': second.id},
+                               HTTP_IF_NONE_MATCH=changed['ETag'])
+        self.assertEqual((read.status_code, read.data['unread_count']), (200, 0))
+
+    def test_new_notification_is_published_after_commit(self):
+        broker = mock.Mock()
+        with mock.patch.object(events, 'get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks() as callbacks:
+                notification = self.notify('hello')
+            broker.publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        user_id, event = broker.publish.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual(event['id'], notification.id)
+        self.assertEqual(event['data']['unread_delta'], 1)
+
+    def test_stream_requires_asgi(self):
+        response = self.client.get('/api/notifications/stream/', {'token': self.token.key})
+        self.assertEqual(response.status_code, 503)
+
+    async def test_stream_replays_missed_and_pushes_new(self):
+        first = await sync_to_async(self.notify)('missed?')
+        second = await sync_to_async(self.notify)('missed')
+
+        broker = events.LocalBroker()
+        with mock.patch.object(events, 'get_broker', return_value=broker):
+            response = await self.async_client.get(
+                '/api/notifications/stream/', {'token': self.token.key},
+                headers={'Last-Event-ID': str(first.id)},
+            )
+            await self.read_stream(response, second)
+
+    async def read_stream(self, response, missed):
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await anext(frames)).startswith(b'retry:'))
+            self.assertIn(f'id: {missed.id}'.encode(), await anext(frames))
+            self.assertIn(b'"unread_count": 2', await anext(frames))
+
+            third = await sync_to_async(self.notify)('live')
+            events._publish_notification(third)
+            frame = await anext(frames)
+            self.assertIn(f'id: {third.id}'.encode(), frame)
+            self.assertIn(b'"unread_delta": 1', frame)
+        finally:
+            await frames.aclose()
+
+    async def test_stream_rejects_bad_token(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+
+class TeacherRatingTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.python = Skill.objects.create(name='Python')
+        self.guitar = Skill.objects.create(name='Guitar')
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def rate(self, skill, rating):
+        session = Session.objects.create(teacher=self.teacher, learner=self.learner,
+                                         skill=skill, status='completed')
+        response = self.client.post('/api/feedback/', {'session_id': session.id, 'rating': rating,
+                                                       'comment': 'ok'})
+        self.assertEqual(response.status_code, 201)
+        return Feedback.objects.get(session=session)
+
+    def summary(self):
+        return TeacherRating.summarize(TeacherRating.objects.filter(teacher=self.teacher).select_related('skill'))
+
+    def test_aggregates_follow_feedback_changes(self):
+        self.rate(self.python, 5)
+        edited = self.rate(self.python, 3)
+        removed = self.rate(self.guitar, 1)
+
+        edited.rating = 4
+        edited.save()
+        removed.session.delete()
+
+        summary = self.summary()
+        self.assertEqual((summary['count'], summary['average']), (2, 4.5))
+        self.assertEqual(summary['histogram'], {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+        self.assertEqual([row['skill_name'] for row in summary['by_skill']], ['Python'])
+
+        call_command('rebuild_teacher_ratings', '--verify', stdout=StringIO())
+
+    def test_verify_reports_drift_and_rebuild_fixes_it(self):
+        self.rate(self.python, 2)
+        TeacherRating.objects.update(total=10)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_teacher_ratings', '--verify', stdout=StringIO())
+
+        call_command('rebuild_teacher_ratings', stdout=StringIO())
+        self.assertEqual(self.summary()['average'], 2)
+
+    def test_apply_adds_to_a_row_another_writer_just_created(self):
+        raced = []
+
+        def other_writer(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if sql.startswith('UPDATE "scheduling_teacherrating"') and not raced:
+                raced.append(sql)
+                TeacherRating.objects.create(teacher=self.teacher, skill=self.python, count=1, total=4, rating_4=1)
+            return result
+
+        with connection.execute_wrapper(other_writer):
+            TeacherRating.apply(self.teacher.id, self.python.id, 5, 1)
+
+        row = TeacherRating.objects.get(teacher=self.teacher, skill=self.python)
+        self.assertEqual((row.count, row.total, row.rating_4, row.rating_5), (2, 9, 1, 1))
+
+
+class NotificationServiceTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.skill = Skill.objects.create(name='Python')
+
+    def notification_inserts(self, queries):
+        return len([query for query in queries if query['sql'].startswith('INSERT INTO "scheduling_notification"')])
+
+    def test_sends_are_written_together_when_the_transaction_commits(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                notifications.send(self.teacher, 'one')
+                notifications.send(self.learner.id, 'two')
+                self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(self.notification_inserts(queries), 1)
+        self.assertEqual(sorted(Notification.objects.values_list('message', flat=True)), ['one', 'two'])
+        self.assertEqual(NotificationVersion.current(self.learner.id), 1)
+
+    def test_rolled_back_transactions_send_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notifications.send(self.teacher, 'lost')
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                notifications.send(self.teacher, 'kept')
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['kept'])
+
+    def test_rolled_back_savepoints_send_nothing(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                notifications.send(self.teacher, 'before')
+                try:
+                    with transaction.atomic():
+                        notifications.send(self.teacher, 'lost')
+                        raise ValueError
+                except ValueError:
+                    pass
+                with transaction.atomic():
+                    notifications.send(self.teacher, 'inner')
+                notifications.send(self.teacher, 'after')
+
+        self.assertEqual(sorted(Notification.objects.values_list('message', flat=True)),
+                         ['after', 'before', 'inner'])
+        self.assertEqual(self.notification_inserts(queries), 1)
+
+    def test_a_rolled_back_last_savepoint_still_sends_the_rest(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                notifications.send(self.teacher, 'kept')
+                try:
+                    with transaction.atomic():
+                        notifications.send(self.teacher, 'lost')
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['kept'])
+
+    def test_broadcast_inserts_in_chunks(self):
+        learners = [User.objects.create_user(username=f'fan{index}') for index in range(5)]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                notifications.broadcast(User.objects.filter(username__startswith='fan'), 'hello', chunk_size=2)
+
+        self.assertEqual(self.notification_inserts(queries), 3)
+        self.assertEqual(set(Notification.objects.values_list('recipient_id', flat=True)),
+                         {learner.id for learner in learners})
+        self.assertEqual(NotificationVersion.current(learners[-1].id), 1)
+
+    def test_session_requests_notify_the_teacher_on_commit(self):
+        client = APIClient()
+        client.force_authenticate(self.learner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/sessions/', {'teacher_id': self.teacher.id, 'skill_id': self.skill.id})
+        self.assertEqual(response.status_code, 201)
+        notification = Notification.objects.get(recipient=self.teacher)
+        self.assertEqual(notification.session_id, response.data['id'])
+        self.assertEqual(notification.message, 'New session request from learner for Python.')
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='veteran')
+        self.now = timezone.now()
+
+    def notify(self, days_ago, is_read=True, message='old news'):
+        notification = Notification.objects.create(recipient=self.user, message=message, is_read=is_read)
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return notification
+
+    def test_expired_notifications_are_digested_archived_and_deleted(self):
+        old = [self.notify(400 + day) for day in range(3)]
+        old_unread = self.notify(500, is_read=False)
+        recent_read = self.notify(10)
+        stale_unread = self.notify(100, is_read=False)
+
+        version = NotificationVersion.current(self.user.id)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'archive.jsonl.gz')
+        try:
+            with gzip.open(path, 'wt') as archive:
+                stats = retention.prune(retention.expired(now=self.now), batch_size=2, archive=archive)
+            with gzip.open(path, 'rt') as archive:
+                archived = [json.loads(line) for line in archive]
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+
+        self.assertEqual(stats, {'deleted': 4, 'batches': 2, 'users': 1})
+        self.assertEqual(sorted(row['id'] for row in archived),
+                         sorted(notification.id for notification in old + [old_unread]))
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)), {recent_read.id, stale_unread.id})
+        self.assertEqual(sum(NotificationDigest.objects.filter(user=self.user).values_list('count', flat=True)), 4)
+        self.assertEqual(NotificationVersion.current(self.user.id), version + 2)
+
+    def test_digests_accumulate_across_runs(self):
+        self.notify(400)
+        retention.prune(retention.expired(now=self.now))
+        self.notify(400)
+        retention.prune(retention.expired(now=self.now))
+
+        digest = NotificationDigest.objects.get(user=self.user)
+        self.assertEqual(digest.count, 2)
+        self.assertEqual(digest.month, timezone.localtime(self.now - timedelta(days=400)).date().replace(day=1))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/notifications/digests/')
+        self.assertEqual(response.data['results'][0]['count'], 2)
+
+    def test_command_dry_run_keeps_everything(self):
+        self.notify(400)
+        out = StringIO()
+        call_command('prune_notifications', '--dry-run', stdout=out)
+        self.assertIn('1 notification(s) are past retention', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 1)
 
-# Create your tests here.
+        call_command('prune_notifications', stdout=StringIO())
+        self.assertFalse(Notification.objects.exists())
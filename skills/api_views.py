@@ -1,87 +1,183 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from django.utils.http import parse_etags, quote_etag
+from . import autocomplete, catalog, recommend
 from .models import Skill, Category
 from .serializers import SkillSerializer, CategorySerializer
-from users.models import Profile
+from users import search
+from users.models import Profile, SwapMatch
+from skillswap_project.utils import is_truthy
 from scheduling.models import Session
-from django.db.models import Q
+from django.db.models import F
 from users.serializers import ProfileSerializer
-from .models import Skill, Category
+from skillswap_project.pagination import KeysetPagination
+
+class MatchPagination(KeysetPagination):
+    ordering = ('-overlap', 'id')
+
+class SwapPagination(KeysetPagination):
+    ordering = ('-score', 'id')
+
+def catalog_response(request, build):
+    """
+    Serves ``build(catalog)`` from the cached catalog with the catalog
+    version as ETag, or an empty 304 when the client already has it.
+    """
+    data = catalog.get_catalog()
+    etag = quote_etag(f"skills-{data['version']}")
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(build(data))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def catalog_lookup(table, pk):
+    try:
+        return table[int(pk)]
+    except (KeyError, TypeError, ValueError):
+        raise NotFound()
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
+    # Reads come from skills.catalog
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, lambda data: data['categories'])
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        return catalog_response(request, lambda data: catalog_lookup(data['categories_by_id'], pk))
+
 class SkillViewSet(viewsets.ModelViewSet):
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    # Reads come from skills.catalog; writes go through the model and bump
+    # its version
+    def list(self, request, *args, **kwargs):
+        return catalog_response(request, lambda data: data['skills'])
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        return catalog_response(request, lambda data: catalog_lookup(data['skills_by_id'], pk))
     
     @action(detail=False, methods=['get'])
     def matches(self, request):
-        user_profile = request.user.profile
-        
         # Get query params from the URL
         search_query = request.query_params.get('search', None)
         category_id = request.query_params.get('category', None)
 
-        # Get skills the user wants to learn
-        skills_to_learn = user_profile.skills_to_learn.all()
-        
-        # Find profiles of users who can teach those skills
-        # We removed the filter for active sessions here.
+        # Read the profiles that teach what the user wants straight from
+        # the precomputed match index, ranked by how many skills overlap.
         matches = Profile.objects.filter(
-            skills_to_teach__in=skills_to_learn
-        ).exclude(
-            user=request.user
+            user__learner_matches__learner=request.user
+        ).annotate(
+            overlap=F('user__learner_matches__overlap')
         )
         
-        # Apply search filter if it exists
+        # Apply search filter if it exists (full-text index; see users/search.py)
         if search_query:
-            matches = matches.filter(
-                Q(user__username__icontains=search_query) |
-                Q(skills_to_teach__name__icontains=search_query)
-            )
+            matches = search.filter_profiles(matches, search_query)
             
         # Apply category filter if it exists
         if category_id:
             matches = matches.filter(
-                skills_to_teach__category_id=category_id
+                id__in=Profile.skills_to_teach.through.objects.filter(
+                    skill__category_id=category_id
+                ).values('profile_id')
             )
         
-        # Add distinct at the end
-        matches = matches.distinct()
-        
-        # Serialize the matches
-        from users.serializers import ProfileSerializer
-        serializer = ProfileSerializer(matches, many=True, context={'request': request})
+        # The filters above are subqueries, so no .distinct() is needed
+        matches = matches.select_related('user').order_by('-overlap', 'id')
         
-        return Response(serializer.data)
+        # Serialize the matches. ProfileSerializer batches the per-profile
+        # feedback and busy lookups, so this is a fixed number of queries.
+        paginator = MatchPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        serializer = ProfileSerializer(page, many=True, context={'request': request, 'image_size': 128})
+        response = paginator.get_paginated_response(serializer.data)
+
+        # The first unfiltered page also suggests teachers of related skills
+        if not (search_query or category_id or request.query_params.get(paginator.cursor_query_param)):
+            suggestions, related = recommend.suggest_teachers(request.user)
+            data = ProfileSerializer(suggestions, many=True, context={'request': request, 'image_size': 128}).data
+            for item in data:
+                item['related_skills'] = [skill['name'] for skill in item['skills_to_teach'] if skill['id'] in related]
+            response.data['suggestions'] = data
+        return response
     
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def swaps(self, request):
+        """
+        Reciprocal matches (each of you teaches something the other wants),
+        best-balanced first. ``?cycles=1`` adds three-way swaps to the
+        first page.
+        """
+        swaps = SwapMatch.objects.filter(user=request.user)
+        paginator = SwapPagination()
+        page = paginator.paginate_queryset(swaps, request, view=self)
+
+        # One query for the partners' profiles, then the batched serializer.
+        # A partner without a profile can't be shown; skip it
+        profiles = Profile.objects.select_related('user').in_bulk([swap.partner_id for swap in page], field_name='user_id')
+        page = [swap for swap in page if swap.partner_id in profiles]
+        partners = ProfileSerializer(
+            [profiles[swap.partner_id] for swap in page], many=True,
+            context={'request': request, 'image_size': 128}
+        ).data
+
+        me = request.user.profile
+        wanted = set(me.skills_to_learn.values_list('id', flat=True))
+        taught = set(me.skills_to_teach.values_list('id', flat=True))
+        results = []
+        for swap, partner in zip(page, partners):
+            results.append({
+                'partner': partner,
+                'score': swap.score,
+                'you_learn': [skill['name'] for skill in partner['skills_to_teach'] if skill['id'] in wanted],
+                'you_teach': [skill['name'] for skill in partner['skills_to_learn'] if skill['id'] in taught],
+            })
+        response = paginator.get_paginated_response(results)
+
+        if is_truthy(request.query_params.get('cycles')) and not request.query_params.get(paginator.cursor_query_param):
+            response.data['cycles'] = [
+                {
+                    'you_teach': {'user_id': edge.teacher_id, 'username': edge.teacher.username},
+                    'teaches_you': {'user_id': edge.learner_id, 'username': edge.learner.username},
+                    'score': edge.score,
+                }
+                for edge in SwapMatch.cycles_for(request.user)
+            ]
+        return response
+
     @action(detail=False, methods=['get'])
     def search(self, request):
-        """Search for skills by name"""
+        """Autocomplete skills by name, best matches first"""
         query = request.query_params.get('q', '').strip()
         
         if not query:
             return Response({'results': []})
-        
-        skills = Skill.objects.filter(name__icontains=query)[:10]
-        serializer = self.get_serializer(skills, many=True)
-        
-        return Response({'results': serializer.data})
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), autocomplete.TOP_K))
+        except ValueError:
+            limit = 10
+        return Response({'results': autocomplete.suggest(query, limit)})
     
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         """Get skills by category"""
         category_id = request.query_params.get('category_id')
         
-        if category_id:
-            skills = Skill.objects.filter(category_id=category_id)
-        else:
-            skills = Skill.objects.all()
-        
-        serializer = self.get_serializer(skills, many=True)
-        return Response(serializer.data)
+        if not category_id:
+            return catalog_response(request, lambda data: data['skills'])
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            return Response({'detail': 'category_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        return catalog_response(request, lambda data: data['by_category'].get(category_id, []))
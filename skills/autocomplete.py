@@ -0,0 +1,321 @@
+# skills/autocomplete.py
+"""
+In-memory autocomplete over skill names.
+
+Matches are ranked in tiers: the exact name, names starting with the query,
+names with a later word starting with it, then fuzzy (trigram) matches for
+typos. Within a tier, skills more people teach or learn come first.
+
+Prefix lookups are binary searches over sorted arrays. Short prefixes match
+too many names to rank per keystroke, so their top results are precomputed.
+Fuzzy matching only runs when the prefix tiers come up short: it counts
+shared trigrams between the query's longest word and the (much smaller)
+vocabulary of words used in skill names, then takes the skills containing
+the closest words.
+
+The process-wide index holds the serialized skills it returns, so a
+keystroke never waits for the catalog. When the catalog version changes it
+reads only the skills created since (and the skill count, to notice
+deletes) and adds them in place. Everything else happens off the request:
+renames, deletes and popularity (every ``AUTOCOMPLETE_POPULARITY_TTL``
+seconds) rebuild a fresh index on a background thread, which replaces the
+current one once built. ``AUTOCOMPLETE_ASYNC = False`` rebuilds inline.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from . import catalog
+
+logger = logging.getLogger(__name__)
+
+# Prefixes up to this length have precomputed results
+SHORT_PREFIX = 3
+# Results kept per precomputed prefix; also the largest page served
+TOP_K = 20
+FUZZY_THRESHOLD = 0.2
+MIN_FUZZY_LENGTH = 3
+# Closest vocabulary words whose skills are offered as fuzzy matches
+FUZZY_WORDS = 5
+
+EXACT, PREFIX, WORD, FUZZY = range(4)
+
+# ``skills`` maps id -> serialized skill; ``last_id`` is the newest one read
+_state = {'index': None, 'skills': {}, 'version': None, 'last_id': 0, 'built_at': 0.0, 'rebuilding': False}
+_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Prefix and trigram index over (skill id, name) pairs."""
+
+    def __init__(self, skills=(), popularity=None):
+        self.names = {}
+        self.keys = {}
+        self.popularity = dict(popularity or {})
+        self._by_key = defaultdict(list)
+        self._name_keys = []
+        self._word_keys = []
+        # word -> ids of the skills using it, best ranked first
+        self._word_skills = defaultdict(list)
+        self._trigrams = defaultdict(list)
+        self._trigram_counts = {}
+        self._write_lock = threading.Lock()
+
+        for skill_id, name in skills:
+            self._insert(skill_id, name, sort=False)
+        self._name_keys.sort()
+        self._word_keys.sort()
+        self._build_top()
+
+    def __len__(self):
+        return len(self.names)
+
+    # --- building ---
+
+    def _insert(self, skill_id, name, sort=True):
+        key = normalize(name)
+        self.names[skill_id] = name
+        self.keys[skill_id] = key
+        self._by_key[key].append(skill_id)
+        add = insort if sort else list.append
+        add(self._name_keys, (key, skill_id))
+        words = key.split(' ')
+        for word in words[1:]:
+            add(self._word_keys, (word, skill_id))
+        for word in set(words):
+            if word not in self._word_skills:
+                grams = trigrams(word)
+                self._trigram_counts[word] = len(grams)
+                for gram in grams:
+                    self._trigrams[gram].append(word)
+            if sort:
+                insort(self._word_skills[word], self._rank(FUZZY, skill_id))
+            else:
+                self._word_skills[word].append(self._rank(FUZZY, skill_id))
+
+    def _rank(self, tier, skill_id):
+        return (tier, -self.popularity.get(skill_id, 0), len(self.keys[skill_id]), self.keys[skill_id], skill_id)
+
+    def _build_top(self):
+        """Best TOP_K ids for every prefix of up to SHORT_PREFIX characters."""
+        top = defaultdict(list)
+        for tier, entries in ((PREFIX, self._name_keys), (WORD, self._word_keys)):
+            ranked = sorted((self._rank(tier, skill_id), text) for text, skill_id in entries)
+            for rank, text in ranked:
+                for length in range(1, min(len(text), SHORT_PREFIX) + 1):
+                    table = top[text[:length]]
+                    if len(table) < TOP_K and rank[-1] not in {entry[-1] for entry in table}:
+                        table.append(rank)
+        self._top = dict(top)
+        for word, ranks in self._word_skills.items():
+            self._word_skills[word] = sorted(self._rank(FUZZY, rank[-1]) for rank in ranks)
+
+    def add(self, skill_id, name):
+        """Adds one skill without rebuilding."""
+        with self._write_lock:
+            if skill_id in self.names:
+                return
+            self._insert(skill_id, name)
+            key = self.keys[skill_id]
+            candidates = [(PREFIX, key)] + [(WORD, word) for word in key.split(' ')[1:]]
+            for tier, text in candidates:
+                rank = self._rank(tier, skill_id)
+                for length in range(1, min(len(text), SHORT_PREFIX) + 1):
+                    table = self._top.setdefault(text[:length], [])
+                    if any(entry[-1] == skill_id for entry in table):
+                        continue
+                    insort(table, rank)
+                    del table[TOP_K:]
+
+    # --- querying ---
+
+    def search(self, query, limit=10):
+        """Returns up to ``limit`` skill ids, best first."""
+        key = normalize(query)
+        if not key:
+            return []
+        limit = min(limit, TOP_K)
+
+        ranked = [self._rank(EXACT, skill_id) for skill_id in self._by_key.get(key, ())]
+        if len(key) <= SHORT_PREFIX:
+            ranked.extend(self._top.get(key, ()))
+        else:
+            for tier, entries in ((PREFIX, self._name_keys), (WORD, self._word_keys)):
+                start = bisect_left(entries, (key,))
+                end = bisect_left(entries, (key + '\uffff',), start)
+                ranked.extend(heapq.nsmallest(
+                    limit + 1, (self._rank(tier, skill_id) for _, skill_id in entries[start:end])
+                ))
+
+        results, seen = [], set()
+        for rank in sorted(ranked):
+            skill_id = rank[-1]
+            if skill_id not in seen:
+                seen.add(skill_id)
+                results.append(skill_id)
+                if len(results) == limit:
+                    return results
+
+        if len(key) >= MIN_FUZZY_LENGTH:
+            for skill_id in self._fuzzy(key, limit):
+                if skill_id not in seen:
+                    seen.add(skill_id)
+                    results.append(skill_id)
+                    if len(results) == limit:
+                        break
+        return results
+
+    def _fuzzy(self, key, limit):
+        word = max(key.split(' '), key=len)
+        if len(word) < MIN_FUZZY_LENGTH:
+            return []
+        grams = trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] += 1
+
+        scored = []
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self._trigram_counts[candidate] - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((-similarity, candidate))
+
+        results = []
+        for _, candidate in heapq.nsmallest(FUZZY_WORDS, scored):
+            results.extend(rank[-1] for rank in self._word_skills[candidate][:limit])
+        return results
+
+
+def load_popularity():
+    """{skill_id: number of profiles teaching or learning it}, in two queries."""
+    from django.db.models import Count
+    from users.models import Profile
+
+    popularity = defaultdict(int)
+    for through in (Profile.skills_to_teach.through, Profile.skills_to_learn.through):
+        for skill_id, count in through.objects.order_by().values_list('skill_id').annotate(n=Count('id')):
+            popularity[skill_id] += count
+    return popularity
+
+
+def serialize_skills(queryset):
+    from .serializers import SkillSerializer
+
+    return [dict(skill) for skill in SkillSerializer(queryset.select_related('category').order_by('id'), many=True).data]
+
+
+def build():
+    """A fresh index and its state, read from the database."""
+    from .models import Skill
+
+    # Read the version first: a write during the build shows up as a newer one
+    version = catalog.current_version()
+    skills = {skill['id']: skill for skill in serialize_skills(Skill.objects.all())}
+    index = AutocompleteIndex(((skill_id, skill['name']) for skill_id, skill in skills.items()), load_popularity())
+    return {'index': index, 'skills': skills, 'version': version,
+            'last_id': max(skills, default=0), 'built_at': time.monotonic()}
+
+
+def get_index():
+    """The process-wide index, with the skills created since it was built."""
+    version = catalog.current_version()
+    if _state['index'] is None:
+        with _lock:
+            if _state['index'] is None:
+                _state.update(build())
+    elif _state['version'] != version:
+        with _lock:
+            deleted = _state['version'] != version and _catch_up(version)
+        if deleted:
+            refresh()
+    if time.monotonic() - _state['built_at'] >= getattr(settings, 'AUTOCOMPLETE_POPULARITY_TTL', 300):
+        refresh()
+    return _state['index']
+
+
+def _catch_up(version):
+    """
+    Adds the skills created since the last look. Returns True when skills
+    were deleted, which takes a rebuild.
+    """
+    from .models import Skill
+
+    for skill in serialize_skills(Skill.objects.filter(id__gt=_state['last_id'])):
+        _state['skills'][skill['id']] = skill
+        _state['index'].add(skill['id'], skill['name'])
+        _state['last_id'] = max(_state['last_id'], skill['id'])
+    _state['version'] = version
+    return Skill.objects.count() < len(_state['skills'])
+
+
+def refresh():
+    """
+    Rebuilds the index (renames, deletes, popularity) off the request path
+    and swaps it in. Does nothing while a rebuild is already running.
+    """
+    with _lock:
+        if _state['rebuilding'] or _state['index'] is None:
+            return
+        _state['rebuilding'] = True
+    if not getattr(settings, 'AUTOCOMPLETE_ASYNC', True):
+        _rebuild()
+        return
+    _get_executor().submit(_run_in_worker)
+
+
+def _rebuild():
+    try:
+        fresh = build()
+        with _lock:
+            _state.update(fresh)
+    finally:
+        _state['rebuilding'] = False
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='skill-autocomplete')
+        return _executor
+
+
+def _run_in_worker():
+    try:
+        _rebuild()
+    except Exception:
+        logger.exception('Failed to rebuild the skill autocomplete index')
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        connection.close()
+
+
+def suggest(query, limit=10):
+    """Serialized skills matching ``query``, best first."""
+    index = get_index()
+    skills = _state['skills']
+    return [skills[skill_id] for skill_id in index.search(query, limit) if skill_id in skills]
+
+
+def reset():
+    with _lock:
+        _state.update(index=None, skills={}, version=None, last_id=0, built_at=0.0, rebuilding=False)
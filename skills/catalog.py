@@ -0,0 +1,134 @@
+# skills/catalog.py
+"""
+Read-through cache of the skill/category catalog.
+
+The catalog version is a token in the database (``CatalogVersion``) that
+every Skill or Category write replaces in its own transaction, so all
+processes agree on it once the write commits. Each thread re-reads the
+token at most every ``SKILL_CATALOG_VERSION_TTL`` seconds: a write in
+another process shows up within that window, one in this process at once.
+
+The serialized catalog is held in process memory together with the version
+it was built from, and in the cache backend named by
+``SKILL_CATALOG_CACHE`` under that version. With a shared backend (Redis,
+Memcached) only one process pays for each rebuild; the local-memory default
+is enough for a single server and for tests. A new version deletes this
+process's previous built catalog, and every built catalog expires after
+``SKILL_CATALOG_TIMEOUT`` seconds.
+
+A read that finds its version current costs no queries.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DATA_KEY = 'skill-catalog:data:{version}'
+
+# ``generation`` moves on with every write in this process, which makes
+# each thread re-read the version
+_local = {'version': None, 'data': None, 'generation': 0}
+_lock = threading.Lock()
+_thread = threading.local()
+
+
+def _cache():
+    return caches[getattr(settings, 'SKILL_CATALOG_CACHE', 'default')]
+
+
+def current_version():
+    from .models import CatalogVersion
+
+    in_atomic_block = transaction.get_connection().in_atomic_block
+    memo = getattr(_thread, 'memo', None)
+    if memo is not None:
+        version, generation, checked_at, in_transaction = memo
+        # A version read inside a transaction that has since ended may have
+        # been rolled back
+        if (generation == _local['generation']
+                and time.monotonic() - checked_at < getattr(settings, 'SKILL_CATALOG_VERSION_TTL', 5)
+                and (in_atomic_block or not in_transaction)):
+            return version
+    version = CatalogVersion.current()
+    _thread.memo = (version, _local['generation'], time.monotonic(), in_atomic_block)
+    return version
+
+
+def bump_version():
+    """
+    Invalidates the catalog. Called on every Skill/Category write: the new
+    version commits with the write, and this process re-reads it right away
+    and again after commit, when other threads can see it too.
+    """
+    from .models import CatalogVersion
+
+    CatalogVersion.bump()
+    previous = _local['version']
+    if previous is not None:
+        _cache().delete(DATA_KEY.format(version=previous))
+    _expire()
+    transaction.on_commit(_expire)
+
+
+def _expire():
+    with _lock:
+        _local['generation'] += 1
+
+
+def get_catalog():
+    """
+    Returns the catalog dict: ``version``, ``categories``, ``skills``
+    (serialized, ordered by id) plus the ``by_category``,
+    ``categories_by_id`` and ``skills_by_id`` lookups.
+    """
+    version = current_version()
+    data = _local['data']
+    if data is not None and _local['version'] == version:
+        return data
+
+    with _lock:
+        if _local['data'] is not None and _local['version'] == version:
+            return _local['data']
+        cache = _cache()
+        data = cache.get(DATA_KEY.format(version=version))
+        if data is None:
+            data = build_catalog(version)
+            cache.set(DATA_KEY.format(version=version), data,
+                      timeout=getattr(settings, 'SKILL_CATALOG_TIMEOUT', 24 * 60 * 60))
+        _local['version'], _local['data'] = version, data
+        return data
+
+
+def build_catalog(version):
+    from .models import Category, Skill
+    from .serializers import CategorySerializer, SkillSerializer
+
+    categories = [dict(category) for category in
+                  CategorySerializer(Category.objects.order_by('id'), many=True).data]
+    skills = [dict(skill) for skill in
+              SkillSerializer(Skill.objects.select_related('category').order_by('id'), many=True).data]
+
+    by_category = {}
+    for skill in skills:
+        if skill['category'] is not None:
+            by_category.setdefault(skill['category']['id'], []).append(skill)
+    return {
+        'version': version,
+        'categories': categories,
+        'categories_by_id': {category['id']: category for category in categories},
+        'skills': skills,
+        'skills_by_id': {skill['id']: skill for skill in skills},
+        'by_category': by_category,
+    }
+
+
+def clear():
+    """Drops this process's copy and starts a new version (tests, shell)."""
+    from .models import CatalogVersion
+
+    with _lock:
+        _local['version'], _local['data'] = None, None
+    CatalogVersion.bump()
+    _expire()
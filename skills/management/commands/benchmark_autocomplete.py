@@ -0,0 +1,113 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from skills import autocomplete, catalog
+from skills.autocomplete import AutocompleteIndex
+from skillswap_project import benchmarking
+
+
+class Command(BaseCommand):
+    help = ('Measures skill autocomplete build time and query latency on synthetic skill names, '
+            'then suggest() latency right after new skills bump the catalog version.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skills', type=int, default=100000, help='Number of synthetic skills')
+        parser.add_argument('--queries', type=int, default=5000, help='Queries per kind')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--db-skills', type=int, default=20000,
+                            help='Skills stored in a temporary database for the version bump run')
+        parser.add_argument('--bumps', type=int, default=200, help='New skills created during that run')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        names = self.make_names(rng, options['skills'])
+        popularity = {skill_id: int(rng.paretovariate(1.2)) for skill_id in range(len(names))}
+
+        started = time.perf_counter()
+        index = AutocompleteIndex(enumerate(names), popularity)
+        self.stdout.write(f'Built index over {len(index)} skills in {time.perf_counter() - started:.2f}s')
+
+        started = time.perf_counter()
+        for offset in range(100):
+            index.add(len(names) + offset, f'{rng.choice(names)} {offset}')
+        self.stdout.write(f'Incremental add: {(time.perf_counter() - started) * 10:.3f} ms per skill')
+
+        kinds = {
+            'prefix': lambda name: name[:rng.randint(1, min(len(name), 8))],
+            'word prefix': lambda name: name.split(' ')[-1][:rng.randint(2, 5)],
+            'typo': lambda name: self.typo(rng, name.split(' ')[0]),
+            'miss': lambda name: ''.join(rng.choice(string.ascii_lowercase) for _ in range(6)),
+        }
+        self.stdout.write(f"{'query kind':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for kind, make_query in kinds.items():
+            queries = [make_query(rng.choice(names)) for _ in range(options['queries'])]
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.row(kind, timings)
+
+        with benchmarking.temporary_database():
+            self.time_version_bumps(rng, names[:options['db_skills']], options['bumps'])
+
+    def time_version_bumps(self, rng, names, bumps):
+        """suggest() as a keystroke sees it, steady and right after a new skill."""
+        from skills.models import Skill
+
+        Skill.objects.bulk_create([Skill(name=name) for name in names], batch_size=5000)
+        catalog.clear()
+        autocomplete.reset()
+        started = time.perf_counter()
+        autocomplete.suggest('a')
+        self.stdout.write(f'First suggest() over {len(names)} stored skills: {time.perf_counter() - started:.2f}s')
+
+        steady, bumped = [], []
+        for offset in range(bumps):
+            query = rng.choice(names)[:3]
+            started = time.perf_counter()
+            autocomplete.suggest(query)
+            steady.append((time.perf_counter() - started) * 1000)
+
+            Skill.objects.create(name=f'{rng.choice(names)} {offset}')
+            started = time.perf_counter()
+            autocomplete.suggest(query)
+            bumped.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(f"{'suggest()':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        self.row('steady', steady)
+        self.row('after bump', bumped)
+
+    def row(self, label, timings):
+        timings = sorted(timings)
+        self.stdout.write(
+            f'{label:<12} {self.percentile(timings, 50):>8.3f} {self.percentile(timings, 95):>8.3f} '
+            f'{self.percentile(timings, 99):>8.3f} {timings[-1]:>8.3f}'
+        )
+
+    def make_names(self, rng, count):
+        # Pronounceable words combined into one- to three-word skill names
+        consonants, vowels = 'bcdfghjklmnprstvwz', 'aeiou'
+        words = list({
+            ''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+            for _ in range(count // 5 + 100)
+        })
+        names = set()
+        while len(names) < count:
+            names.add(' '.join(rng.choice(words) for _ in range(rng.choice((1, 2, 2, 3)))).title())
+        return sorted(names)
+
+    def typo(self, rng, word):
+        # Swap two neighbouring letters, or drop one
+        if len(word) < 4:
+            return word
+        position = rng.randrange(len(word) - 1)
+        if rng.random() < 0.5:
+            return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+        return word[:position] + word[position + 1:]
+
+    def percentile(self, timings, pct):
+        return timings[min(len(timings) - 1, int(len(timings) * pct / 100))]
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from skills import recommend
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the top related skills per skill from profile skill co-occurrence (needs NumPy and SciPy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommend.TOP_K, help='Related skills kept per skill')
+        parser.add_argument('--chunk-size', type=int, default=recommend.CHUNK_SIZE,
+                            help='Profile ids read and multiplied per block')
+        parser.add_argument('--min-support', type=int, default=recommend.MIN_SUPPORT,
+                            help='Fewest profiles that must list both skills')
+        parser.add_argument('--synthetic', type=int, metavar='PROFILES',
+                            help='Time the job on this many synthetic profiles instead; nothing is saved')
+        parser.add_argument('--skills', type=int, default=5000, help='Skills in the synthetic catalog')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError('compute_related_skills needs numpy and scipy installed.')
+
+        kwargs = {
+            'chunk_size': options['chunk_size'],
+            'top_k': options['top_k'],
+            'min_support': options['min_support'],
+        }
+        if options['synthetic']:
+            kwargs.update(
+                chunks=self.synthetic_chunks(options['synthetic'], options['skills'],
+                                             options['chunk_size'], options['seed']),
+                skill_ids=range(1, options['skills'] + 1),
+                save=False,
+            )
+        stats = recommend.compute(**kwargs)
+
+        self.stdout.write(
+            f"Counted {stats['profiles']} profile(s) x {stats['skills']} skill(s) "
+            f"({stats['pairs']} co-occurring pairs) in {stats['count_seconds']:.2f}s"
+        )
+        self.stdout.write(f"Ranked top {options['top_k']} in {stats['rank_seconds']:.2f}s")
+        if options['synthetic']:
+            self.stdout.write(self.style.SUCCESS(f"Synthetic run: {stats['rows']} related skill row(s), not saved."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Saved {stats['rows']} related skill row(s) in {stats['write_seconds']:.2f}s."
+            ))
+
+    def synthetic_chunks(self, profiles, skills, chunk_size, seed):
+        # Profiles pick 1-8 skills from one of a few dozen topical clusters,
+        # skewed towards each cluster's popular skills
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        clusters = max(1, skills // 100)
+        per_cluster = skills // clusters
+        for start in range(0, profiles, chunk_size):
+            size = min(chunk_size, profiles - start)
+            picks = rng.integers(1, 9, size=size)
+            profile_ids = np.repeat(np.arange(start, start + size), picks)
+            cluster = np.repeat(rng.integers(0, clusters, size=size), picks)
+            offset = (rng.zipf(1.5, size=len(profile_ids)) - 1) % per_cluster
+            yield profile_ids, cluster * per_cluster + offset + 1
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0002_category_skill_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('support', models.PositiveIntegerField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='skills.skill')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related', to='skills.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', '-score'], name='related_skill_rank')],
+                'constraints': [models.UniqueConstraint(fields=('skill', 'related'), name='unique_related_skill')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:52
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    apps.get_model('skills', 'CatalogVersion').objects.create(pk=1, token=uuid.uuid4().hex)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0003_relatedskill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
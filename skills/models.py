@@ -1,5 +1,11 @@
 # skills/models.py
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, catalog
 
 class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -14,4 +20,70 @@ class Skill(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='skills')
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class CatalogVersion(models.Model):
+    """
+    Version of the skill catalog (skills/catalog.py): a single row whose
+    token every Skill or Category write replaces in its own transaction.
+    """
+    token = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f'skill catalog {self.token}'
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('token', flat=True).first() or ''
+
+    @classmethod
+    def bump(cls):
+        token = uuid.uuid4().hex
+        if not cls.objects.filter(pk=1).update(token=token):
+            # First write ever; a concurrent one may create the row too
+            cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+            cls.objects.filter(pk=1).update(token=token)
+        return token
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    catalog.bump_version()
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_autocomplete(sender, created=False, **kwargs):
+    # Autocomplete picks up new and deleted skills by itself; a rename or
+    # a category change needs a rebuild
+    if not created:
+        transaction.on_commit(autocomplete.refresh)
+
+
+class RelatedSkill(models.Model):
+    """
+    Top-K most similar skills per skill, by cosine similarity of the sets of
+    profiles that teach or learn them. Written only by the
+    ``compute_related_skills`` batch job (see skills/recommend.py).
+    """
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='related')
+    related = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    # Profiles listing both skills
+    support = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['skill', 'related'], name='unique_related_skill'),
+        ]
+        indexes = [
+            models.Index(fields=['skill', '-score'], name='related_skill_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.skill.name} ~ {self.related.name} ({self.score:.2f})'
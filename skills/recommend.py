@@ -0,0 +1,176 @@
+# skills/recommend.py
+"""
+Related-skill recommendations from profile co-occurrence.
+
+Every profile is a row of a sparse profile x skill matrix X (1 where the
+profile teaches or learns the skill). X.T @ X counts, for each pair of
+skills, how many profiles list both, with each skill's own count on the
+diagonal; dividing by sqrt(count_a * count_b) gives the cosine similarity of
+the two skills' profile sets. The top ``TOP_K`` neighbours of every skill
+are stored as RelatedSkill rows.
+
+X is never materialized: profiles are read in blocks of ``chunk_size`` ids
+and each block's product is added to the skill x skill total, so memory
+depends on the block size and the number of skill pairs, not on the number
+of profiles. The job runs from the ``compute_related_skills`` command and
+needs NumPy and SciPy; serving the recommendations does not.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Case, FloatField, Max, Min, Sum, Value, When
+
+from .models import RelatedSkill, Skill
+
+TOP_K = 10
+CHUNK_SIZE = 50000
+# Pairs listed together by fewer profiles are noise, however high their cosine
+MIN_SUPPORT = 2
+# Related skills used to find suggested teachers, and how many to suggest
+RELATED_SKILL_LIMIT = 10
+SUGGESTION_LIMIT = 6
+
+
+def profile_chunks(chunk_size=CHUNK_SIZE):
+    """
+    Yields (profile_ids, skill_ids) array pairs from both skill M2M tables,
+    one block of ``chunk_size`` consecutive profile ids at a time.
+    """
+    import numpy as np
+    from users.models import Profile
+
+    bounds = Profile.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        pairs = []
+        for through in (Profile.skills_to_teach.through, Profile.skills_to_learn.through):
+            pairs.extend(through.objects.filter(
+                profile_id__gte=start, profile_id__lt=start + chunk_size
+            ).values_list('profile_id', 'skill_id'))
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        yield pairs[:, 0], pairs[:, 1]
+
+
+def co_occurrence(chunks, skill_ids):
+    """
+    Sums X.T @ X over ``chunks``. Returns (skill_ids as a sorted array,
+    the skill x skill count matrix in CSR form, number of profiles seen).
+    Pairs naming a skill outside ``skill_ids`` are ignored.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    skill_ids = np.unique(np.asarray(list(skill_ids), dtype=np.int64))
+    size = len(skill_ids)
+    counts = sparse.csr_matrix((size, size), dtype=np.int64)
+    profiles = 0
+    for profile_ids, pair_skill_ids in chunks:
+        if not len(profile_ids) or not size:
+            continue
+        columns = np.searchsorted(skill_ids, pair_skill_ids).clip(max=size - 1)
+        known = skill_ids[columns] == pair_skill_ids
+        rows, row_index = np.unique(profile_ids[known], return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(row_index), dtype=np.int64), (row_index, columns[known])),
+            shape=(len(rows), size),
+        )
+        # A skill both taught and learned counts once
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        counts = counts + (matrix.T @ matrix).tocsr()
+        profiles += len(rows)
+    return skill_ids, counts, profiles
+
+
+def top_related(skill_ids, counts, top_k=TOP_K, min_support=MIN_SUPPORT):
+    """
+    Cosine-ranks every skill's neighbours. Returns parallel arrays
+    (skill_id, related_id, score, support), best ``top_k`` per skill.
+    """
+    import numpy as np
+
+    totals = counts.diagonal().astype(np.float64)
+    pairs = counts.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_support)
+    rows, cols, support = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+    scores = support / np.sqrt(totals[rows] * totals[cols])
+
+    # Sort by skill, best score first, then rank within each skill's run
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, support, scores = rows[order], cols[order], support[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+    best = rank < top_k
+    return skill_ids[rows[best]], skill_ids[cols[best]], scores[best], support[best]
+
+
+def compute(chunk_size=CHUNK_SIZE, top_k=TOP_K, min_support=MIN_SUPPORT, chunks=None, skill_ids=None,
+            save=True):
+    """
+    Runs the whole job and replaces the stored RelatedSkill rows (unless
+    ``save`` is False). ``chunks`` and ``skill_ids`` default to the
+    database. Returns timing and size statistics.
+    """
+    stats = {}
+    started = time.perf_counter()
+    if skill_ids is None:
+        skill_ids = Skill.objects.values_list('pk', flat=True)
+    if chunks is None:
+        chunks = profile_chunks(chunk_size)
+    skill_ids, counts, stats['profiles'] = co_occurrence(chunks, skill_ids)
+    stats['skills'], stats['pairs'] = len(skill_ids), counts.nnz
+    stats['count_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    related = top_related(skill_ids, counts, top_k, min_support)
+    stats['rank_seconds'] = time.perf_counter() - started
+    stats['rows'] = len(related[0])
+
+    started = time.perf_counter()
+    if save:
+        with transaction.atomic():
+            RelatedSkill.objects.all().delete()
+            RelatedSkill.objects.bulk_create(
+                [RelatedSkill(skill_id=skill_id, related_id=related_id, score=score, support=support)
+                 for skill_id, related_id, score, support in zip(*(column.tolist() for column in related))],
+                batch_size=5000
+            )
+    stats['write_seconds'] = time.perf_counter() - started
+    return stats
+
+
+def suggest_teachers(user, limit=SUGGESTION_LIMIT):
+    """
+    Profiles teaching skills related to what ``user`` wants to learn, leaving
+    out the exact matches already in the match index. Returns (profiles,
+    {related skill id: score}); two queries.
+    """
+    from users.models import Profile
+
+    wanted = Profile.skills_to_learn.through.objects.filter(profile__user=user).values('skill_id')
+    related = dict(
+        RelatedSkill.objects.filter(
+            skill_id__in=wanted
+        ).exclude(
+            related_id__in=wanted
+        ).values_list('related_id').annotate(best=Max('score')).order_by('-best', 'related_id')[:RELATED_SKILL_LIMIT]
+    )
+    if not related:
+        return [], {}
+
+    # Filtering before annotating makes the Sum see only the related skills
+    relevance = Sum(Case(
+        *[When(skills_to_teach=skill_id, then=Value(score)) for skill_id, score in related.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+    profiles = Profile.objects.filter(
+        skills_to_teach__in=list(related)
+    ).exclude(
+        user=user
+    ).exclude(
+        user__learner_matches__learner=user
+    ).annotate(
+        relevance=relevance
+    ).select_related('user').order_by('-relevance', 'id')[:limit]
+    return list(profiles), related
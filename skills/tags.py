@@ -0,0 +1,51 @@
+# skills/tags.py
+from django.db import transaction
+
+from . import catalog
+from .models import Skill
+
+
+def parse_skill_names(raw):
+    """
+    Splits a comma-separated skill list into normalized names
+    ("  python, guitar " -> ['Python', 'Guitar']), dropping blanks and
+    duplicates while keeping the user's order.
+    """
+    names = []
+    for name in (raw or '').split(','):
+        name = name.strip().title()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def resolve_skill_ids(names):
+    """
+    Returns the Skill ids for ``names``, creating the missing ones. Costs one
+    lookup, plus one bulk insert and one re-read when new skills are needed.
+    """
+    ids = dict(Skill.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        # ignore_conflicts covers a concurrent request creating the same skill
+        Skill.objects.bulk_create([Skill(name=name) for name in missing], ignore_conflicts=True)
+        # bulk_create sends no post_save, so invalidate the catalog here
+        catalog.bump_version()
+        ids.update(Skill.objects.filter(name__in=missing).values_list('name', 'id'))
+    return [ids[name] for name in names]
+
+
+def set_skills(manager, raw):
+    """
+    Replaces the skills in an M2M manager (``profile.skills_to_teach`` or
+    ``profile.skills_to_learn``) with the comma-separated list ``raw``.
+    Only the rows that actually changed are deleted or inserted, so the
+    cost stays constant however many skills are listed.
+    """
+    with transaction.atomic():
+        wanted = set(resolve_skill_ids(parse_skill_names(raw)))
+        current = set(manager.values_list('id', flat=True))
+        if current - wanted:
+            manager.remove(*(current - wanted))
+        if wanted - current:
+            manager.add(*(wanted - current))
@@ -1,3 +1,354 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+
+from scheduling.models import Session, Feedback
+from users.models import Profile, SwapMatch, TeacherMatch
+from . import autocomplete, catalog, recommend
+from .models import Skill, Category, CatalogVersion, RelatedSkill
+from .tags import set_skills
+
+
+class MatchesQueryCountTests(TestCase):
+    def setUp(self):
+        self.python = Skill.objects.create(name='Python')
+        self.guitar = Skill.objects.create(name='Guitar')
+
+        self.learner = User.objects.create_user(username='learner')
+        self.learner.profile.skills_to_learn.add(self.python, self.guitar)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def add_teachers(self, count):
+        for _ in range(count):
+            index = User.objects.count()
+            teacher = User.objects.create_user(username=f'teacher{index}')
+            teacher.profile.skills_to_teach.add(self.python, self.guitar)
+            teacher.profile.skills_to_learn.add(self.guitar)
+
+            student = User.objects.create_user(username=f'student{index}')
+            Session.objects.create(teacher=teacher, learner=student, skill=self.python, status='confirmed')
+            done = Session.objects.create(teacher=teacher, learner=student, skill=self.guitar, status='completed')
+            Feedback.objects.create(session=done, rating=5, comment='Great')
+
+    def count_match_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/skills/matches/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_query_count_does_not_grow_with_matches(self):
+        self.add_teachers(2)
+        few_queries, few = self.count_match_queries()
+
+        self.add_teachers(10)
+        many_queries, many = self.count_match_queries()
+
+        self.assertEqual(len(few), 2)
+        self.assertEqual(len(many), 12)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_batched_fields_match_single_profile_serialization(self):
+        self.add_teachers(1)
+        _, data = self.count_match_queries()
+        match = data[0]
+
+        self.assertTrue(match['is_busy'])
+        self.assertEqual(len(match['received_feedback']), 1)
+        self.assertEqual(match['received_feedback'][0]['skill_name'], 'Guitar')
+        self.assertEqual(
+            sorted(skill['name'] for skill in match['skills_to_teach']),
+            ['Guitar', 'Python']
+        )
+
+        detail = self.client.get(f"/api/users/{match['user_id']}/").data['profile']
+        for field in ('is_busy', 'active_session_end_time', 'received_feedback',
+                      'skills_to_teach', 'skills_to_learn'):
+            self.assertEqual(detail[field], match[field])
+
+
+class MatchIndexTests(TestCase):
+    def setUp(self):
+        self.python, self.guitar, self.chess = (
+            Skill.objects.create(name=name) for name in ('Python', 'Guitar', 'Chess')
+        )
+        self.learner = User.objects.create_user(username='learner')
+        self.one = User.objects.create_user(username='one')
+        self.two = User.objects.create_user(username='two')
+
+    def overlaps(self):
+        return dict(TeacherMatch.objects.filter(
+            learner=self.learner
+        ).values_list('teacher__username', 'overlap'))
+
+    def test_index_follows_skill_changes(self):
+        self.learner.profile.skills_to_learn.add(self.python, self.guitar)
+        self.one.profile.skills_to_teach.add(self.python)
+        self.two.profile.skills_to_teach.add(self.python, self.guitar, self.chess)
+        self.assertEqual(self.overlaps(), {'one': 1, 'two': 2})
+
+        self.two.profile.skills_to_teach.remove(self.guitar)
+        self.learner.profile.skills_to_learn.add(self.chess)
+        self.assertEqual(self.overlaps(), {'one': 1, 'two': 2})
+
+        self.python.teachers.clear()
+        self.assertEqual(self.overlaps(), {'two': 1})
+
+        self.chess.delete()
+        self.assertEqual(self.overlaps(), {})
+
+    def test_rebuild_matches_incremental_index(self):
+        self.learner.profile.skills_to_learn.add(self.python, self.guitar)
+        self.one.profile.skills_to_teach.add(self.guitar)
+        self.two.profile.skills_to_learn.add(self.chess)
+        self.learner.profile.skills_to_teach.add(self.chess, self.python)
+        incremental = set(TeacherMatch.objects.values_list('learner_id', 'teacher_id', 'overlap'))
+
+        TeacherMatch.rebuild()
+        rebuilt = set(TeacherMatch.objects.values_list('learner_id', 'teacher_id', 'overlap'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_matches_are_ranked_by_overlap(self):
+        self.learner.profile.skills_to_learn.add(self.python, self.guitar)
+        self.one.profile.skills_to_teach.add(self.python)
+        self.two.profile.skills_to_teach.add(self.python, self.guitar)
+
+        client = APIClient()
+        client.force_authenticate(self.learner)
+        response = client.get('/api/skills/matches/')
+        self.assertEqual([match['username'] for match in response.data['results']], ['two', 'one'])
+
+
+class SkillCatalogTests(TestCase):
+    def setUp(self):
+        catalog.clear()
+        self.music = Category.objects.create(name='Music')
+        Skill.objects.create(name='Guitar', category=self.music)
+        Skill.objects.create(name='Python')
+        self.client = APIClient()
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        return response, len(queries)
+
+    def test_cached_catalog_serves_without_queries(self):
+        first, _ = self.get('/api/skills/')
+        self.assertEqual([skill['name'] for skill in first.data], ['Guitar', 'Python'])
+        self.assertEqual(first.data[0]['category']['name'], 'Music')
+
+        for url in ('/api/skills/', '/api/categories/', f'/api/skills/by_category/?category_id={self.music.id}'):
+            response, queries = self.get(url)
+            self.assertEqual((response.status_code, queries), (200, 0), url)
+
+    def test_etag_changes_on_every_kind_of_write(self):
+        etag = self.get('/api/skills/')[0]['ETag']
+        self.assertEqual(self.get('/api/skills/', If_None_Match=etag)[0].status_code, 304)
+
+        writes = [
+            lambda: Category.objects.create(name='Code'),
+            lambda: Skill.objects.filter(name='Python').get().delete(),
+            # Bulk-created through skill tags, which sends no post_save
+            lambda: set_skills(User.objects.create_user(username='u').profile.skills_to_teach, 'Chess'),
+        ]
+        for write in writes:
+            write()
+            response = self.get('/api/skills/', If_None_Match=etag)[0]
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+        self.assertEqual([skill['name'] for skill in response.data], ['Guitar', 'Chess'])
+
+    def test_writes_from_other_processes_show_up_after_the_version_ttl(self):
+        etag = self.get('/api/skills/')[0]['ETag']
+        # Another process's write: the row changes, but nothing here is told
+        CatalogVersion.objects.filter(pk=1).update(token='elsewhere')
+        self.assertEqual(self.get('/api/skills/', If_None_Match=etag)[0].status_code, 304)
+
+        with override_settings(SKILL_CATALOG_VERSION_TTL=0):
+            response = self.get('/api/skills/', If_None_Match=etag)[0]
+        self.assertEqual((response.status_code, response['ETag']), (200, '"skills-elsewhere"'))
+
+    def test_new_version_drops_the_previous_catalog(self):
+        cache = caches[settings.SKILL_CATALOG_CACHE]
+        old = catalog.get_catalog()['version']
+        self.assertIsNotNone(cache.get(catalog.DATA_KEY.format(version=old)))
+
+        Skill.objects.create(name='Chess')
+        self.assertIsNone(cache.get(catalog.DATA_KEY.format(version=old)))
+        self.assertNotEqual(catalog.get_catalog()['version'], old)
+
+
+@override_settings(AUTOCOMPLETE_ASYNC=False)
+class SkillAutocompleteTests(TestCase):
+    def setUp(self):
+        catalog.clear()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        for name in ('Happy Cooking', 'Python', 'Pygame', 'Spanish', 'Public Speaking'):
+            Skill.objects.create(name=name)
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get('/api/skills/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [skill['name'] for skill in response.data['results']]
+
+    def test_prefix_matches_rank_by_tier_then_popularity(self):
+        teacher = User.objects.create_user(username='teacher').profile
+        teacher.skills_to_teach.add(*Skill.objects.filter(name__in=['Pygame', 'Spanish']))
+
+        self.assertEqual(self.names('py'), ['Pygame', 'Python'])
+        self.assertEqual(self.names('python'), ['Python'])
+        # Later words match after whole-name prefixes
+        self.assertEqual(self.names('sp'), ['Spanish', 'Public Speaking'])
+
+    def test_typos_fall_back_to_trigram_matches(self):
+        self.assertEqual(self.names('pyhton')[0], 'Python')
+        self.assertEqual(self.names('spanihs')[0], 'Spanish')
+        self.assertEqual(self.names('zzzz'), [])
+
+    def test_new_skills_are_added_without_rebuilding(self):
+        self.names('py')
+        index = autocomplete.get_index()
+        set_skills(User.objects.create_user(username='u').profile.skills_to_learn, 'Pytorch')
+
+        self.assertIn('Pytorch', self.names('pyt'))
+        self.assertIs(autocomplete.get_index(), index)
+
+        Skill.objects.filter(name='Pygame').delete()
+        self.assertEqual(self.names('pyg'), [])
+        self.assertIsNot(autocomplete.get_index(), index)
+
+    def test_renames_and_popularity_rebuild_the_index(self):
+        self.assertEqual(self.names('py'), ['Pygame', 'Python'])
+        skill = Skill.objects.get(name='Pygame')
+        skill.name = 'Godot'
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.save()
+        self.assertEqual(self.names('go'), ['Godot'])
+        self.assertEqual(self.names('py'), ['Python'])
+
+        Skill.objects.create(name='Pyramids')
+        teacher = User.objects.create_user(username='teacher').profile
+        teacher.skills_to_teach.add(Skill.objects.get(name='Pyramids'))
+        # Popularity is only re-read by a rebuild
+        self.assertEqual(self.names('py'), ['Python', 'Pyramids'])
+        with override_settings(AUTOCOMPLETE_POPULARITY_TTL=0):
+            self.assertEqual(self.names('py'), ['Pyramids', 'Python'])
+
+
+class RelatedSkillTests(TestCase):
+    def setUp(self):
+        self.python, self.django, self.flask, self.guitar = [
+            Skill.objects.create(name=name) for name in ('Python', 'Django', 'Flask', 'Guitar')
+        ]
+        listings = [
+            ([self.python], [self.django]), ([self.python, self.django], []), ([self.django], [self.python]),
+            ([self.python, self.flask], []), ([self.flask], [self.python]), ([self.guitar], [self.flask]),
+        ]
+        for index, (teach, learn) in enumerate(listings):
+            profile = User.objects.create_user(username=f'user{index}').profile
+            profile.skills_to_teach.add(*teach)
+            profile.skills_to_learn.add(*learn)
+
+    def related(self):
+        return {
+            (row.skill.name, row.related.name): (round(row.score, 3), row.support)
+            for row in RelatedSkill.objects.select_related('skill', 'related')
+        }
+
+    def test_cosine_top_k_does_not_depend_on_chunking(self):
+        stats = recommend.compute(chunk_size=2, top_k=1)
+        chunked = self.related()
+        recommend.compute(chunk_size=1000, top_k=1)
+
+        self.assertEqual(chunked, self.related())
+        self.assertEqual(stats['profiles'], 6)
+        # Python is listed by 5 profiles, Django by 3 (3 together), Flask by 3 (2 together)
+        self.assertEqual(chunked, {
+            ('Python', 'Django'): (0.775, 3),
+            ('Django', 'Python'): (0.775, 3),
+            ('Flask', 'Python'): (0.516, 2),
+        })
+
+    def test_matches_suggest_teachers_of_related_skills(self):
+        recommend.compute()
+        learner = User.objects.create_user(username='learner')
+        learner.profile.skills_to_learn.add(self.python)
+        client = APIClient()
+        client.force_authenticate(learner)
+
+        data = client.get('/api/skills/matches/').data
+        matched = {item['username'] for item in data['results']}
+        suggested = {item['username']: item['related_skills'] for item in data['suggestions']}
+        self.assertFalse(matched & set(suggested))
+        self.assertEqual(suggested, {'user2': ['Django'], 'user4': ['Flask']})
+        self.assertNotIn('suggestions', client.get('/api/skills/matches/', {'search': 'user'}).data)
+
+
+class SwapMatchTests(TestCase):
+    def setUp(self):
+        self.python, self.guitar, self.french, self.chess = [
+            Skill.objects.create(name=name) for name in ('Python', 'Guitar', 'French', 'Chess')
+        ]
+        self.ana = self.make_user('ana', teach=[self.python, self.chess], learn=[self.guitar])
+        self.ben = self.make_user('ben', teach=[self.guitar], learn=[self.python, self.chess])
+        self.cy = self.make_user('cy', teach=[self.guitar, self.french], learn=[self.python])
+        self.client = APIClient()
+        self.client.force_authenticate(self.ana)
+
+    def make_user(self, username, teach=(), learn=()):
+        user = User.objects.create_user(username=username)
+        user.profile.skills_to_teach.add(*teach)
+        user.profile.skills_to_learn.add(*learn)
+        return user
+
+    def swaps(self):
+        return set(SwapMatch.objects.values_list('user__username', 'partner__username', 'gives', 'gets', 'score'))
+
+    def test_index_follows_skill_changes_and_matches_rebuild(self):
+        self.assertEqual(self.swaps(), {
+            ('ana', 'ben', 2, 1, 1), ('ben', 'ana', 1, 2, 1),
+            ('ana', 'cy', 1, 1, 1), ('cy', 'ana', 1, 1, 1),
+        })
+
+        self.cy.profile.skills_to_learn.clear()
+        self.guitar.learners.add(self.cy.profile)
+        self.ben.profile.skills_to_learn.remove(self.chess)
+        incremental = self.swaps()
+        self.assertEqual(incremental, {('ana', 'ben', 1, 1, 1), ('ben', 'ana', 1, 1, 1)})
+
+        SwapMatch.rebuild()
+        self.assertEqual(self.swaps(), incremental)
+
+    def test_endpoint_ranks_swaps_and_lists_cycles(self):
+        self.ana.profile.skills_to_learn.add(self.french)
+        dave = self.make_user('dave', teach=[self.french], learn=[self.chess])
+        # ana -> dave (Chess), dave -> cy (French), cy -> ana (Guitar, French)
+        self.french.learners.add(self.cy.profile)
+        self.chess.learners.add(self.cy.profile)
+
+        data = self.client.get('/api/skills/swaps/', {'cycles': 1}).data
+        self.assertEqual(
+            [(item['partner']['username'], item['score'], item['you_learn'], item['you_teach'])
+             for item in data['results']],
+            [('cy', 2, ['Guitar', 'French'], ['Python', 'Chess']),
+             ('ben', 1, ['Guitar'], ['Python', 'Chess']),
+             ('dave', 1, ['French'], ['Chess'])]
+        )
+        cycles = {(cycle['you_teach']['username'], cycle['teaches_you']['username']) for cycle in data['cycles']}
+        self.assertIn(('dave', 'cy'), cycles)
+        self.assertNotIn('cycles', self.client.get('/api/skills/swaps/').data)
+
+    def test_endpoint_skips_partners_without_a_profile(self):
+        Profile.objects.filter(user=self.cy).delete()
+        response = self.client.get('/api/skills/swaps/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['partner']['username'] for item in response.data['results']], ['ben'])
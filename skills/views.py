@@ -3,17 +3,12 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from users.models import Profile
 from scheduling.models import Session
-from django.db.models import Q
+from django.db.models import Q, F
 
 # skills/views.py
 
 @login_required
 def skill_match_view(request):
-    user_profile = request.user.profile
-    
-    # Get skills the user wants to learn
-    skills_to_learn = user_profile.skills_to_learn.all()
-    
     # --- START OF NEW LOGIC ---
     # 1. Find all teacher IDs (user IDs) with whom the learner
     #    already has an active session ('pending' OR 'confirmed').
@@ -23,14 +18,15 @@ def skill_match_view(request):
     ).values_list('teacher_id', flat=True)
     # --- END OF NEW LOGIC ---
 
-    # Find profiles of users who can teach one of those skills
+    # Find profiles of users who can teach one of the skills we want,
+    # straight from the match index, best overlap first
     matches = Profile.objects.filter(
-        skills_to_teach__in=skills_to_learn
-    ).exclude(
-        user=request.user  # Exclude the user themselves
+        user__learner_matches__learner=request.user
+    ).annotate(
+        overlap=F('user__learner_matches__overlap')
     ).exclude(
         user_id__in=active_teacher_ids  # <-- 2. ADD THIS EXCLUSION
-    ).distinct()
+    ).select_related('user').order_by('-overlap', 'id')
     
     context = {
         'matches': matches
@@ -2,6 +2,8 @@
 ASGI config for skillswap_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve through it (e.g. ``daphne skillswap_project.asgi:application``) for the
+notification event stream at /api/notifications/stream/.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
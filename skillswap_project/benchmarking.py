@@ -0,0 +1,234 @@
+# skillswap_project/benchmarking.py
+"""
+In-process API benchmarks, driven by the ``benchmark_api`` command.
+
+``seed`` fills the database with synthetic users, skills, sessions,
+feedback and notifications, then rebuilds every denormalized table the way
+the rebuild commands would. ``run`` calls the real endpoints through the
+DRF test client, authenticated with real tokens, and records per endpoint:
+latency percentiles, throughput, queries per request and the peak Python
+memory allocated by one request. The result is a plain dict, written as
+JSON so two runs (say, before and after a change) can be diffed with
+``compare``.
+
+Numbers are for one process without a network or a web server in front,
+on whatever database the command points at (by default a fresh temporary
+test database), so compare runs made the same way, not absolute values.
+"""
+import io
+import random
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .instrumentation import RequestStats
+
+PASSWORD = 'benchmark-password'
+
+# name -> (method, path)
+ENDPOINTS = {
+    'matches': ('GET', '/api/skills/matches/'),
+    'sessions': ('GET', '/api/sessions/'),
+    'notifications': ('GET', '/api/notifications/'),
+    'current_user': ('GET', '/api/users/current_user/'),
+    'login': ('POST', '/api/auth/login/'),
+}
+
+
+@contextmanager
+def temporary_database():
+    """A freshly migrated throwaway database, as the test runner makes one."""
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(users=500, skills=100, sessions_per_user=4, feedback_ratio=0.5, notifications_per_user=10, seed=1):
+    """
+    Creates the synthetic data set and returns [(username, token key)] for
+    every user. Everything is bulk-inserted, so derived tables are rebuilt
+    at the end instead of being maintained row by row.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from scheduling.models import ActiveSessionState, BusyInterval, Feedback, Notification, NotificationVersion, Session
+    from skills import autocomplete, catalog
+    from skills.models import Category, Skill
+    from users import search
+    from users.models import Profile, TeacherMatch
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    # Hashing is deliberately slow; hash once and share it
+    password = make_password(PASSWORD)
+
+    categories = Category.objects.bulk_create([Category(name=f'Category {index}') for index in range(10)])
+    skill_rows = Skill.objects.bulk_create([
+        Skill(name=f'Skill {index}', category=categories[index % len(categories)]) for index in range(skills)
+    ])
+    user_rows = User.objects.bulk_create([
+        User(username=f'bench{index}', password=password) for index in range(users)
+    ])
+    Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in user_rows])
+    profiles = Profile.objects.bulk_create([
+        Profile(user=user, bio=f'Synthetic user {user.username}') for user in user_rows
+    ])
+
+    teach, learn = [], []
+    for profile in profiles:
+        picked = rng.sample(skill_rows, min(len(skill_rows), rng.randint(2, 8)))
+        split = len(picked) // 2
+        teach += [Profile.skills_to_teach.through(profile_id=profile.pk, skill_id=skill.pk) for skill in picked[:split]]
+        learn += [Profile.skills_to_learn.through(profile_id=profile.pk, skill_id=skill.pk) for skill in picked[split:]]
+    Profile.skills_to_teach.through.objects.bulk_create(teach, batch_size=5000)
+    Profile.skills_to_learn.through.objects.bulk_create(learn, batch_size=5000)
+
+    sessions = []
+    for user in user_rows:
+        for _ in range(sessions_per_user):
+            start = now + timedelta(hours=rng.randint(-24 * 60, 24 * 30))
+            sessions.append(Session(
+                teacher=user, learner=rng.choice(user_rows), skill=rng.choice(skill_rows),
+                scheduled_time=start, end_time=start + timedelta(hours=1),
+                status='completed' if start < now else rng.choice(('pending', 'confirmed')),
+            ))
+    sessions = [session for session in sessions if session.teacher_id != session.learner_id]
+    sessions = Session.objects.bulk_create(sessions, batch_size=5000)
+    Feedback.objects.bulk_create([
+        Feedback(session=session, rating=rng.randint(1, 5), comment='Synthetic feedback')
+        for session in sessions if session.status == 'completed' and rng.random() < feedback_ratio
+    ], batch_size=5000)
+    Notification.objects.bulk_create([
+        Notification(recipient=user, message=f'Synthetic notification {index}', is_read=rng.random() < 0.7)
+        for user in user_rows for index in range(notifications_per_user)
+    ], batch_size=5000)
+
+    user_ids = [user.pk for user in user_rows]
+    TeacherMatch.rebuild()
+    search.rebuild()
+    ActiveSessionState.refresh(user_ids)
+    BusyInterval.sync(session for session in sessions if session.status == 'confirmed')
+    NotificationVersion.bump(user_ids)
+    call_command('rebuild_teacher_ratings', stdout=io.StringIO())
+    catalog.clear()
+    autocomplete.reset()
+
+    tokens = dict(Token.objects.values_list('user__username', 'key'))
+    return [(user.username, tokens[user.username]) for user in user_rows]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run(accounts, endpoints=None, requests=200, warmup=10, memory_requests=20):
+    """
+    Benchmarks each endpoint in ``endpoints`` (names from ENDPOINTS) with
+    ``requests`` sequential calls, cycling through ``accounts``. Returns
+    {endpoint: stats}.
+    """
+    from rest_framework.test import APIClient
+
+    results = {}
+    client = APIClient()
+    for name in endpoints or ENDPOINTS:
+        method, path = ENDPOINTS[name]
+
+        def call(index):
+            username, token = accounts[index % len(accounts)]
+            if method == 'POST':
+                client.credentials()
+                return client.post(path, {'username': username, 'password': PASSWORD}, format='json')
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            return client.get(path)
+
+        for index in range(warmup):
+            call(index)
+
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for index in range(requests):
+            stats = RequestStats()
+            with connection.execute_wrapper(stats):
+                request_started = time.perf_counter()
+                response = call(index)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            queries.append(stats.queries)
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for index in range(memory_requests):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                call(index)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+
+        latencies.sort()
+        results[name] = {
+            'requests': requests,
+            'errors': errors,
+            'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'max_ms': round(latencies[-1], 3),
+            'mean_queries': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries),
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+    client.credentials()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Regressions of ``current`` against ``baseline`` results: p95 latency
+    more than ``threshold`` (a fraction) slower, or more queries per
+    request. Returns a list of messages; empty means no regression.
+    """
+    problems = []
+    for name, stats in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        if before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            problems.append(
+                f"{name}: p95 {stats['p95_ms']:.2f} ms vs {before['p95_ms']:.2f} ms "
+                f"(+{(stats['p95_ms'] / before['p95_ms'] - 1) * 100:.0f}%)"
+            )
+        if stats['max_queries'] > before['max_queries']:
+            problems.append(f"{name}: up to {stats['max_queries']} queries vs {before['max_queries']}")
+    return problems
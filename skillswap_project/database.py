@@ -0,0 +1,120 @@
+# skillswap_project/database.py
+"""
+The ``DATABASES['default']`` entry, built from environment variables.
+
+SQLite is the default, with Django's own settings. ``SQLITE_TUNED=1``
+tunes it for several writers at once (use it in deployments, not on the
+checked-in development database, which WAL mode would convert):
+
+* WAL journaling, so readers never block the writer and the writer never
+  blocks readers; ``synchronous=NORMAL`` is durable in WAL mode except for
+  the last transactions before a power loss.
+* a busy timeout, so a writer waits for the lock instead of failing with
+  "database is locked".
+* ``BEGIN IMMEDIATE`` transactions: a transaction takes the write lock when
+  it starts, where the busy timeout applies. A deferred transaction that
+  reads first and writes later can't wait for the lock without deadlocking,
+  so SQLite fails it at once, timeout or not.
+* memory-mapped reads and a larger page cache.
+
+``DB_ENGINE=postgresql`` switches to PostgreSQL through psycopg 3, with a
+psycopg_pool connection pool unless ``POSTGRES_POOL=0``
+(``pip install "psycopg[binary,pool]"``).
+
+Variables and defaults:
+
+    DB_ENGINE               sqlite | postgresql          sqlite
+    DB_CONN_MAX_AGE         seconds to keep a connection 60 (tuned SQLite, PostgreSQL
+                                                         without a pool)
+    DB_CONN_HEALTH_CHECKS   check reused connections     1
+    SQLITE_PATH             database file                <BASE_DIR>/db.sqlite3
+    SQLITE_TUNED            1 for the tuning above      0
+    SQLITE_TIMEOUT          busy timeout, seconds        20
+    SQLITE_MMAP_SIZE        bytes                        268435456
+    SQLITE_CACHE_SIZE       KiB                          65536
+    POSTGRES_DB / _USER / _PASSWORD / _HOST / _PORT      skillswap / skillswap / '' / localhost / 5432
+    POSTGRES_POOL           use a connection pool        1
+    POSTGRES_POOL_MIN_SIZE / _MAX_SIZE                   2 / 10
+    POSTGRES_POOL_TIMEOUT   seconds to wait for a connection 10
+
+``benchmark_db_writes`` compares profiles under concurrent writes.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = ('sqlite', 'postgresql')
+
+
+def _int(environ, name, default):
+    value = environ.get(name, '')
+    return int(value) if value.strip() else default
+
+
+def _flag(environ, name, default):
+    value = environ.get(name, '').strip().lower()
+    if not value:
+        return default
+    return value in ('1', 'true', 'yes', 'on')
+
+
+def sqlite(environ, base_dir):
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('SQLITE_PATH') or os.path.join(base_dir, 'db.sqlite3'),
+    }
+    if not _flag(environ, 'SQLITE_TUNED', False):
+        return config
+
+    timeout = _int(environ, 'SQLITE_TIMEOUT', 20)
+    config.update({
+        'CONN_MAX_AGE': _int(environ, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': _flag(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            # sqlite3.connect(timeout=...) is SQLite's busy timeout
+            'timeout': timeout,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join([
+                'PRAGMA journal_mode=WAL',
+                'PRAGMA synchronous=NORMAL',
+                f"PRAGMA mmap_size={_int(environ, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+                # Negative means KiB rather than pages
+                f"PRAGMA cache_size=-{_int(environ, 'SQLITE_CACHE_SIZE', 64 * 1024)}",
+                'PRAGMA temp_store=MEMORY',
+            ]),
+        },
+    })
+    return config
+
+
+def postgresql(environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('POSTGRES_DB', 'skillswap'),
+        'USER': environ.get('POSTGRES_USER', 'skillswap'),
+        'PASSWORD': environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': environ.get('POSTGRES_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': _flag(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
+    }
+    if _flag(environ, 'POSTGRES_POOL', True):
+        # The pool keeps connections open; Django refuses CONN_MAX_AGE with it
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': _int(environ, 'POSTGRES_POOL_MIN_SIZE', 2),
+            'max_size': _int(environ, 'POSTGRES_POOL_MAX_SIZE', 10),
+            'timeout': _int(environ, 'POSTGRES_POOL_TIMEOUT', 10),
+        }
+    else:
+        config['CONN_MAX_AGE'] = _int(environ, 'DB_CONN_MAX_AGE', 60)
+    return config
+
+
+def from_env(environ, base_dir):
+    engine = environ.get('DB_ENGINE', 'sqlite').strip().lower() or 'sqlite'
+    if engine not in ENGINES:
+        raise ImproperlyConfigured(f"DB_ENGINE must be one of {', '.join(ENGINES)}, not {engine!r}")
+    if engine == 'postgresql':
+        return postgresql(environ)
+    return sqlite(environ, base_dir)
@@ -0,0 +1,246 @@
+# skillswap_project/instrumentation.py
+"""
+Per-request cost accounting for the API.
+
+``InstrumentationMiddleware`` counts the queries a request runs and the time
+spent in them, the time spent rendering the response body, the total time
+and the response size. Each response carries them in a
+``Server-Timing`` header, which browser dev tools show next to the request;
+every request is also folded into in-process, per-route histograms served
+by ``/api/metrics/`` to staff users. A request
+running more than ``API_QUERY_BUDGET`` queries is logged as a warning, so an
+N+1 regression shows up in the logs the first time it runs.
+
+Queries are counted by an execute wrapper that the middleware installs on
+the request thread's connections for the length of the request. Under ASGI
+it installs it in the thread that runs the request's sync code (sync views,
+and async views' thread-sensitive database calls), so those queries count
+as they do under WSGI. Rendering is timed by the default DRF renderer,
+``renderers.TimedJSONRenderer``, which charges the request of the current
+context.
+
+The bookkeeping is a few counters per query and per request. Metrics are
+per process and reset on restart; scrape the endpoint for anything longer
+lived. Set ``API_INSTRUMENTATION = False`` to remove the middleware.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds; the last bucket is everything above
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """What one request has cost so far."""
+
+    __slots__ = ('queries', 'db_seconds', 'render_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def count_queries(stats):
+    """
+    Charges the queries of this thread's connections to ``stats`` until the
+    returned ExitStack is closed.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+def current_stats():
+    """The RequestStats of the request being handled, or None."""
+    return _current.get()
+
+
+class RouteMetrics:
+    __slots__ = ('requests', 'errors', 'latency', 'queries', 'total_queries', 'max_queries',
+                 'db_ms', 'render_ms', 'total_ms', 'response_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.total_queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.total_ms = 0.0
+        self.response_bytes = 0
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'mean_ms': round(self.total_ms / requests, 3),
+            'mean_db_ms': round(self.db_ms / requests, 3),
+            'mean_render_ms': round(self.render_ms / requests, 3),
+            'mean_queries': round(self.total_queries / requests, 3),
+            'max_queries': self.max_queries,
+            'mean_bytes': round(self.response_bytes / requests),
+            'latency_ms': _histogram(self.latency, LATENCY_BUCKETS_MS),
+            'queries': _histogram(self.queries, QUERY_BUCKETS),
+        }
+
+
+def _histogram(counts, bounds):
+    labels = [f'<={bound}' for bound in bounds] + [f'>{bounds[-1]}']
+    return dict(zip(labels, counts))
+
+
+class MetricsRegistry:
+    """Per-route aggregates, shared by every thread of the process."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, route, status_code, total_ms, stats, response_bytes):
+        with self._lock:
+            metrics = self._routes.get(route)
+            if metrics is None:
+                metrics = self._routes[route] = RouteMetrics()
+            metrics.requests += 1
+            if status_code >= 500:
+                metrics.errors += 1
+            metrics.latency[bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+            metrics.total_ms += total_ms
+            metrics.response_bytes += response_bytes
+            if stats is not None:
+                metrics.queries[bisect_left(QUERY_BUCKETS, stats.queries)] += 1
+                metrics.total_queries += stats.queries
+                metrics.max_queries = max(metrics.max_queries, stats.queries)
+                metrics.db_ms += stats.db_seconds * 1000
+                metrics.render_ms += stats.render_seconds * 1000
+
+    def snapshot(self):
+        with self._lock:
+            routes = {route: metrics.as_dict() for route, metrics in sorted(self._routes.items())}
+        return {'since': self.started, 'routes': routes}
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+            self.started = time.time()
+
+
+registry = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} <unmatched>'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_INSTRUMENTATION', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.prefix = getattr(settings, 'API_INSTRUMENTATION_PREFIX', '/api/')
+        self.query_budget = getattr(settings, 'API_QUERY_BUDGET', None)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with count_queries(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.prefix):
+            return await self.get_response(request)
+
+        # The request's thread-sensitive sync code (a sync view, an async
+        # view's database calls) all runs in one thread: count queries there.
+        # sync_to_async also copies the context there, for the renderer
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            counting = await sync_to_async(count_queries)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(counting.close)()
+        finally:
+            _current.reset(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    def finish(self, request, response, started, stats):
+        total_ms = (time.perf_counter() - started) * 1000
+        route = route_name(request)
+        size = 0 if getattr(response, 'streaming', False) else len(response.content)
+
+        timings = []
+        if stats is not None:
+            timings.append(f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"')
+            timings.append(f'render;dur={stats.render_seconds * 1000:.1f}')
+        timings.append(f'total;dur={total_ms:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        registry.record(route, response.status_code, total_ms, stats, size)
+        if stats is not None and self.query_budget is not None and stats.queries > self.query_budget:
+            logger.warning('%s %s ran %d queries (budget %d) in %.1f ms',
+                           route, request.get_full_path(), stats.queries, self.query_budget, total_ms)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-route request metrics of this process; DELETE resets them."""
+    if request.method == 'DELETE':
+        registry.reset()
+    return Response(registry.snapshot())
@@ -0,0 +1,167 @@
+import base64
+import json
+from datetime import date, datetime
+from functools import cmp_to_key, reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination.
+
+    Pages are cut with a WHERE clause on the ``ordering`` columns instead of
+    an OFFSET, so every page costs the same index range scan and rows
+    inserted while a client is paging never shift or repeat results.
+
+    ``ordering`` is a tuple of model fields or annotations; the last one must
+    be unique (normally the primary key). NULLs always sort last.
+    """
+    ordering = ('-id',)
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_union([queryset], request, view)
+
+    def paginate_union(self, querysets, request, view=None):
+        """
+        Pages the rows of any of ``querysets`` (of one model), such as the
+        two sides of ``Q(teacher=user) | Q(learner=user)``. A database answers
+        such an OR with a scan of each side's index and then sorts every
+        matching row; here each side is read in ``ordering`` up to one page,
+        and only those rows are merged. Rows are compared in Python for the
+        merge, so the ordering fields must sort there as they do in SQL
+        (numbers, dates; not collated text).
+        """
+        self.request = request
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-'), self._is_nullable(querysets[0], name.lstrip('-')))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                querysets = [queryset.filter(self.seek_filter(position)) for queryset in querysets]
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        order_by = []
+        for name, descending, nullable in self.fields:
+            expression = F(name).desc if descending else F(name).asc
+            # NULLS LAST only where there can be NULLs: SQLite won't read
+            # "id ASC NULLS LAST" off an index and sorts instead
+            order_by.append(expression(nulls_last=True) if nullable else expression())
+        results = []
+        seen = set()
+        for queryset in querysets:
+            for row in queryset.order_by(*order_by)[:page_size + 1]:
+                if row.pk not in seen:
+                    seen.add(row.pk)
+                    results.append(row)
+        if len(querysets) > 1:
+            results.sort(key=cmp_to_key(self._compare))
+
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [getattr(results[-1], name) for name, _, _ in self.fields]
+        return results
+
+    def _compare(self, first, second):
+        for name, descending, _ in self.fields:
+            a, b = getattr(first, name), getattr(second, name)
+            if a == b:
+                continue
+            # NULLs last in both directions
+            if a is None or b is None:
+                return 1 if a is None else -1
+            return (a < b) - (a > b) if descending else (a > b) - (a < b)
+        return 0
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def seek_filter(self, position):
+        """
+        Builds the "comes after ``position``" condition, i.e.
+        (a > x) OR (a = x AND b > y) OR ... for the ordering columns.
+        """
+        after = []
+        same = Q()
+        for (name, descending, nullable), value in zip(self.fields, position):
+            if value is None:
+                # Nothing sorts after NULL except more NULLs with a later tiebreaker
+                same &= Q(**{f'{name}__isnull': True})
+                continue
+            beyond = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            if nullable:
+                beyond |= Q(**{f'{name}__isnull': True})
+            after.append(same & beyond)
+            same &= Q(**{name: value})
+        if not after:
+            return Q(pk__in=[])
+        return reduce(or_, after)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if isinstance(value, (datetime, date)) else value
+            for value in position
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _is_nullable(self, queryset, name):
+        try:
+            return queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            # Annotations such as match overlap are never NULL
+            return False
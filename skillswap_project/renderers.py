@@ -0,0 +1,23 @@
+# skillswap_project/renderers.py
+"""DRF renderers for the API."""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that charges its time to the current request's stats."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Imported here: instrumentation imports DRF views, which read this
+        # renderer from the settings
+        from .instrumentation import current_stats
+
+        stats = current_stats()
+        if stats is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats.render_seconds += time.perf_counter() - started
@@ -1,6 +1,10 @@
 from pathlib import Path
 import os
 
+from corsheaders.defaults import default_headers
+
+from . import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'skillswap_project.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,13 +68,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'skillswap_project.wsgi.application'
+# The notification event stream needs an ASGI server (daphne, uvicorn)
+ASGI_APPLICATION = 'skillswap_project.asgi.application'
 
 
+# SQLite (tuned for concurrent writers with SQLITE_TUNED=1), or PostgreSQL
+# with DB_ENGINE=postgresql; see skillswap_project/database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database.from_env(os.environ, BASE_DIR),
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -107,6 +114,50 @@ LOGIN_URL = 'login'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Profile pictures are resized off-request by users/imaging.py
+PROFILE_IMAGE_SIZES = (64, 128, 300)
+# Uploads larger than this many pixels a side are shrunk to it
+PROFILE_IMAGE_MAX_ORIGINAL = 1024
+PROFILE_IMAGE_WORKERS = 2
+PROFILE_IMAGE_ASYNC = True
+
+# Live notifications, see scheduling/events.py. Swap the broker for one
+# backed by a shared service when running more than one ASGI worker.
+NOTIFICATION_BROKER = 'scheduling.events.LocalBroker'
+NOTIFICATION_STREAM_KEEPALIVE = 25
+# prune_notifications (scheduling/retention.py) folds notifications older than
+# this into monthly digests: read ones after NOTIFICATION_RETENTION_DAYS,
+# unread ones after NOTIFICATION_UNREAD_RETENTION_DAYS
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_UNREAD_RETENTION_DAYS = 365
+
+# Cache alias holding the built skill catalog (skills/catalog.py). The
+# default local-memory cache is per process; a shared backend lets several
+# processes share each rebuild.
+SKILL_CATALOG_CACHE = 'default'
+# Seconds a built catalog stays in that cache
+SKILL_CATALOG_TIMEOUT = 24 * 60 * 60
+# Seconds a thread trusts the catalog version it last read from the database
+SKILL_CATALOG_VERSION_TTL = 5
+# How often skill autocomplete re-reads teacher/learner counts for ranking,
+# rebuilding its index on a background thread (inline when False)
+AUTOCOMPLETE_POPULARITY_TTL = 300
+AUTOCOMPLETE_ASYNC = True
+
+# Token authentication (users/authentication.py): resolved tokens are cached
+# per process for AUTH_TOKEN_CACHE_TTL seconds. With AUTH_SIGNED_TOKENS,
+# login hands out signed tokens valid for AUTH_SIGNED_TOKEN_MAX_AGE seconds;
+# they still resolve through that cache so logout can revoke them.
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_SIGNED_TOKENS = False
+AUTH_SIGNED_TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+
+# Per-request query/latency accounting for /api/ (skillswap_project/instrumentation.py).
+# Requests running more queries than the budget are logged as warnings.
+API_INSTRUMENTATION = True
+API_QUERY_BUDGET = 40
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
@@ -115,12 +166,17 @@ STATICFILES_DIRS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # JSONRenderer that reports its time to the instrumentation middleware
+    'DEFAULT_RENDERER_CLASSES': [
+        'skillswap_project.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # CORS settings
@@ -129,4 +185,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+
+# Conditional notification polling (ETag / If-None-Match)
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
\ No newline at end of file
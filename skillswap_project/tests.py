@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from skills.models import Skill
+from . import database
+from .instrumentation import registry
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_are_tuned_for_concurrent_writers(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'profile.sqlite3')
+        config = database.from_env({'SQLITE_PATH': path, 'SQLITE_TUNED': '1', 'SQLITE_TIMEOUT': '7'}, directory)
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        scratch = ConnectionHandler({'default': config})['default']
+        try:
+            with scratch.cursor() as cursor:
+                pragmas = {}
+                for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                    cursor.execute(f'PRAGMA {name}')
+                    pragmas[name] = cursor.fetchone()[0]
+            self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 7000})
+            self.assertEqual(scratch.transaction_mode, 'IMMEDIATE')
+        finally:
+            scratch.close()
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
+
+    def test_sqlite_is_untuned_unless_asked(self):
+        # WAL mode would rewrite the checked-in development database
+        bare = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join('/srv/skillswap', 'db.sqlite3')}
+        self.assertEqual(database.from_env({}, '/srv/skillswap'), bare)
+        self.assertEqual(database.from_env({'SQLITE_TUNED': '0'}, '/srv/skillswap'), bare)
+
+    def test_postgresql_uses_a_pool_unless_disabled(self):
+        config = database.from_env({'DB_ENGINE': 'postgresql', 'POSTGRES_DB': 'swap',
+                                    'POSTGRES_POOL_MAX_SIZE': '20'}, '/unused')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['NAME'], 'swap')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+        config = database.from_env({'DB_ENGINE': 'postgresql', 'POSTGRES_POOL': '0'}, '/unused')
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+
+        with self.assertRaises(ImproperlyConfigured):
+            database.from_env({'DB_ENGINE': 'mysql'}, '/unused')
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='learner')
+        self.user.profile.skills_to_learn.add(Skill.objects.create(name='Python'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = Token.objects.create(user=self.user)
+
+    def test_server_timing_reports_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/skills/matches/')
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertNotIn('Server-Timing', self.client.get('/user/1/'))
+
+    def test_queries_are_only_wrapped_during_requests(self):
+        self.client.get('/api/skills/matches/')
+        self.assertEqual(connection.execute_wrappers, [])
+
+    async def test_sync_views_are_counted_under_asgi(self):
+        response = await self.async_client.get('/api/skills/matches/',
+                                               headers={'Authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", render;dur=')
+
+    def test_metrics_are_aggregated_per_route_for_staff(self):
+        for _ in range(3):
+            self.client.get('/api/skills/matches/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        routes = self.client.get('/api/metrics/').data['routes']
+        matches = routes['GET skill-matches']
+        self.assertEqual(matches['requests'], 3)
+        self.assertEqual(sum(matches['latency_ms'].values()), 3)
+        self.assertGreater(matches['max_queries'], 0)
+
+    @override_settings(API_QUERY_BUDGET=1)
+    def test_over_budget_requests_are_logged(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('skillswap_project.instrumentation', 'WARNING') as logs:
+            client.get('/api/skills/matches/')
+        self.assertIn('GET skill-matches', logs.output[0])
@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include  
 from django.conf import settings
 from django.conf.urls.static import static
+from .instrumentation import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
+    path('api/metrics/', metrics, name='api-metrics'),
     path('api/', include('users.api_urls')),
     path('api/', include('skills.api_urls')),
     path('api/', include('scheduling.api_urls')),
@@ -0,0 +1,20 @@
+# skillswap_project/utils.py
+"""Request parsing helpers shared by the apps' API views."""
+from datetime import datetime
+
+from django.utils import timezone
+
+
+def parse_local_datetime(value):
+    """
+    Parses the ``YYYY-MM-DDTHH:MM`` strings sent by the React forms into
+    aware datetimes in the project's timezone.
+    """
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%dT%H:%M'))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid datetime format. Expected YYYY-MM-DDTHH:MM')
+
+
+def is_truthy(value):
+    return value in (True, 1, '1', 'true', 'True', 'on')
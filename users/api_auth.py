@@ -1,10 +1,11 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
+from .authentication import issue_token
 from .serializers import UserSerializer
 
 @api_view(['POST'])
@@ -22,11 +23,10 @@ def signup(request):
                        status=status.HTTP_400_BAD_REQUEST)
     
     user = User.objects.create_user(username=username, password=password)
-    token, created = Token.objects.get_or_create(user=user)
     
     return Response({
         'user': UserSerializer(user).data,
-        'token': token.key
+        'token': issue_token(user)
     }, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
@@ -38,12 +38,18 @@ def login(request):
     user = authenticate(username=username, password=password)
     
     if user:
-        token, created = Token.objects.get_or_create(user=user)
         return Response({
             'user': UserSerializer(user).data,
-            'token': token.key
+            'token': issue_token(user)
         }, status=status.HTTP_200_OK)
     
     return Response({'detail': 'Invalid credentials'}, 
                    status=status.HTTP_401_UNAUTHORIZED)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    # Deleting the token revokes it (and any signed token made from it)
+    # everywhere; the cache entries go with it
+    Token.objects.filter(user=request.user).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .api_views import UserViewSet
-from .api_auth import signup, login
+from .api_auth import signup, login, logout
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -9,6 +9,7 @@ router.register(r'users', UserViewSet, basename='user')
 urlpatterns = [
     path('auth/signup/', signup, name='signup'),
     path('auth/login/', login, name='login'),
+    path('auth/logout/', logout, name='logout'),
     path('', include(router.urls)),
 ]
 
@@ -2,10 +2,21 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Q
+from . import search
 from .models import Profile
 from .serializers import UserSerializer, ProfileSerializer
-from skills.models import Skill
+from skills.tags import set_skills
+from scheduling.models import Feedback
+from scheduling.serializers import FeedbackSerializer
+from skillswap_project.pagination import KeysetPagination
+
+class FeedbackPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+class PeopleSearchPagination(KeysetPagination):
+    ordering = ('search_rank', 'id')
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -19,6 +30,30 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response({'detail': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """People search over username, bio and taught skills, most relevant first."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'next': None, 'results': []})
+
+        profiles = search.rank_profiles(Profile.objects.select_related('user'), query)
+        paginator = PeopleSearchPagination()
+        page = paginator.paginate_queryset(profiles, request, view=self)
+        serializer = ProfileSerializer(page, many=True, context={'request': request, 'image_size': 128})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def feedback(self, request, pk=None):
+        """All feedback the user received as a teacher, newest first."""
+        user = self.get_object()
+        feedbacks = Feedback.objects.filter(session__teacher=user).select_related(
+            'session__learner', 'session__skill'
+        )
+        paginator = FeedbackPagination()
+        page = paginator.paginate_queryset(feedbacks, request, view=self)
+        return paginator.get_paginated_response(FeedbackSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def update_profile(self, request, pk=None):
         user = request.user
@@ -27,34 +62,23 @@ class UserViewSet(viewsets.ModelViewSet):
         
         profile = user.profile
         
-        # Update bio
-        if 'bio' in request.data:
-            profile.bio = request.data['bio']
-        
-        # Handle image upload
-        if 'image' in request.FILES:
-            profile.image = request.FILES['image']
-        elif 'image' in request.data and request.data['image']:
-            profile.image = request.data['image']
-        
-        # Handle skills to teach
-        if 'skills_to_teach' in request.data:
-            teach_skills_str = request.data['skills_to_teach']
-            profile.skills_to_teach.clear()
-            teach_skill_names = [name.strip().title() for name in teach_skills_str.split(',') if name.strip()]
-            for name in teach_skill_names:
-                skill, created = Skill.objects.get_or_create(name=name)
-                profile.skills_to_teach.add(skill)
-        
-        # Handle skills to learn
-        if 'skills_to_learn' in request.data:
-            learn_skills_str = request.data['skills_to_learn']
-            profile.skills_to_learn.clear()
-            learn_skill_names = [name.strip().title() for name in learn_skills_str.split(',') if name.strip()]
-            for name in learn_skill_names:
-                skill, created = Skill.objects.get_or_create(name=name)
-                profile.skills_to_learn.add(skill)
-        
-        profile.save()
+        with transaction.atomic():
+            # Update bio
+            if 'bio' in request.data:
+                profile.bio = request.data['bio']
+            
+            # Handle image upload
+            if 'image' in request.FILES:
+                profile.image = request.FILES['image']
+            elif 'image' in request.data and request.data['image']:
+                profile.image = request.data['image']
+            
+            # Handle skills to teach / learn (comma-separated names)
+            if 'skills_to_teach' in request.data:
+                set_skills(profile.skills_to_teach, request.data['skills_to_teach'])
+            if 'skills_to_learn' in request.data:
+                set_skills(profile.skills_to_learn, request.data['skills_to_learn'])
+            
+            profile.save()
         serializer = ProfileSerializer(profile, context={'request': request})
         return Response(serializer.data)
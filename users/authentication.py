@@ -0,0 +1,191 @@
+# users/authentication.py
+"""
+Token authentication without a database round trip per request.
+
+``CachedTokenAuthentication`` accepts the same ``Authorization: Token <key>``
+header as DRF's TokenAuthentication and resolves keys through a bounded
+in-process LRU cache with a TTL, so a warm request costs a dict lookup
+instead of a Token/User join. Entries hold plain field values and a fresh
+User instance is built per request, so nothing cached on one request's user
+(a related profile, say) leaks into another.
+
+It also accepts signed tokens (issued at login when ``AUTH_SIGNED_TOKENS``
+is on): ``user id + fingerprint`` signed with SECRET_KEY and timestamped, so
+tampered or expired ones are rejected without any lookup. A valid signature
+is not enough on its own, though: like an opaque key, a signed token goes
+through the cache, and a miss reads the user's Token row once. That lookup
+is the price of revocation. The fingerprint is derived from the user's DRF
+token key and password hash, so deleting the token (logout) or changing the
+password revokes every signed token issued from it within the cache TTL,
+instead of leaving them valid for ``AUTH_SIGNED_TOKEN_MAX_AGE``.
+
+A user's entries are dropped when the user is saved (password change,
+deactivation) or their token is deleted; see the receivers in
+users/models.py. The cache is per process, so other processes notice within
+``AUTH_TOKEN_CACHE_TTL`` seconds.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SIGNING_SALT = 'users.authentication.signed-token'
+
+_USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+class TokenCache:
+    """Thread-safe LRU of token -> cached user, with per-entry expiry."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, _, value = entry
+            if expires < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, user_id, value):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, user_id, value)
+            self._by_user[user_id].add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[1])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[1]]
+
+
+cache = TokenCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+)
+
+
+def _fingerprint(token_key, password_hash):
+    return salted_hmac(SIGNING_SALT, f'{token_key}:{password_hash}').hexdigest()[:32]
+
+
+def sign_token(token):
+    """A signed token for ``token`` (a DRF Token with its user loaded)."""
+    return signing.dumps([token.user_id, _fingerprint(token.key, token.user.password)], salt=SIGNING_SALT)
+
+
+def issue_token(user):
+    """
+    The token to hand out at login/signup: the DRF token key, or a signed
+    token when AUTH_SIGNED_TOKENS is on.
+    """
+    token = Token.objects.get_or_create(user=user)[0]
+    token.user = user
+    return sign_token(token) if getattr(settings, 'AUTH_SIGNED_TOKENS', False) else token.key
+
+
+def _snapshot(user):
+    return tuple(getattr(user, name) for name in _USER_FIELDS)
+
+
+def _load(token):
+    """(token key, user snapshot, fingerprint) for a DRF Token row."""
+    return token.key, _snapshot(token.user), _fingerprint(token.key, token.user.password)
+
+
+def resolve(key):
+    """
+    Returns (user, Token) for an opaque or signed token, or raises
+    AuthenticationFailed. Hits the database only on a cache miss (for a
+    signed token, only once its signature checks out).
+    """
+    if ':' in key:
+        return _resolve_signed(key)
+
+    entry = cache.get(('key', key))
+    if entry is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        entry = _load(token)
+        cache.set(('key', key), token.user_id, entry)
+    return _build(entry)
+
+
+def _resolve_signed(value):
+    try:
+        user_id, fingerprint = signing.loads(
+            value, salt=SIGNING_SALT, max_age=getattr(settings, 'AUTH_SIGNED_TOKEN_MAX_AGE', None)
+        )
+    except (signing.BadSignature, TypeError, ValueError):
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+    # Deliberately not stateless: the Token row decides whether the token
+    # was revoked, so a miss (or an entry older than the token, say from a
+    # re-login handled by another process) checks the database once
+    entry = cache.get(('user', user_id))
+    if entry is None or not constant_time_compare(entry[2], fingerprint):
+        try:
+            token = Token.objects.select_related('user').get(user_id=user_id)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        entry = _load(token)
+        cache.set(('user', user_id), user_id, entry)
+        if not constant_time_compare(entry[2], fingerprint):
+            # Logged out or password changed since the token was signed
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    return _build(entry)
+
+
+def _build(entry):
+    key, values = entry[0], entry[1]
+    user = User.from_db('default', _USER_FIELDS, values)
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    token = Token(key=key, user_id=user.pk)
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication backed by the process-wide token cache."""
+
+    def authenticate_credentials(self, key):
+        return resolve(key)
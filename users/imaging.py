@@ -0,0 +1,150 @@
+# users/imaging.py
+"""
+Off-request processing of profile pictures.
+
+Saving a profile only schedules work here; a small thread pool then
+shrinks the upload to at most ``PROFILE_IMAGE_MAX_ORIGINAL`` pixels a side,
+generates the avatar size variants and points the profile at them. Variants
+are stored under the image's content hash, so an image that has already
+been processed (a re-saved upload) is only hashed, never re-encoded. The
+shared default picture is served as is and never scheduled.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'profile_pics/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_sizes():
+    return tuple(getattr(settings, 'PROFILE_IMAGE_SIZES', (64, 128, 300)))
+
+
+def variant_format():
+    # WebP is much smaller for avatars; fall back to JPEG if Pillow lacks it
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def variant_name(image_hash, size):
+    return f'{VARIANT_DIR}/{image_hash}/{size}.{variant_format()[1]}'
+
+
+def is_default(image_name):
+    from .models import Profile
+
+    return image_name == Profile._meta.get_field('image').get_default()
+
+
+def enqueue(profile):
+    """Schedules ``profile``'s image for processing once the transaction commits."""
+    if not profile.image or is_default(profile.image.name):
+        return
+    profile_id, image_name = profile.pk, profile.image.name
+    transaction.on_commit(lambda: _submit(profile_id, image_name))
+
+
+def _submit(profile_id, image_name):
+    if not getattr(settings, 'PROFILE_IMAGE_ASYNC', True):
+        process_profile_image(profile_id, image_name)
+        return
+    _get_executor().submit(_run_in_worker, profile_id, image_name)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PROFILE_IMAGE_WORKERS', 2),
+                thread_name_prefix='profile-images',
+            )
+        return _executor
+
+
+def _run_in_worker(profile_id, image_name):
+    try:
+        process_profile_image(profile_id, image_name)
+    except Exception:
+        logger.exception('Failed to process image %s for profile %s', image_name, profile_id)
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        connection.close()
+
+
+def process_profile_image(profile_id, image_name):
+    """
+    Generates the size variants for ``image_name`` and records its hash on
+    the profile. Returns the hash, or None if the file is missing.
+    """
+    from .models import Profile
+
+    try:
+        path = default_storage.path(image_name)
+    except NotImplementedError:
+        return None
+    if not os.path.exists(path):
+        logger.warning('Image file %s for profile %s not found', image_name, profile_id)
+        return None
+
+    _cap_original(path)
+    image_hash = _hash_file(path)
+    if not all(default_storage.exists(variant_name(image_hash, size)) for size in variant_sizes()):
+        _write_variants(path, image_hash)
+
+    # Swap atomically: the variants are all on disk before the profile points
+    # at them, and a newer upload that raced us is left alone.
+    Profile.objects.filter(pk=profile_id, image=image_name).update(image_hash=image_hash)
+    return image_hash
+
+
+def _cap_original(path):
+    """Shrinks the upload in place if it is larger than PROFILE_IMAGE_MAX_ORIGINAL."""
+    limit = getattr(settings, 'PROFILE_IMAGE_MAX_ORIGINAL', 1024)
+    with Image.open(path) as original:
+        if max(original.size) <= limit:
+            return
+        image_format = original.format
+        capped = ImageOps.exif_transpose(original)
+        capped.thumbnail((limit, limit))
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        capped.save(temp, format=image_format)
+    os.replace(temp, path)
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_variants(path, image_hash):
+    image_format, _ = variant_format()
+    with Image.open(path) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA') or image_format == 'JPEG':
+            original = original.convert('RGB')
+        for size in variant_sizes():
+            target = default_storage.path(variant_name(image_hash, size))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            variant = original.copy()
+            variant.thumbnail((size, size))
+            # Write to a private temp file and rename over the target so
+            # readers never see a half-written variant
+            temp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+            variant.save(temp, format=image_format, quality=85)
+            os.replace(temp, target)
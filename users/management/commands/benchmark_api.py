@@ -0,0 +1,101 @@
+import json
+import platform
+import time
+from contextlib import nullcontext
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from skillswap_project import benchmarking
+
+
+class Command(BaseCommand):
+    help = ('Seeds synthetic data into a temporary database and benchmarks the main API endpoints '
+            '(latency percentiles, throughput, queries and peak memory per request).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--skills', type=int, default=100)
+        parser.add_argument('--sessions-per-user', type=int, default=4)
+        parser.add_argument('--notifications-per-user', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint first')
+        parser.add_argument('--memory-requests', type=int, default=20,
+                            help='Requests per endpoint re-run under tracemalloc for peak memory')
+        parser.add_argument('--endpoint', action='append', choices=sorted(benchmarking.ENDPOINTS),
+                            help='Only benchmark this endpoint (repeatable)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Use a cheap password hasher so login measures the app, not PBKDF2')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail on regressions against this JSON result file')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed p95 slowdown against the baseline, as a fraction (default 0.2)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {error}")
+
+        hashers = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+        with hashers if options['fast_hasher'] else nullcontext(), benchmarking.temporary_database():
+            started = time.perf_counter()
+            accounts = benchmarking.seed(
+                users=options['users'], skills=options['skills'],
+                sessions_per_user=options['sessions_per_user'],
+                notifications_per_user=options['notifications_per_user'], seed=options['seed'],
+            )
+            self.stdout.write(f'Seeded {len(accounts)} users in {time.perf_counter() - started:.1f}s')
+            endpoints = benchmarking.run(
+                accounts, options['endpoint'], requests=options['requests'],
+                warmup=options['warmup'], memory_requests=options['memory_requests'],
+            )
+
+        results = {
+            'meta': {
+                'revision': benchmarking.git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'fast_hasher': options['fast_hasher'],
+                'scale': {key: options[key] for key in
+                          ('users', 'skills', 'sessions_per_user', 'notifications_per_user', 'requests', 'seed')},
+            },
+            'endpoints': endpoints,
+        }
+        self.report(endpoints, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            if baseline.get('meta', {}).get('scale') != results['meta']['scale']:
+                self.stdout.write(self.style.WARNING('Baseline was run at a different scale; comparison is approximate.'))
+            problems = benchmarking.compare(results, baseline, options['threshold'])
+            if problems:
+                for problem in problems:
+                    self.stdout.write(self.style.ERROR(problem))
+                raise CommandError(f'{len(problems)} regression(s) against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def report(self, endpoints, baseline):
+        before = (baseline or {}).get('endpoints', {})
+        self.stdout.write(
+            f"{'endpoint':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'peak KiB':>9} {'errors':>6}  {'p95 vs base':>11}"
+        )
+        for name, stats in endpoints.items():
+            delta = ''
+            if name in before and before[name]['p95_ms']:
+                delta = f"{(stats['p95_ms'] / before[name]['p95_ms'] - 1) * 100:+.0f}%"
+            self.stdout.write(
+                f"{name:<14} {stats['throughput_rps']:>8} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {stats['max_queries']:>8} {stats['peak_memory_kib']:>9} "
+                f"{stats['errors']:>6}  {delta:>11}"
+            )
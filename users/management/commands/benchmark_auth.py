@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from skillswap_project import benchmarking
+from skillswap_project.instrumentation import RequestStats
+from users import authentication
+
+
+class Command(BaseCommand):
+    help = 'Compares per-request token authentication cost: DRF TokenAuthentication vs the cached and signed paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        with benchmarking.temporary_database():
+            users = User.objects.bulk_create([User(username=f'auth{index}') for index in range(options['users'])])
+            tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+            for token, user in zip(tokens, users):
+                token.user = user
+
+            factory = RequestFactory()
+            opaque = [factory.get('/api/', HTTP_AUTHORIZATION=f'Token {token.key}') for token in tokens]
+            signed = [factory.get('/api/', HTTP_AUTHORIZATION=f'Token {authentication.sign_token(token)}')
+                      for token in tokens]
+
+            authentication.cache.clear()
+            cases = [
+                ('drf token', TokenAuthentication(), opaque),
+                ('cached token', authentication.CachedTokenAuthentication(), opaque),
+                ('signed token', authentication.CachedTokenAuthentication(), signed),
+            ]
+            self.stdout.write(f"{'backend':<14} {'us/request':>11} {'queries/request':>16}")
+            for name, backend, requests in cases:
+                # One pass to warm the cache, as a steady-state server would be
+                for request in requests:
+                    backend.authenticate(request)
+
+                stats = RequestStats()
+                with connection.execute_wrapper(stats):
+                    started = time.perf_counter()
+                    for index in range(options['iterations']):
+                        backend.authenticate(requests[index % len(requests)])
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{name:<14} {elapsed / options['iterations'] * 1e6:>11.1f} "
+                    f"{stats.queries / options['iterations']:>16.2f}"
+                )
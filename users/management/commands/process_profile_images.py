@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from users.imaging import is_default, process_profile_image
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Generates avatar size variants for every profile image that has not been processed yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-check profiles that already have a processed image')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(image='')
+        if not options['all']:
+            profiles = profiles.filter(image_hash='')
+
+        processed = 0
+        for profile_id, image_name in profiles.values_list('pk', 'image').iterator():
+            if not is_default(image_name) and process_profile_image(profile_id, image_name):
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} profile image(s).'))
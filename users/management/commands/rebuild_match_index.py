@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.models import SwapMatch, TeacherMatch
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the teacher/learner match index (and the swap index derived from it) from profile skills.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        TeacherMatch.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Match index rebuilt with {TeacherMatch.objects.count()} rows '
+            f'and {SwapMatch.objects.count()} swap rows.'
+        ))
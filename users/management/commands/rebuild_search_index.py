@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or with --verify, checks) the full-text people search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare the index with the profiles and report mismatches')
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write('Full-text search is not available on this database; nothing to do.')
+            return
+
+        if options['verify']:
+            expected = {row[0]: row for row in search.documents()}
+            stored = {row[0]: row for row in search.indexed_documents()}
+            mismatched = sorted(
+                profile_id for profile_id in set(expected) | set(stored)
+                if expected.get(profile_id) != stored.get(profile_id)
+            )
+            for profile_id in mismatched:
+                self.stdout.write(
+                    f'profile {profile_id}: stored {stored.get(profile_id)}, expected {expected.get(profile_id)}'
+                )
+            if mismatched:
+                raise CommandError(f'{len(mismatched)} search document(s) are stale.')
+            self.stdout.write(self.style.SUCCESS(f'Search index verified for {len(expected)} profile(s).'))
+            return
+
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {count} profile(s).'))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def build_match_index(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    TeacherMatch = apps.get_model('users', 'TeacherMatch')
+    pairs = Profile.skills_to_teach.through.objects.annotate(
+        learner_user_id=F('skill__learners__user_id')
+    ).filter(
+        learner_user_id__isnull=False
+    ).exclude(
+        learner_user_id=F('profile__user_id')
+    ).values_list('learner_user_id', 'profile__user_id').annotate(overlap=Count('id'))
+
+    TeacherMatch.objects.bulk_create(
+        [TeacherMatch(learner_id=learner_id, teacher_id=teacher_id, overlap=overlap)
+         for learner_id, teacher_id, overlap in pairs],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_delete_endorsement'),
+        ('skills', '0002_category_skill_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overlap', models.PositiveIntegerField(default=0)),
+                ('learner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teacher_matches', to=settings.AUTH_USER_MODEL)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='learner_matches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['learner', '-overlap'], name='teacher_match_rank')],
+                'constraints': [models.UniqueConstraint(fields=('learner', 'teacher'), name='unique_teacher_match')],
+            },
+        ),
+        migrations.RunPython(build_match_index, migrations.RunPython.noop),
+    ]
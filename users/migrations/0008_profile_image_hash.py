@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_teachermatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
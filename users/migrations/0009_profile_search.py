@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        # Other backends use the substring fallback in users/search.py
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            'CREATE VIRTUAL TABLE users_profile_fts USING fts5('
+            "username, bio, skills, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+        Profile = apps.get_model('users', 'Profile')
+        skills = defaultdict(list)
+        for profile_id, name in Profile.skills_to_teach.through.objects.order_by(
+            'skill__name'
+        ).values_list('profile_id', 'skill__name'):
+            skills[profile_id].append(name)
+        cursor.executemany(
+            'INSERT INTO users_profile_fts (rowid, username, bio, skills) VALUES (%s, %s, %s, %s)',
+            [(profile_id, username, bio, ' '.join(skills[profile_id]))
+             for profile_id, username, bio in Profile.objects.values_list('pk', 'user__username', 'bio')]
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS users_profile_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_profile_image_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def build_swap_index(apps, schema_editor):
+    TeacherMatch = apps.get_model('users', 'TeacherMatch')
+    SwapMatch = apps.get_model('users', 'SwapMatch')
+    pairs = TeacherMatch.objects.filter(
+        teacher__teacher_matches__teacher=F('learner')
+    ).values_list('learner_id', 'teacher_id', 'teacher__teacher_matches__overlap', 'overlap')
+
+    SwapMatch.objects.bulk_create(
+        [SwapMatch(user_id=user_id, partner_id=partner_id, gives=gives, gets=gets, score=min(gives, gets))
+         for user_id, partner_id, gives, gets in pairs],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_profile_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gives', models.PositiveIntegerField()),
+                ('gets', models.PositiveIntegerField()),
+                ('score', models.PositiveIntegerField()),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_matches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score'], name='swap_match_rank')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'partner'), name='unique_swap_match')],
+            },
+        ),
+        migrations.RunPython(build_swap_index, migrations.RunPython.noop),
+    ]
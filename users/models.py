@@ -1,9 +1,11 @@
 # users/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Least
 from django.contrib.auth.models import User
-from PIL import Image 
-import os
-from django.db.models.signals import post_save
+from django.core.files.storage import default_storage
+from . import authentication, imaging, search
+from django.db.models.signals import post_save, m2m_changed, pre_delete, post_delete
 from django.dispatch import receiver
 
 class Profile(models.Model):
@@ -12,28 +14,80 @@ class Profile(models.Model):
     bio = models.TextField(max_length=500, blank=True)
     skills_to_teach = models.ManyToManyField('skills.Skill', related_name='teachers', blank=True)
     skills_to_learn = models.ManyToManyField('skills.Skill', related_name='learners', blank=True)
+    # Content hash of the processed image; set by the image worker once the
+    # size variants exist
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.user.username} Profile'
 
-    # Keep the image resizing for uploads
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self):
+        # Remember the persisted values so save() can tell what changed
+        self._loaded_values = {
+            field.attname: self._comparable(field)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+        }
+
+    def _comparable(self, field):
+        value = getattr(self, field.attname)
+        # FieldFile -> stored file name
+        return getattr(value, 'name', value) if field.name == 'image' else value
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields changed since the profile was loaded or saved,
+        or None when there is no snapshot to compare with.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and self._comparable(field) != loaded[field.attname]
+        ]
+
     def save(self, *args, **kwargs):
+        dirty = None if self._state.adding else self.get_dirty_fields()
+        if kwargs.get('update_fields') is not None:
+            dirty = [name for name in kwargs['update_fields'] if dirty is None or name in dirty]
+        elif dirty is not None:
+            if not dirty:
+                # Nothing changed: skip the UPDATE (and the image work) entirely
+                return
+            kwargs['update_fields'] = dirty
+
+        image_changed = dirty is None or 'image' in dirty
+        if image_changed:
+            # A new upload invalidates the variants of the previous image
+            # until the worker has processed it
+            self.image_hash = ''
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = list(kwargs['update_fields']) + ['image_hash']
+
         super().save(*args, **kwargs)
+        self._snapshot()
 
-        # Only resize if a custom image was uploaded and exists
-        if self.image and self.image.name != 'profile_pics/default_placeholder.png':
-            try:
-                img_path = self.image.path
-                if os.path.exists(img_path): # Check if file exists before opening
-                    img = Image.open(img_path)
-                    if img.height > 300 or img.width > 300:
-                        output_size = (300, 300)
-                        img.thumbnail(output_size)
-                        img.save(img_path)
-            except FileNotFoundError:
-                 print(f"Warning: Image file not found for user {self.user.username} at {self.image.path} during save.")
-            except Exception as e:
-                print(f"Error processing image for user {self.user.username}: {e}")
+        if image_changed:
+            # Resizing happens off-request; see users/imaging.py
+            imaging.enqueue(self)
+
+    def image_variant_url(self, size):
+        """
+        URL of the processed ``size`` px variant, or of the original upload
+        while it is still being processed.
+        """
+        if not self.image:
+            return None
+        if self.image_hash and size in imaging.variant_sizes():
+            return default_storage.url(imaging.variant_name(self.image_hash, size))
+        return self.image.url
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -41,5 +95,287 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender='authtoken.Token')
+def invalidate_cached_tokens(sender, instance, **kwargs):
+    # Password changes, deactivation and logout must not outlive the token cache
+    authentication.cache.invalidate_user(instance.user_id if sender is not User else instance.pk)
+
+@receiver(post_save, sender=User)
+def reindex_renamed_user(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save only last_login; only a possible username change matters
+    if not created and (update_fields is None or 'username' in update_fields):
+        search.schedule(Profile.objects.filter(user=instance).values_list('pk', flat=True))
+
+@receiver(post_save, sender=Profile)
+def reindex_profile(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'bio' in update_fields:
+        search.schedule([instance.pk])
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile(sender, instance, **kwargs):
+    search.schedule([instance.pk])
+
+
+class TeacherMatch(models.Model):
+    """
+    Precomputed match index: one row per (learner, teacher) pair where the
+    teacher teaches at least one skill the learner wants to learn.
+    ``overlap`` is how many of the learner's wanted skills the teacher teaches.
+
+    Rows are kept up to date from the m2m_changed signals below; use the
+    ``rebuild_match_index`` command to recompute everything from scratch.
+    """
+    learner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='teacher_matches')
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='learner_matches')
+    overlap = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['learner', 'teacher'], name='unique_teacher_match'),
+        ]
+        indexes = [
+            models.Index(fields=['learner', '-overlap'], name='teacher_match_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.teacher.username} teaches {self.overlap} skill(s) {self.learner.username} wants'
+
+    @classmethod
+    def refresh_for_teacher(cls, profile):
+        """Recompute every row where ``profile`` is the teacher."""
+        TeachLink = Profile.skills_to_teach.through
+        LearnLink = Profile.skills_to_learn.through
+        taught = TeachLink.objects.filter(profile_id=profile.pk).values('skill_id')
+        overlaps = LearnLink.objects.filter(
+            skill_id__in=taught
+        ).exclude(
+            profile_id=profile.pk
+        ).values_list('profile__user_id').annotate(overlap=Count('skill_id'))
+
+        if cls._replace_rows(
+            cls.objects.filter(teacher_id=profile.user_id),
+            {(learner_id, profile.user_id): overlap for learner_id, overlap in overlaps}
+        ):
+            SwapMatch.refresh_for_user(profile.user_id)
+
+    @classmethod
+    def refresh_for_learner(cls, profile):
+        """Recompute every row where ``profile`` is the learner."""
+        TeachLink = Profile.skills_to_teach.through
+        LearnLink = Profile.skills_to_learn.through
+        wanted = LearnLink.objects.filter(profile_id=profile.pk).values('skill_id')
+        overlaps = TeachLink.objects.filter(
+            skill_id__in=wanted
+        ).exclude(
+            profile_id=profile.pk
+        ).values_list('profile__user_id').annotate(overlap=Count('skill_id'))
+
+        if cls._replace_rows(
+            cls.objects.filter(learner_id=profile.user_id),
+            {(profile.user_id, teacher_id): overlap for teacher_id, overlap in overlaps}
+        ):
+            SwapMatch.refresh_for_user(profile.user_id)
+
+    @classmethod
+    def _replace_rows(cls, current, wanted):
+        """
+        Diffs the rows in ``current`` against ``wanted`` ({(learner_id,
+        teacher_id): overlap}) and only touches the pairs that changed.
+        Returns whether anything changed.
+        """
+        existing = {
+            (learner_id, teacher_id): (pk, overlap)
+            for pk, learner_id, teacher_id, overlap
+            in current.values_list('pk', 'learner_id', 'teacher_id', 'overlap')
+        }
+        stale = [
+            pk for pair, (pk, overlap) in existing.items()
+            if wanted.get(pair) != overlap
+        ]
+        new_rows = [
+            cls(learner_id=learner_id, teacher_id=teacher_id, overlap=overlap)
+            for (learner_id, teacher_id), overlap in wanted.items()
+            if existing.get((learner_id, teacher_id), (None, None))[1] != overlap
+        ]
+        with transaction.atomic():
+            if stale:
+                cls.objects.filter(pk__in=stale).delete()
+            if new_rows:
+                cls.objects.bulk_create(new_rows)
+        return bool(stale or new_rows)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recompute the whole index from the Profile/Skill M2M tables."""
+        TeachLink = Profile.skills_to_teach.through
+        pairs = TeachLink.objects.annotate(
+            learner_user_id=F('skill__learners__user_id')
+        ).filter(
+            learner_user_id__isnull=False
+        ).exclude(
+            learner_user_id=F('profile__user_id')
+        ).values_list('learner_user_id', 'profile__user_id').annotate(overlap=Count('id'))
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            batch = []
+            for learner_id, teacher_id, overlap in pairs.iterator():
+                batch.append(cls(learner_id=learner_id, teacher_id=teacher_id, overlap=overlap))
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+            SwapMatch.rebuild(batch_size=batch_size)
+
+
+class SwapMatch(models.Model):
+    """
+    Reciprocal matches: one row per ordered (user, partner) pair where each
+    teaches at least one skill the other wants to learn, stored in both
+    directions so a user's swaps are one index range. ``gives`` counts the
+    partner's wanted skills ``user`` teaches, ``gets`` the reverse, and
+    ``score`` is the smaller of the two (a swap is only as good as its
+    weaker side).
+
+    Derived from TeacherMatch: whenever a user's TeacherMatch rows change,
+    only the swaps involving that user are recomputed.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='swap_matches')
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    gives = models.PositiveIntegerField()
+    gets = models.PositiveIntegerField()
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'partner'], name='unique_swap_match'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'], name='swap_match_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} <-> {self.partner.username} ({self.gives}/{self.gets})'
+
+    @classmethod
+    def refresh_for_user(cls, user_id):
+        """Recomputes every swap involving ``user_id`` from TeacherMatch."""
+        gets = dict(TeacherMatch.objects.filter(learner_id=user_id).values_list('teacher_id', 'overlap'))
+        gives = dict(TeacherMatch.objects.filter(teacher_id=user_id).values_list('learner_id', 'overlap'))
+        wanted = {}
+        for partner_id in gets.keys() & gives.keys():
+            wanted[(user_id, partner_id)] = (gives[partner_id], gets[partner_id])
+            wanted[(partner_id, user_id)] = (gets[partner_id], gives[partner_id])
+
+        existing = {
+            (row_user_id, partner_id): (pk, (row_gives, row_gets))
+            for pk, row_user_id, partner_id, row_gives, row_gets in cls.objects.filter(
+                models.Q(user_id=user_id) | models.Q(partner_id=user_id)
+            ).values_list('pk', 'user_id', 'partner_id', 'gives', 'gets')
+        }
+        stale = [pk for pair, (pk, counts) in existing.items() if wanted.get(pair) != counts]
+        new_rows = [
+            cls(user_id=row_user_id, partner_id=partner_id, gives=row_gives, gets=row_gets,
+                score=min(row_gives, row_gets))
+            for (row_user_id, partner_id), (row_gives, row_gets) in wanted.items()
+            if existing.get((row_user_id, partner_id), (None, None))[1] != (row_gives, row_gets)
+        ]
+        with transaction.atomic():
+            if stale:
+                cls.objects.filter(pk__in=stale).delete()
+            if new_rows:
+                cls.objects.bulk_create(new_rows)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recomputes every swap with one self-join of TeacherMatch."""
+        pairs = TeacherMatch.objects.filter(
+            teacher__teacher_matches__teacher=F('learner')
+        ).values_list('learner_id', 'teacher_id', 'teacher__teacher_matches__overlap', 'overlap')
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            batch = []
+            for user_id, partner_id, gives, gets in pairs.iterator():
+                batch.append(cls(user_id=user_id, partner_id=partner_id, gives=gives, gets=gets,
+                                 score=min(gives, gets)))
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch)
+                    batch = []
+            cls.objects.bulk_create(batch)
+
+    @classmethod
+    def cycles_for(cls, user, limit=20):
+        """
+        Three-way swaps user -> B -> C -> user, where each teaches the next
+        something they want to learn. Returns TeacherMatch rows for the
+        B -> C edge (teacher B, learner C) annotated with ``score``, the
+        weakest overlap along the cycle; best first.
+        """
+        you_teach = TeacherMatch.objects.filter(teacher=user, learner=models.OuterRef('teacher_id'))
+        teaches_you = TeacherMatch.objects.filter(learner=user, teacher=models.OuterRef('learner_id'))
+        return TeacherMatch.objects.filter(
+            teacher_id__in=TeacherMatch.objects.filter(teacher=user).values('learner_id'),
+            learner_id__in=TeacherMatch.objects.filter(learner=user).values('teacher_id'),
+        ).annotate(
+            score=Least(
+                models.Subquery(you_teach.values('overlap')[:1]),
+                F('overlap'),
+                models.Subquery(teaches_you.values('overlap')[:1]),
+            )
+        ).select_related('teacher', 'learner').order_by('-score', 'id')[:limit]
+
+
+def _changed_profiles(instance, action, reverse, pk_set, related_name):
+    """
+    Returns the profiles whose skills changed for an m2m_changed event, or
+    None while the change is still pending. For reverse clears (e.g.
+    ``skill.teachers.clear()``) the affected profiles are captured on
+    pre_clear since pk_set is not provided.
+    """
+    if not reverse:
+        return [instance] if action in ('post_add', 'post_remove', 'post_clear') else None
+
+    if action == 'pre_clear':
+        instance._cleared_profile_ids = list(
+            getattr(instance, related_name).values_list('pk', flat=True)
+        )
+        return None
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_profile_ids', [])
+    elif action not in ('post_add', 'post_remove'):
+        return None
+    return list(Profile.objects.filter(pk__in=pk_set))
+
+@receiver(m2m_changed, sender=Profile.skills_to_teach.through)
+def update_matches_for_teacher(sender, instance, action, reverse, pk_set, **kwargs):
+    profiles = _changed_profiles(instance, action, reverse, pk_set, 'teachers') or []
+    for profile in profiles:
+        TeacherMatch.refresh_for_teacher(profile)
+    search.schedule([profile.pk for profile in profiles])
+
+@receiver(m2m_changed, sender=Profile.skills_to_learn.through)
+def update_matches_for_learner(sender, instance, action, reverse, pk_set, **kwargs):
+    for profile in _changed_profiles(instance, action, reverse, pk_set, 'learners') or []:
+        TeacherMatch.refresh_for_learner(profile)
+
+@receiver(pre_delete, sender='skills.Skill')
+def remember_skill_profiles(sender, instance, **kwargs):
+    # Deleting a skill drops its M2M rows without m2m_changed, so note who is affected
+    instance._teacher_ids = list(instance.teachers.values_list('pk', flat=True))
+    instance._learner_ids = list(instance.learners.values_list('pk', flat=True))
+
+@receiver(post_delete, sender='skills.Skill')
+def update_matches_for_deleted_skill(sender, instance, **kwargs):
+    for profile in Profile.objects.filter(pk__in=getattr(instance, '_teacher_ids', [])):
+        TeacherMatch.refresh_for_teacher(profile)
+    search.schedule(getattr(instance, '_teacher_ids', []))
+    for profile in Profile.objects.filter(pk__in=getattr(instance, '_learner_ids', [])):
+        TeacherMatch.refresh_for_learner(profile)
+
+@receiver(post_save, sender='skills.Skill')
+def reindex_skill_teachers(sender, instance, created, **kwargs):
+    # A renamed skill changes the documents of everyone teaching it
+    if not created:
+        search.schedule(instance.teachers.values_list('pk', flat=True))
@@ -0,0 +1,193 @@
+# users/search.py
+"""
+Full-text search over people: username, bio and the names of the skills
+they teach.
+
+On SQLite the documents live in an FTS5 virtual table (created by migration
+0009) keyed by profile id, and results are ranked with BM25, weighting a hit
+in the username above one in taught skills above one in the bio. Every
+query term is matched as a prefix, so "pyth" finds "Python".
+
+Signals in users/models.py mark profiles whose username, bio or taught skills
+changed; the marked documents are rewritten once, after the transaction
+commits, however many changes it made. ``rebuild_search_index`` recomputes
+the table from scratch.
+
+Other database backends have no FTS5 table and fall back to case-insensitive
+substring filters with no relevance ranking.
+"""
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TABLE = 'users_profile_fts'
+# BM25 column weights, in table column order: username, bio, skills
+WEIGHTS = (10.0, 1.0, 5.0)
+# Longest query we turn into an FTS expression
+MAX_TERMS = 8
+CHUNK_SIZE = 500
+
+_available = {}
+_pending = threading.local()
+
+
+def is_enabled():
+    """True when the FTS5 table exists on the default database."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE])
+            _available[name] = cursor.fetchone() is not None
+    return _available[name]
+
+
+def match_expression(query):
+    """
+    Turns free text into an FTS5 MATCH expression: every word must match,
+    as a prefix. Words are quoted so FTS operators in user input are inert.
+    Returns '' when the query has no searchable words.
+    """
+    terms = re.findall(r'\w+', query.casefold())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+# --- querying ---
+
+def filter_profiles(queryset, query):
+    """Narrows a Profile queryset to profiles matching ``query``."""
+    if not is_enabled():
+        return queryset.filter(_fallback_filter(query))
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def rank_profiles(queryset, query):
+    """
+    Like ``filter_profiles``, and annotates ``search_rank`` (lower is more
+    relevant; always 0 on the fallback path).
+    """
+    queryset = filter_profiles(queryset, query)
+    if not is_enabled():
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    # FTS5 looks the row up by rowid, so this costs one index probe per match
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    return queryset.annotate(search_rank=RawSQL(
+        f'SELECT bm25({TABLE}, {weights}) FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid = "users_profile"."id"',
+        [match_expression(query)],
+        output_field=FloatField(),
+    ))
+
+
+def _fallback_filter(query):
+    from .models import Profile
+
+    terms = query.split()[:MAX_TERMS]
+    if not terms:
+        return Q(pk__in=[])
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(user__username__icontains=term) |
+            Q(bio__icontains=term) |
+            Q(id__in=Profile.skills_to_teach.through.objects.filter(
+                skill__name__icontains=term
+            ).values('profile_id'))
+        )
+    return condition
+
+
+# --- keeping the index in sync ---
+
+def schedule(profile_ids):
+    """
+    Queues ``profile_ids`` for re-indexing once the current transaction
+    commits. Ids left behind by a rolled-back transaction are picked up by
+    the next commit, which is harmless: documents are always rebuilt from
+    the current rows.
+    """
+    profile_ids = [profile_id for profile_id in profile_ids if profile_id is not None]
+    if not profile_ids:
+        return
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(profile_ids)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    pending = getattr(_pending, 'ids', None)
+    if pending:
+        _pending.ids = set()
+        index_profiles(pending)
+
+
+def documents(profile_ids=None):
+    """Yields (profile_id, username, bio, skills) in profile id order."""
+    from .models import Profile
+
+    profiles = Profile.objects.order_by('pk')
+    links = Profile.skills_to_teach.through.objects.order_by('skill__name')
+    if profile_ids is not None:
+        profiles = profiles.filter(pk__in=profile_ids)
+        links = links.filter(profile_id__in=profile_ids)
+
+    skills = defaultdict(list)
+    for profile_id, name in links.values_list('profile_id', 'skill__name'):
+        skills[profile_id].append(name)
+    for profile_id, username, bio in profiles.values_list('pk', 'user__username', 'bio'):
+        yield profile_id, username, bio, ' '.join(skills[profile_id])
+
+
+def index_profiles(profile_ids):
+    """Rewrites the documents of ``profile_ids``; deleted profiles are dropped."""
+    if not is_enabled():
+        return
+    profile_ids = sorted(set(profile_ids))
+    for start in range(0, len(profile_ids), CHUNK_SIZE):
+        chunk = profile_ids[start:start + CHUNK_SIZE]
+        rows = list(documents(chunk))
+        with transaction.atomic(), connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', chunk)
+            _insert(cursor, rows)
+
+
+def rebuild():
+    """Recomputes every document. Returns the number indexed."""
+    if not is_enabled():
+        return 0
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        rows = []
+        for row in documents():
+            rows.append(row)
+            if len(rows) >= CHUNK_SIZE:
+                count += _insert(cursor, rows)
+                rows = []
+        count += _insert(cursor, rows)
+    return count
+
+
+def _insert(cursor, rows):
+    if rows:
+        cursor.executemany(f'INSERT INTO {TABLE} (rowid, username, bio, skills) VALUES (%s, %s, %s, %s)', rows)
+    return len(rows)
+
+
+def indexed_documents():
+    """Everything currently in the index, for ``rebuild_search_index --verify``."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid, username, bio, skills FROM {TABLE} ORDER BY rowid')
+        return [tuple(row) for row in cursor.fetchall()]
@@ -1,23 +1,76 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Profile
+from . import imaging
 from skills.models import Skill
-from scheduling.models import Feedback, Session
+from scheduling.models import Feedback, ActiveSessionState, TeacherRating
 from scheduling.serializers import FeedbackSerializer
-from django.db.models import Q, Max  # <-- 1. IMPORT Max
+from django.db import models
+from django.db.models import F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from collections import defaultdict
 
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = ['id', 'name']
 
+class ProfileListSerializer(serializers.ListSerializer):
+    """
+    Serializes many profiles with a fixed number of queries.
+
+    Users, their active session state and skills are prefetched once, and
+    feedback for every profile is loaded in bulk and handed to the child
+    serializer through ``self.child.batch``.
+    """
+
+    def to_representation(self, data):
+        profiles = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        prefetch_related_objects(
+            profiles, 'user__active_session_state', 'skills_to_teach', 'skills_to_learn'
+        )
+
+        user_ids = [profile.user_id for profile in profiles]
+        self.child.batch = {
+            'feedback': self._load_feedback(user_ids),
+            'ratings': self._load_ratings(user_ids),
+        }
+        try:
+            return [self.child.to_representation(profile) for profile in profiles]
+        finally:
+            self.child.batch = None
+
+    def _load_feedback(self, user_ids):
+        # Only the newest few per teacher, cut in SQL with ROW_NUMBER()
+        feedback_by_teacher = defaultdict(list)
+        feedbacks = Feedback.objects.filter(
+            session__teacher_id__in=user_ids
+        ).annotate(
+            position=Window(RowNumber(), partition_by=F('session__teacher_id'),
+                            order_by=(F('created_at').desc(), F('id').desc()))
+        ).filter(
+            position__lte=self.child.recent_feedback_limit
+        ).select_related('session__learner', 'session__skill').order_by('-created_at', '-id')
+        for feedback in feedbacks:
+            feedback_by_teacher[feedback.session.teacher_id].append(feedback)
+        return feedback_by_teacher
+
+    def _load_ratings(self, user_ids):
+        ratings_by_teacher = defaultdict(list)
+        for rating in TeacherRating.objects.filter(teacher_id__in=user_ids).select_related('skill'):
+            ratings_by_teacher[rating.teacher_id].append(rating)
+        return ratings_by_teacher
+
+
 class ProfileSerializer(serializers.ModelSerializer):
     skills_to_teach = SkillSerializer(many=True, read_only=True)
     skills_to_learn = SkillSerializer(many=True, read_only=True)
     user_id = serializers.IntegerField(source='user.id', read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     received_feedback = serializers.SerializerMethodField()
+    rating_summary = serializers.SerializerMethodField()
     is_busy = serializers.SerializerMethodField()
     
     # --- 2. ADD THE NEW FIELD ---
@@ -26,50 +79,79 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         # --- 3. ADD THE NEW FIELD TO THE LIST ---
-        fields = ['user_id', 'username', 'image', 'bio', 
+        fields = ['user_id', 'username', 'image', 'image_variants', 'bio', 
                   'skills_to_teach', 'skills_to_learn', 
-                  'received_feedback', 'is_busy', 
+                  'received_feedback', 'rating_summary', 'is_busy', 
                   'active_session_end_time'] # <-- Added here
         read_only_fields = ['user_id', 'username']
+        list_serializer_class = ProfileListSerializer
 
-    def get_image(self, obj):
+    # Filled in by ProfileListSerializer when serializing many profiles
+    batch = None
+    # received_feedback holds only the newest items; the full list is
+    # paginated at /api/users/<id>/feedback/
+    recent_feedback_limit = 5
+
+    def _absolute(self, url):
         request = self.context.get('request')
-        if obj.image:
-            try:
-                return request.build_absolute_uri(obj.image.url)
-            except:
-                return None
-        return None
+        if url is None:
+            return None
+        try:
+            return request.build_absolute_uri(url)
+        except:
+            return None
+
+    def get_image(self, obj):
+        # Views can ask for a smaller avatar (e.g. match cards) via context
+        size = self.context.get('image_size', 300)
+        return self._absolute(obj.image_variant_url(size))
+
+    def get_image_variants(self, obj):
+        if not obj.image_hash:
+            return {}
+        return {
+            str(size): self._absolute(obj.image_variant_url(size))
+            for size in imaging.variant_sizes()
+        }
 
     def get_received_feedback(self, obj):
+        if self.batch is not None:
+            feedbacks = self.batch['feedback'].get(obj.user_id, [])
+        else:
+            feedbacks = Feedback.objects.filter(
+                session__teacher_id=obj.user_id
+            ).select_related('session__learner', 'session__skill').order_by(
+                '-created_at', '-id'
+            )[:self.recent_feedback_limit]
+        return FeedbackSerializer(feedbacks, many=True, context=self.context).data
+
+    def get_rating_summary(self, obj):
+        if self.batch is not None:
+            ratings = self.batch['ratings'].get(obj.user_id, [])
+        else:
+            ratings = TeacherRating.objects.filter(teacher_id=obj.user_id).select_related('skill')
+        return TeacherRating.summarize(ratings)
+
+    def _active_state(self, obj):
         try:
-            feedbacks = Feedback.objects.filter(session__teacher=obj.user).order_by('-created_at')
-            serializer = FeedbackSerializer(feedbacks, many=True, context=self.context)
-            return serializer.data
-        except Feedback.DoesNotExist:
-            return []
+            return obj.user.active_session_state
+        except ActiveSessionState.DoesNotExist:
+            return None
 
     def get_is_busy(self, obj):
-        # This logic stays the same
-        is_busy = Session.objects.filter(
-            (Q(teacher=obj.user) | Q(learner=obj.user)) &
-            Q(status__in=['pending', 'confirmed'])
-        ).exists()
-        return is_busy
+        # Single-row read of the denormalized state kept by Session.save()
+        state = self._active_state(obj)
+        return state is not None and state.is_busy
 
     # --- 4. ADD THE NEW METHOD ---
     def get_active_session_end_time(self, obj):
         """
-        Finds the latest 'end_time' from all pending or confirmed sessions
+        The latest 'end_time' from all pending or confirmed sessions
         for this user.
         """
-        latest_session = Session.objects.filter(
-            (Q(teacher=obj.user) | Q(learner=obj.user)) &
-            Q(status__in=['pending', 'confirmed'])
-        ).aggregate(latest_end=Max('end_time'))
-        
+        state = self._active_state(obj)
         # This will return the datetime object or None
-        return latest_session.get('latest_end')
+        return state.latest_end_time if state is not None and state.is_busy else None
 
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
@@ -1,3 +1,332 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from scheduling.models import Session, Feedback
+from skillswap_project import benchmarking
+from skills.models import Skill
+from . import authentication, imaging, search
+from .models import Profile
+
+
+@override_settings(PROFILE_IMAGE_ASYNC=False)
+class SkillTagWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tagger')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def save_skills(self, teach, learn=''):
+        # Fresh user instance per request, like real token authentication
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        # Commit work (the search index) counts too
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/users/{self.user.id}/update_profile/', {
+                'skills_to_teach': teach,
+                'skills_to_learn': learn,
+            })
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_skills_are_normalized_and_diffed(self):
+        Skill.objects.create(name='Python')
+        self.save_skills(' python, guitar ,, Python', 'chess')
+
+        profile = self.user.profile
+        self.assertEqual(sorted(profile.skills_to_teach.values_list('name', flat=True)), ['Guitar', 'Python'])
+        self.assertEqual(list(profile.skills_to_learn.values_list('name', flat=True)), ['Chess'])
+        self.assertEqual(Skill.objects.filter(name='Python').count(), 1)
+
+        self.save_skills('Guitar, Drums', 'chess')
+        self.assertEqual(sorted(profile.skills_to_teach.values_list('name', flat=True)), ['Drums', 'Guitar'])
+
+    def test_query_count_does_not_depend_on_skill_count(self):
+        # Warm up per-process caches (the search index check) first
+        self.save_skills('')
+        few = self.save_skills(', '.join(f'Skill {i}' for i in range(5)))
+        self.save_skills('')
+        many = self.save_skills(', '.join(f'Skill {i}' for i in range(50, 100)))
+        self.assertEqual(few, many)
+
+
+class ProfileImagePipelineTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media, PROFILE_IMAGE_ASYNC=False, PROFILE_IMAGE_MAX_ORIGINAL=500)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='pictured')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), color).save(buffer, format='PNG')
+        upload = SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/users/{self.user.id}/update_profile/', {'image': upload})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_upload_generates_variants_and_serves_them(self):
+        response = self.upload('red')
+        # The request itself returns before the variants exist
+        self.assertEqual(response.data['image_variants'], {})
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertTrue(profile.image_hash)
+        with default_storage.open(profile.image.name) as handle:
+            self.assertEqual(Image.open(handle).size, (500, 375))
+        for size in (64, 128, 300):
+            with default_storage.open(imaging.variant_name(profile.image_hash, size)) as handle:
+                self.assertLessEqual(max(Image.open(handle).size), size)
+
+        detail = self.client.get(f'/api/users/{self.user.id}/').data['profile']
+        self.assertTrue(detail['image'].endswith(imaging.variant_name(profile.image_hash, 300)))
+        self.assertEqual(set(detail['image_variants']), {'64', '128', '300'})
+
+    def test_identical_image_is_not_reencoded(self):
+        self.upload('blue')
+        with mock.patch('users.imaging._write_variants') as write_variants:
+            self.upload('blue')
+        write_variants.assert_not_called()
+        self.assertTrue(Profile.objects.get(user=self.user).image_hash)
+
+    def test_default_image_is_never_scheduled(self):
+        with mock.patch('users.imaging._submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='newcomer')
+        submit.assert_not_called()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProfileDirtyTrackingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='returning', password='secret')
+
+    def test_login_does_not_write_profile_or_touch_image(self):
+        client = APIClient()
+        with mock.patch('PIL.Image.open') as image_open, \
+                CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/login/', {'username': 'returning', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 200)
+        image_open.assert_not_called()
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in writes if 'users_profile' in sql])
+        # user lookup, token get/create, profile + related reads (skills,
+        # recent feedback, rating summary, session state)
+        self.assertEqual(len(queries), 11)
+
+    def test_user_save_does_not_write_profile(self):
+        self.user.profile.bio = 'unsaved'
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(Profile.objects.get(user=self.user).bio, '')
+
+    def test_only_changed_fields_are_written(self):
+        profile = Profile.objects.get(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self.assertEqual(len(queries), 0)
+
+        profile.bio = 'Hello'
+        with mock.patch('users.imaging.enqueue') as enqueue, \
+                CaptureQueriesContext(connection) as queries:
+            profile.save()
+        enqueue.assert_not_called()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"bio"', queries[0]['sql'])
+        self.assertNotIn('"image"', queries[0]['sql'])
+        self.assertEqual(profile.get_dirty_fields(), [])
+
+
+class ProfileFeedbackTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher')
+        self.learner = User.objects.create_user(username='learner')
+        self.skill = Skill.objects.create(name='Python')
+        self.client = APIClient()
+
+    def add_feedback(self, count):
+        for index in range(count):
+            session = Session.objects.create(teacher=self.teacher, learner=self.learner,
+                                             skill=self.skill, status='completed')
+            Feedback.objects.create(session=session, rating=index % 5 + 1, comment=f'#{index}')
+
+    def test_profile_carries_summary_and_recent_feedback_only(self):
+        self.add_feedback(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(f'/api/users/{self.teacher.id}/')
+        self.add_feedback(27)
+        with CaptureQueriesContext(connection) as many:
+            profile = self.client.get(f'/api/users/{self.teacher.id}/').data['profile']
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual([item['comment'] for item in profile['received_feedback']],
+                         ['#26', '#25', '#24', '#23', '#22'])
+        self.assertEqual((profile['rating_summary']['count'], profile['rating_summary']['average']), (30, 2.8))
+
+    def test_feedback_endpoint_pages_through_everything(self):
+        self.add_feedback(25)
+        seen, url = [], f'/api/users/{self.teacher.id}/feedback/'
+        while url:
+            data = self.client.get(url).data
+            seen.extend(item['comment'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen[0], '#24')
+
+    def test_public_profile_page_uses_aggregate(self):
+        self.add_feedback(12)
+        response = self.client.get(f'/user/{self.teacher.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['average_rating'], 2.75)
+        self.assertEqual(len(response.context['feedbacks']), 10)
+
+
+@override_settings(PROFILE_IMAGE_ASYNC=False)
+class PeopleSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python = Skill.objects.create(name='Python')
+            self.guitar = Skill.objects.create(name='Guitar')
+            self.pythonista = User.objects.create_user(username='pythonista')
+            self.teacher = User.objects.create_user(username='maria')
+            self.teacher.profile.skills_to_teach.add(self.python)
+            self.bio = User.objects.create_user(username='sam')
+            self.bio.profile.bio = 'I write python scripts for fun'
+            self.bio.profile.save()
+
+    def usernames(self, query):
+        response = self.client.get('/api/users/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['username'] for item in response.data['results']]
+
+    def test_results_are_ranked_by_field_weight(self):
+        self.assertTrue(search.is_enabled())
+        self.assertEqual(self.usernames('pyth'), ['pythonista', 'maria', 'sam'])
+        self.assertEqual(self.usernames('python scripts'), ['sam'])
+        self.assertEqual(self.usernames('"pyth*" ('), ['pythonista', 'maria', 'sam'])
+        self.assertEqual(self.usernames('?!'), [])
+
+    def test_index_follows_renames_and_skill_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.username = 'guitarhero'
+            self.teacher.save()
+            self.teacher.profile.skills_to_teach.set([self.guitar])
+            self.python.teachers.add(self.pythonista.profile)
+        self.assertEqual(self.usernames('guitar'), ['guitarhero'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guitar.name = 'Ukulele'
+            self.guitar.save()
+        self.assertEqual(self.usernames('ukulele'), ['guitarhero'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guitar.delete()
+            self.bio.delete()
+        self.assertEqual(self.usernames('ukulele'), [])
+        self.assertEqual(self.usernames('python'), ['pythonista'])
+        self.assertEqual(search.indexed_documents(), list(search.documents()))
+
+    def test_pages_follow_rank(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                User.objects.create_user(username=f'pythoner{index}')
+        seen, url = [], '/api/users/search/?q=python&page_size=2'
+        while url:
+            data = self.client.get(url).data
+            seen.extend(item['username'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen[-2:], ['maria', 'sam'])
+
+    def test_fallback_without_fts(self):
+        with mock.patch('users.search.is_enabled', return_value=False):
+            self.assertEqual(sorted(self.usernames('pyth')), ['maria', 'pythonista', 'sam'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ApiBenchmarkTests(TestCase):
+    def test_seeded_endpoints_run_without_errors(self):
+        accounts = benchmarking.seed(users=15, skills=10, sessions_per_user=2, notifications_per_user=3)
+        results = benchmarking.run(accounts, requests=4, warmup=1, memory_requests=1)
+
+        self.assertEqual(set(results), set(benchmarking.ENDPOINTS))
+        for stats in results.values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['max_queries'], 0)
+
+        baseline = {'endpoints': results}
+        slower = {'endpoints': {name: dict(stats) for name, stats in results.items()}}
+        slower['endpoints']['matches']['p95_ms'] *= 2
+        slower['endpoints']['login']['max_queries'] += 1
+        self.assertEqual(benchmarking.compare(baseline, baseline), [])
+        self.assertEqual(
+            [problem.split(':')[0] for problem in benchmarking.compare(slower, baseline)], ['matches', 'login']
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication.cache.clear()
+        self.user = User.objects.create_user(username='member', password='secret')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'username': 'member', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        return response.data['token']
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            status_code = self.client.get('/api/users/current_user/').status_code
+        return status_code, len([query for query in queries if 'authtoken_token' in query['sql']])
+
+    def test_resolved_tokens_are_cached_until_invalidated(self):
+        self.login()
+        self.assertEqual(self.token_queries(), (200, 1))
+        self.assertEqual(self.token_queries(), (200, 0))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.token_queries(), (401, 1))
+
+    def test_logout_revokes_the_token(self):
+        self.login()
+        self.token_queries()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(self.token_queries()[0], 401)
+
+    @override_settings(AUTH_SIGNED_TOKENS=True)
+    def test_signed_tokens_reject_forgeries_without_lookups_and_die_with_the_password(self):
+        token = self.login()
+        self.assertIn(':', token)
+        self.assertEqual(self.token_queries(), (200, 1))
+        self.assertEqual(self.token_queries(), (200, 0))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token[:-1]}x')
+        self.assertEqual(self.token_queries(), (401, 0))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.token_queries()[0], 401)
@@ -6,9 +6,12 @@ from django.contrib.auth.decorators import login_required
 from .forms import ProfileUpdateForm                      
 from .models import Profile
 from django.contrib.auth.models import User
-from scheduling.models import Feedback
-from django.db.models import Avg
-from skills.models import Skill
+from scheduling.models import Feedback, TeacherRating
+from django.core.paginator import Paginator
+from skills.tags import set_skills
+from django.db import transaction
+
+FEEDBACK_PAGE_SIZE = 10
 
 
 def home(request):
@@ -37,25 +40,12 @@ def profile(request):
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         
         if p_form.is_valid():
-            profile = p_form.save() # Save bio and image first
-
-            # --- 1. Process "Skills to Teach" ---
-            teach_skills_str = p_form.cleaned_data.get('teach_skills_input', '')
-            profile.skills_to_teach.clear() # Clear old skills
-            teach_skill_names = [name.strip().title() for name in teach_skills_str.split(',') if name.strip()]
-            
-            for name in teach_skill_names:
-                skill, created = Skill.objects.get_or_create(name=name)
-                profile.skills_to_teach.add(skill)
+            with transaction.atomic():
+                profile = p_form.save() # Save bio and image first
 
-            # --- 2. Process "Skills to Learn" ---
-            learn_skills_str = p_form.cleaned_data.get('learn_skills_input', '')
-            profile.skills_to_learn.clear() # Clear old skills
-            learn_skill_names = [name.strip().title() for name in learn_skills_str.split(',') if name.strip()]
-            
-            for name in learn_skill_names:
-                skill, created = Skill.objects.get_or_create(name=name)
-                profile.skills_to_learn.add(skill)
+                # Replace "Skills to Teach" / "Skills to Learn" with the new lists
+                set_skills(profile.skills_to_teach, p_form.cleaned_data.get('teach_skills_input', ''))
+                set_skills(profile.skills_to_learn, p_form.cleaned_data.get('learn_skills_input', ''))
 
             messages.success(request, 'Your profile has been updated!')
             return redirect('profile')
@@ -77,13 +67,19 @@ def profile(request):
 def public_profile(request, user_id):
     profile_user = get_object_or_404(User, id=user_id)
     
-    feedbacks = Feedback.objects.filter(session__teacher=profile_user).order_by('-created_at')
-
-    average_rating = feedbacks.aggregate(Avg('rating'))['rating__avg']
+    # Totals come from the maintained aggregate; feedback is paged
+    summary = TeacherRating.summarize(
+        TeacherRating.objects.filter(teacher=profile_user).select_related('skill')
+    )
+    feedbacks = Feedback.objects.filter(session__teacher=profile_user).select_related(
+        'session__learner'
+    ).order_by('-created_at', '-id')
+    page = Paginator(feedbacks, FEEDBACK_PAGE_SIZE).get_page(request.GET.get('page'))
 
     context = {
         'profile_user': profile_user,  
-        'feedbacks': feedbacks,
-        'average_rating': average_rating
+        'feedbacks': page,
+        'rating_summary': summary,
+        'average_rating': summary['average']
     }
     return render(request, 'users/public_profile.html', context)